@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+# Copyright 2026 OpenStack Charmers
+# See LICENSE file for licensing details.
+
+"""Benchmark the export management hot paths against synthetic data.
+
+Each benchmark is run at 10, 1000 and 10000 exports (or clients on the
+export, for the Export and ClientACL benchmarks) and reports the best
+time per operation over several repeats, repeating short operations
+until they have run for MIN_RUN_SECONDS. Results are compared with a
+baseline file and the run fails if any benchmark is slower than its
+baseline by more than the regression threshold. Sizes below
+GATE_MIN_SIZE are reported but not compared: their calls take a few
+milliseconds at most, which scheduling noise alone can stretch by more
+than the threshold.
+
+Timings are scaled by a short calibration loop run alongside them, so a
+baseline recorded on one machine remains a useful reference on another.
+Record a new baseline with --update-baseline after an intended change in
+performance.
+
+The pools live in the simulated cluster and Ganesha of unit_tests/ceph_sim.
+--latency adds a delay to every call into them, to see how the operations
+behave against a real cluster's round trip times; such runs are not
+compared with the baseline. When the charm's dependencies are installed
+the share actions are also timed, through the charm's action handlers.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.extend([ROOT, os.path.join(ROOT, 'src'),
+                 os.path.join(ROOT, 'lib')])  # noqa
+
+import ganesha
+import manager
+
+from unit_tests import ceph_sim
+
+import synthetic
+
+BASELINE = os.path.join(HERE, 'baseline.json')
+SIZES = (10, 1000, 10000)
+DEFAULT_THRESHOLD = 0.3
+# Smallest size compared with the baseline
+GATE_MIN_SIZE = 1000
+# Benchmarks are repeated until they have run for this long in total
+MIN_RUN_SECONDS = 0.5
+# ...but no more than this many times
+MAX_REPEATS = 200
+
+
+def calibrate(repeats=5):
+    """Time a fixed pure Python workload, as a measure of machine speed."""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        total = 0
+        table = {}
+        for i in range(200000):
+            total += i % 7
+            table[i & 1023] = str(total)
+        best = min(best or float('inf'), time.perf_counter() - start)
+    return best
+
+
+class Benchmark(object):
+    """A named operation, timed at several sizes.
+
+    :param name: Name of the benchmark
+    :param setup: Called with the size, returns a callable to time and the
+                  number of operations each call performs
+    :param repeats: Minimum number of timed calls, of which the best
+                    counts. Calls are repeated up to MAX_REPEATS times
+                    until they have taken MIN_RUN_SECONDS.
+    :param repeatable: Whether every call does the same work. Calls that
+                       add shares or clients are only made repeats times.
+    """
+
+    def __init__(self, name, setup, repeats=5, repeatable=True):
+        self.name = name
+        self.setup = setup
+        self.repeats = repeats
+        self.repeatable = repeatable
+
+    def run(self, size):
+        """Return the best time per operation, in seconds."""
+        func, ops = self.setup(size)
+        best = None
+        total = 0
+        calls = 0
+        while calls < self.repeats or self.repeatable and \
+                total < MIN_RUN_SECONDS and calls < MAX_REPEATS:
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+            total += elapsed
+            calls += 1
+        return best / ops
+
+
+_pools = {}
+
+# Seconds added to every simulated RADOS, ceph and D-Bus call
+_latency = 0
+
+
+def _pool(size):
+    """The simulated cluster and Ganesha for a pool of size shares.
+
+    Pools are built once per size and shared by the benchmarks, so later
+    benchmarks may see a few more shares than size.
+    """
+    if size not in _pools:
+        cluster, server, names = synthetic.populate(size)
+        cluster.faults.latency['*'] = _latency
+        _pools[size] = cluster, server, names
+    return _pools[size]
+
+
+def _client(size):
+    """A GaneshaNFS client for a pool of size synthetic shares."""
+    cluster, server, names = _pool(size)
+    nfs = cluster.ganesha_client('benchmark', 'benchmark-pool', _export_dir,
+                                 server=server)
+    return nfs, names
+
+
+def _templates(size, legacy=False):
+    rng = random.Random(size)
+    return [
+        synthetic.export_template(1000 + i, synthetic.client_ips(rng, 4),
+                                  legacy=legacy)
+        for i in range(size)]
+
+
+def bench_parseconf(size, legacy=False):
+    templates = _templates(size, legacy=legacy)
+
+    def func():
+        for template in templates:
+            manager.parseconf(template)
+    return func, size
+
+
+def bench_parseconf_legacy(size):
+    """Parse exports as written before EXPORT_DEFAULTS, for comparison."""
+    return bench_parseconf(size, legacy=True)
+
+
+def bench_mkconf(size):
+    confs = [manager.parseconf(template) for template in _templates(size)]
+
+    def func():
+        for conf in confs:
+            manager.mkconf(conf)
+    return func, size
+
+
+def _hosts(size):
+    return ['172.{}.{}.{}'.format(16 + i // 65536, i // 256 % 256, i % 256)
+            for i in range(size)]
+
+
+def bench_export_clients(size):
+    """Grant and revoke clients on an export already holding size hosts."""
+    export = ganesha.Export(manager.parseconf(
+        synthetic.export_template(1000, _hosts(size))))
+    export.acl
+    clients = synthetic.client_ips(random.Random(size), 100)
+
+    def func():
+        for client in clients:
+            export.add_client(client)
+        export.to_export()
+        for client in clients:
+            export.remove_client(client)
+        export.to_export()
+    return func, 2 * len(clients)
+
+
+def bench_acl_networks(size):
+    """Grant and revoke networks on an ACL already holding size hosts."""
+    acl = ganesha.ClientACL(
+        [{'Access_Type': 'rw', 'Clients': ', '.join(_hosts(size))}])
+    rng = random.Random(size)
+    networks = ['10.{}.{}.0/24'.format(rng.randrange(256), rng.randrange(256))
+                for _ in range(100)]
+
+    def func():
+        for network in networks:
+            acl.add(network)
+        for network in networks:
+            acl.discard(network)
+    return func, 2 * len(networks)
+
+
+def bench_acl_load(size):
+    """Index the clients of an export holding size networks."""
+    blocks = [{'Access_Type': 'rw', 'Clients': ', '.join(
+        '10.{}.{}.0/24'.format(i // 256 % 256, i % 256)
+        for i in range(size))}]
+
+    def func():
+        ganesha.ClientACL(blocks)
+    return func, size
+
+
+def bench_list_shares(size):
+    nfs, _ = _client(size)
+
+    def func():
+        ganesha.Export.conf_cache.clear()
+        nfs.list_shares()
+    return func, 1
+
+
+def bench_list_shares_warm(size):
+    nfs, _ = _client(size)
+    nfs.list_shares()
+
+    def func():
+        nfs.list_shares()
+    return func, 1
+
+
+def bench_create_share(size):
+    nfs, _ = _client(size)
+    count = 10
+
+    def func():
+        for _ in range(count):
+            nfs.create_share(access_ips=['10.0.0.0/8'])
+    return func, count
+
+
+def bench_grant_access(size):
+    nfs, names = _client(size)
+    rng = random.Random(size)
+    count = 20
+
+    def func():
+        for client in synthetic.client_ips(rng, count):
+            nfs.grant_access(rng.choice(names), client)
+    return func, count
+
+
+def _charm(size):
+    """A leader CephNFSCharm under Harness, using a synthetic pool."""
+    from ops.testing import Harness
+    import charm
+    harness = Harness(charm.CephNFSCharm)
+    harness.add_relation('cluster', 'ceph-nfs')
+    harness.set_leader(True)
+    harness.begin()
+    nfs, names = _client(size)
+    harness.charm._ganesha_client = nfs
+    harness.charm.access_address = lambda: '10.5.0.100'
+    return harness.charm, names
+
+
+def bench_create_share_action(size):
+    unit, _ = _charm(size)
+    count = 10
+
+    def func():
+        for _ in range(count):
+            unit.create_share_action(ceph_sim.SimActionEvent(
+                {'allowed-ips': '10.0.0.0/8'}))
+    return func, count
+
+
+def bench_grant_access_action(size):
+    unit, names = _charm(size)
+    rng = random.Random(size)
+    count = 20
+
+    def func():
+        for client in synthetic.client_ips(rng, count):
+            unit.grant_access_action(ceph_sim.SimActionEvent(
+                {'name': rng.choice(names), 'client': client}))
+    return func, count
+
+
+def charm_available():
+    """Whether the charm and the libraries it needs can be imported."""
+    try:
+        import charm  # noqa: F401
+    except ImportError as e:
+        logging.warning("Skipping the charm action benchmarks: {}"
+                        .format(e))
+        return False
+    return True
+
+
+BENCHMARKS = [
+    Benchmark('manager.parseconf', bench_parseconf),
+    Benchmark('manager.parseconf(legacy-exports)', bench_parseconf_legacy),
+    Benchmark('manager.mkconf', bench_mkconf),
+    Benchmark('Export.add_remove_client', bench_export_clients),
+    Benchmark('ClientACL.add_remove_network', bench_acl_networks),
+    Benchmark('ClientACL.load_networks', bench_acl_load),
+    Benchmark('GaneshaNFS.list_shares', bench_list_shares, repeats=3),
+    Benchmark('GaneshaNFS.list_shares_warm', bench_list_shares_warm,
+              repeats=3),
+    Benchmark('GaneshaNFS.create_share', bench_create_share, repeats=3,
+              repeatable=False),
+    Benchmark('GaneshaNFS.grant_access', bench_grant_access,
+              repeatable=False),
+]
+
+CHARM_BENCHMARKS = [
+    Benchmark('CephNFSCharm.create_share_action', bench_create_share_action,
+              repeats=3, repeatable=False),
+    Benchmark('CephNFSCharm.grant_access_action', bench_grant_access_action,
+              repeatable=False),
+]
+
+
+def key(name, size):
+    return '{}[{}]'.format(name, size)
+
+
+def compare(results, calibration, baseline, threshold):
+    """Compare results with a baseline, scaled to this machine's speed.
+
+    :returns: Descriptions of the benchmarks that regressed
+    """
+    scale = calibration / baseline['calibration']
+    regressions = []
+    for name, seconds in sorted(results.items()):
+        expected = baseline['results'].get(name)
+        if expected is None:
+            continue
+        ratio = seconds / (expected * scale)
+        if ratio > 1 + threshold:
+            regressions.append('{}: {:.1f}us per op, {:.0%} of baseline'
+                               .format(name, seconds * 1e6, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)),
+                        help='Comma separated sizes to run at')
+    parser.add_argument('--only', action='append', default=[],
+                        help='Only run benchmarks whose name contains this')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help='Baseline results file')
+    parser.add_argument('--threshold', type=float,
+                        help='Allowed slowdown relative to the baseline, '
+                             'e.g. 0.3 for 30%%')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Write the results as the new baseline')
+    parser.add_argument('--output', help='Also write the results here')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='Milliseconds added to every simulated '
+                             'cluster and Ganesha call')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    if args.latency and args.update_baseline:
+        parser.error('a baseline cannot be recorded with --latency')
+
+    global _export_dir, _latency
+    _latency = args.latency / 1000
+    # Exports are staged on tmpfs, as in /run/ceph-nfs, where there is one
+    tmp = tempfile.TemporaryDirectory(
+        prefix='ceph-nfs-bench-',
+        dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+    _export_dir = tmp.name
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    calibration = calibrate()
+    print('calibration: {:.1f}ms'.format(calibration * 1e3))
+    results = {}
+    ungated = set()
+    benchmarks = list(BENCHMARKS)
+    if charm_available():
+        benchmarks.extend(CHARM_BENCHMARKS)
+    for benchmark in benchmarks:
+        if args.only and not any(
+                only in benchmark.name for only in args.only):
+            continue
+        for size in sizes:
+            seconds = benchmark.run(size)
+            results[key(benchmark.name, size)] = seconds
+            if size < GATE_MIN_SIZE:
+                ungated.add(key(benchmark.name, size))
+            print('{:<40} {:>12.1f}us per op{}'.format(
+                key(benchmark.name, size), seconds * 1e6,
+                ' (not gated)' if size < GATE_MIN_SIZE else ''))
+    tmp.cleanup()
+
+    document = {'calibration': calibration, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+    if args.latency:
+        return 0
+    if args.update_baseline:
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                previous = json.load(f)
+            document['threshold'] = previous.get(
+                'threshold', DEFAULT_THRESHOLD)
+        else:
+            document['threshold'] = DEFAULT_THRESHOLD
+        if args.threshold is not None:
+            document['threshold'] = args.threshold
+        with open(args.baseline, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print('Wrote baseline to {}'.format(args.baseline))
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('No baseline at {}, nothing to compare'.format(args.baseline))
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    threshold = args.threshold
+    if threshold is None:
+        threshold = baseline.get('threshold', DEFAULT_THRESHOLD)
+    regressions = compare(
+        {name: seconds for name, seconds in results.items()
+         if name not in ungated},
+        calibration, baseline, threshold)
+    if regressions:
+        print('Regressions beyond {:.0%}:'.format(threshold))
+        for regression in regressions:
+            print('  ' + regression)
+        return 1
+    print('No regressions beyond {:.0%}'.format(threshold))
+    return 0
+
+
+_export_dir = None
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# Copyright 2026 OpenStack Charmers
+# See LICENSE file for licensing details.
+
+"""Synthetic pools of shares for the benchmarks.
+
+Pools are held by the simulated cluster and Ganesha in unit_tests/ceph_sim,
+so GaneshaNFS runs end to end without any Ceph or Ganesha daemons.
+"""
+
+import random
+
+import ganesha
+import manager
+
+from unit_tests import ceph_sim
+
+
+def client_ips(rng, count):
+    """Random host and network client entries, as operators grant them."""
+    clients = []
+    for _ in range(count):
+        if rng.random() < 0.25:
+            clients.append('10.{}.{}.0/24'.format(
+                rng.randrange(256), rng.randrange(256)))
+        else:
+            clients.append('10.{}.{}.{}'.format(
+                rng.randrange(256), rng.randrange(256),
+                rng.randrange(1, 255)))
+    return clients
+
+
+def export_template(export_id, clients, legacy=False):
+    """Serialized export block for a synthetic share.
+
+    :param legacy: Include the settings now in EXPORT_DEFAULTS, as exports
+                   written by earlier charm revisions do
+    """
+    name = 'share-{}'.format(export_id)
+    path = '/volumes/_nogroup/{}/{:032x}'.format(name, export_id)
+    export = {
+        'Export_Id': export_id,
+        'Path': path,
+        'FSAL': {
+            'Name': 'Ceph',
+            'User_Id': 'ganesha-{}'.format(name),
+            'Secret_Access_Key': 'QVFE' + 'A' * 36 + '==',
+        },
+        'Pseudo': path,
+        'CLIENT': [{
+            'Access_Type': 'RW',
+            'Clients': ', '.join(clients),
+        }],
+    }
+    if legacy:
+        export.update(ganesha.EXPORT_DEFAULTS)
+    return ganesha.Export({'EXPORT': export}).to_export()
+
+
+def populate(count, clients_per_export=4, seed=0):
+    """Build a cluster holding an initialised pool with count shares.
+
+    The export objects, index and lookup are written straight into the
+    pool, as GaneshaNFS would have left them, and the shares are already
+    exported by the simulated Ganesha.
+
+    :returns: The cluster, the Ganesha and the names of the shares
+    """
+    rng = random.Random(seed)
+    cluster = ceph_sim.SimCluster()
+    server = ceph_sim.SimGanesha(cluster.faults)
+    backend = cluster.backend('benchmark', 'benchmark-pool')
+    nfs = ganesha.GaneshaNFS('benchmark', 'benchmark-pool', backend=backend,
+                             export_mgr=server.export_mgr())
+    nfs.initialise_pool()
+    first_id = 1000
+    names = []
+    lookup = {nfs.export_lookup_version_key: '1'}
+    index = {}
+    for export_id in range(first_id, first_id + count):
+        template = export_template(
+            export_id, client_ips(rng, clients_per_export))
+        object_name = nfs._export_object_name(export_id)
+        backend.put(object_name, template)
+        index[object_name] = ''
+        share = ganesha.Export.from_export(template)
+        for key in nfs._lookup_keys(share):
+            lookup[key] = str(export_id)
+        names.append(share.name)
+        server.exports[export_id] = manager.parseconf(template)['EXPORT']
+    backend.omap_set(nfs.export_index, index)
+    backend.omap_set(nfs.export_lookup, lookup)
+    nfs._write_index()
+    backend.put(nfs.export_counter, str(first_id + count))
+    return cluster, server, names
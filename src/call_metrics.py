@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# Copyright 2026 OpenStack Charmers
+# See LICENSE file for licensing details.
+
+"""Timing of the charm's calls out to Ceph, Ganesha and the system.
+
+A CallRecorder counts the calls of each kind ('rados', 'ceph', 'dbus',
+'exec') and operation, with the time they took, the bytes they moved and
+a histogram of their latencies. ``Instrumented`` wraps a client object so
+that every call to its methods is recorded, and ``timed`` records any
+other block of code.
+
+Each hook starts with an empty recorder. Its counts can be summarised for
+an action's results, and added to cumulative counters kept on disk and
+published as a node-exporter textfile.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+           2.5, 5.0, 10.0, 30.0)
+
+METRIC_PREFIX = 'ceph_nfs_charm_call'
+
+
+def payload_size(value) -> int:
+    """Approximate number of bytes in a call's arguments or result."""
+    if value is None:
+        return 0
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, dict):
+        return sum(payload_size(key) + payload_size(item)
+                   for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(payload_size(item) for item in value)
+    return 0
+
+
+class CallStats(object):
+    """Counters for one operation."""
+
+    __slots__ = ('count', 'errors', 'seconds', 'bytes', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        # Calls per bucket of BUCKETS, plus one for slower calls
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def add(self, seconds: float, nbytes: int = 0, error: bool = False):
+        self.count += 1
+        self.errors += int(error)
+        self.seconds += seconds
+        self.bytes += nbytes
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def merge(self, other: 'CallStats'):
+        self.count += other.count
+        self.errors += other.errors
+        self.seconds += other.seconds
+        self.bytes += other.bytes
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def to_dict(self) -> Dict:
+        return {'count': self.count, 'errors': self.errors,
+                'seconds': self.seconds, 'bytes': self.bytes,
+                'buckets': self.buckets}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'CallStats':
+        stats = cls()
+        stats.count = data['count']
+        stats.errors = data['errors']
+        stats.seconds = data['seconds']
+        stats.bytes = data['bytes']
+        if len(data['buckets']) == len(stats.buckets):
+            stats.buckets = list(data['buckets'])
+        return stats
+
+
+class _Timing(object):
+    """Handle for a timed call, on which the bytes it moved can be set."""
+
+    __slots__ = ('nbytes',)
+
+    def __init__(self):
+        self.nbytes = 0
+
+
+class CallRecorder(object):
+    """Thread safe counters of calls, by kind and operation."""
+
+    def __init__(self):
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, op: str, seconds: float, nbytes: int = 0,
+               error: bool = False):
+        with self._lock:
+            stats = self.stats.get((kind, op))
+            if stats is None:
+                stats = self.stats[(kind, op)] = CallStats()
+            stats.add(seconds, nbytes, error)
+
+    @contextlib.contextmanager
+    def timed(self, kind: str, op: str):
+        """Record the block as one call, failed if it raises.
+
+        :returns: A handle whose nbytes may be set to the bytes moved
+        """
+        timing = _Timing()
+        start = time.monotonic()
+        error = True
+        try:
+            yield timing
+            error = False
+        finally:
+            self.record(kind, op, time.monotonic() - start, timing.nbytes,
+                        error)
+
+    def summary(self) -> str:
+        """One line per operation, the slowest in total first."""
+        with self._lock:
+            items = sorted(self.stats.items(),
+                           key=lambda item: item[1].seconds, reverse=True)
+        lines = []
+        for (kind, op), stats in items:
+            line = '{} {}: {} calls, {:.1f}ms'.format(
+                kind, op, stats.count, stats.seconds * 1000)
+            if stats.bytes:
+                line += ', {} bytes'.format(stats.bytes)
+            if stats.errors:
+                line += ', {} failed'.format(stats.errors)
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def publish(self, textfile: str, state_file: str):
+        """Add the calls recorded so far to the cumulative counters.
+
+        The counters are kept in state_file and written out in the
+        Prometheus text format to textfile, for node-exporter's textfile
+        collector. The recorder is reset afterwards, so calls are only
+        counted once.
+
+        :param textfile: Path of the .prom file to write
+        :param state_file: Path of the file holding the counters
+        """
+        totals = _load_state(state_file)
+        with self._lock:
+            for key, stats in self.stats.items():
+                if key in totals:
+                    totals[key].merge(stats)
+                else:
+                    totals[key] = stats
+            self.stats = {}
+        write_atomically(state_file, json.dumps([
+            [kind, op, stats.to_dict()]
+            for (kind, op), stats in sorted(totals.items())]))
+        write_atomically(textfile, render_textfile(totals))
+
+
+def _load_state(path: str) -> Dict[Tuple[str, str], CallStats]:
+    try:
+        with open(path) as f:
+            return {(kind, op): CallStats.from_dict(data)
+                    for kind, op, data in json.load(f)}
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logging.warning("Resetting unreadable call counters {}: {}"
+                        .format(path, e))
+        return {}
+
+
+def write_atomically(path: str, text: str):
+    """Replace a file's contents, so readers never see it half written."""
+    tmp_path = '{}.tmp'.format(path)
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def format_labels(labels: Dict) -> str:
+    """Render a Prometheus label set, e.g. {kind="rados",op="get"}."""
+    return '{' + ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"'))
+        for name, value in labels.items()) + '}'
+
+
+def _labels(kind: str, op: str, **extra) -> str:
+    return format_labels(dict(kind=kind, op=op, **extra))
+
+
+def render_textfile(totals: Dict[Tuple[str, str], CallStats]) -> str:
+    """Render counters in the Prometheus text exposition format."""
+    items = sorted(totals.items())
+    lines = []
+    for name, help_text, attribute in (
+            ('calls_total', 'Calls made by the charm.', 'count'),
+            ('errors_total', 'Calls made by the charm that failed.',
+             'errors'),
+            ('bytes_total', 'Bytes sent and received by the charm\'s calls.',
+             'bytes')):
+        metric = '{}_{}'.format(METRIC_PREFIX, name)
+        lines.append('# HELP {} {}'.format(metric, help_text))
+        lines.append('# TYPE {} counter'.format(metric))
+        for (kind, op), stats in items:
+            lines.append('{}{} {}'.format(
+                metric, _labels(kind, op), getattr(stats, attribute)))
+    metric = '{}_duration_seconds'.format(METRIC_PREFIX)
+    lines.append('# HELP {} Time taken by the charm\'s calls.'.format(metric))
+    lines.append('# TYPE {} histogram'.format(metric))
+    for (kind, op), stats in items:
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), stats.buckets):
+            cumulative += count
+            lines.append('{}_bucket{} {}'.format(
+                metric, _labels(kind, op, le=bound), cumulative))
+        lines.append('{}_sum{} {}'.format(
+            metric, _labels(kind, op), stats.seconds))
+        lines.append('{}_count{} {}'.format(
+            metric, _labels(kind, op), stats.count))
+    return '\n'.join(lines) + '\n'
+
+
+class Instrumented(object):
+    """Proxy recording every call to a client object's public methods.
+
+    The bytes moved by a call are taken to be the size of its arguments
+    after the first, which names the object or command, and of its result.
+
+    :param target: The object whose calls are recorded
+    :param kind: Kind of the calls, e.g. 'rados'
+    :param recorder: Recorder the calls are added to
+    :param kinds: Kinds for particular methods, overriding kind
+    :param names: Functions naming the operation a call of a particular
+                  method performs from its arguments, e.g. the ceph
+                  command sent by a generic command method
+    """
+
+    def __init__(self, target, kind: str, recorder: CallRecorder,
+                 kinds: Dict[str, str] = None,
+                 names: Dict[str, Callable] = None):
+        self._target = target
+        self._kind = kind
+        self._recorder = recorder
+        self._kinds = kinds or {}
+        self._names = names or {}
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        kind = self._kinds.get(name, self._kind)
+        namer = self._names.get(name)
+        recorder = self._recorder
+
+        def call(*args, **kwargs):
+            op = name if namer is None else namer(*args)
+            with recorder.timed(kind, op) as timing:
+                result = attr(*args, **kwargs)
+                timing.nbytes = sum(map(payload_size, (args[1:], result)))
+            return result
+        return call
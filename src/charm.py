@@ -12,17 +12,18 @@ develop a new k8s charm using the Operator Framework:
     https://discourse.charmhub.io/t/4208
 """
 
+import functools
 import ipaddress
 import logging
 import os
 from pathlib import Path
 import socket
 import subprocess
-import tempfile
+import yaml
 
 from ops.framework import StoredState
 from ops.main import main
-# from ops.model import ActiveStatus
+from ops.model import BlockedStatus
 
 import charmhelpers.core.host as ch_host
 import charmhelpers.core.templating as ch_templating
@@ -31,8 +32,12 @@ import interface_ceph_nfs_peer
 
 import interface_hacluster.ops_ha_interface as ops_ha_interface
 
+import call_metrics
+import tuning
 # TODO: Add the below class functionaity to action / relations
-from ganesha import GaneshaNFS
+from ganesha import EXPORT_DEFAULTS, Export, GaneshaNFS, share_options
+from ganesha_dbus import GaneshaDBusError
+from export_cache import ExportCache
 
 import ops_openstack.adapters
 import ops_openstack.core
@@ -100,6 +105,80 @@ class CephNFSContext(object):
     def hostname(self):
         return socket.gethostname()
 
+    @property
+    def client_options(self):
+        """libcephfs options for the [client] section of ceph.conf.
+
+        If client-overrides is invalid, only the dedicated options are
+        rendered, and the unit is blocked by its status check.
+
+        :returns: (option, value) pairs
+        :rtype: List[Tuple[str, str]]
+        """
+        config = self.charm_instance.model.config
+        try:
+            return list(tuning.client_options(config).items())
+        except ValueError as e:
+            logging.warning("Ignoring client-overrides: {}".format(e))
+            return list(tuning.client_options(
+                dict(config, **{'client-overrides': None})).items())
+
+    @property
+    def export_watcher_script(self):
+        return str(self.charm_instance.charm_dir / 'src' / 'export_watcher.py')
+
+    @property
+    def ganesha_stats(self):
+        """Whether Ganesha's statistics are counted and published."""
+        return self.charm_instance.ganesha_stats_enabled
+
+    @property
+    def ganesha_stats_script(self):
+        return str(self.charm_instance.charm_dir / 'src' / 'ganesha_stats.py')
+
+    @property
+    def ganesha_stats_textfile(self):
+        return os.path.join(
+            self.charm_instance.config_get('metrics-textfile-directory') or '',
+            self.charm_instance.GANESHA_STATS_TEXTFILE)
+
+    @property
+    def ganesha_stats_interval(self):
+        return self.charm_instance.config_get('ganesha-stats-interval')
+
+    @property
+    def core_tuning(self):
+        """NFS_CORE_PARAM thread, connection and queue settings.
+
+        :returns: (parameter, value) pairs
+        :rtype: List[Tuple[str, int]]
+        """
+        return [(parameter, chosen['value']) for parameter, chosen
+                in self.charm_instance.ganesha_tuning().items()]
+
+    @property
+    def mdcache(self):
+        """MDCACHE settings for the cache profile.
+
+        :returns: (parameter, value) pairs
+        :rtype: List[Tuple[str, int]]
+        """
+        profile = self.charm_instance.cache_profile
+        _, memory = tuning.host_resources()
+        return list(tuning.mdcache_tuning(profile, memory).items())
+
+    @property
+    def cache_profile(self):
+        return self.charm_instance.cache_profile
+
+    @property
+    def export_defaults(self):
+        return list(EXPORT_DEFAULTS.items())
+
+    @property
+    def attr_expiration_time(self):
+        return self.charm_instance.attr_expiration_time
+
 
 class OpenStackContextAdapters(
         ops_openstack.adapters.OpenStackRelationAdapters):
@@ -155,16 +234,29 @@ class CephNFSAdapters(OpenStackContextAdapters):
     }
 
 
+def with_timings(handler):
+    """Add the action's call timings to its results, if configured."""
+    @functools.wraps(handler)
+    def wrapper(self, event):
+        with self.metrics.timed('action', handler.__name__):
+            handler(self, event)
+        if self.config_get('action-timings'):
+            event.set_results({'timings': self.metrics.summary()})
+    return wrapper
+
+
 class CephNFSCharm(
         ops_openstack.plugins.classes.BaseCephClientCharm):
     """Ceph NFS Base Charm."""
 
-    PACKAGES = ['nfs-ganesha-ceph', 'nfs-ganesha-rados-grace', 'ceph-common']
+    PACKAGES = [
+        'nfs-ganesha-ceph', 'nfs-ganesha-rados-grace', 'ceph-common',
+        'python3-rados', 'python3-dbus']
 
     CEPH_CAPABILITIES = [
         "mgr", "allow rw",
         "mds", "allow *",
-        "osd", "allow rw",
+        "osd", "allow rwx",
         "mon", "allow r, "
         "allow command \"auth del\", "
         "allow command \"auth caps\", "
@@ -180,16 +272,39 @@ class CephNFSCharm(
     CEPH_CONF = CEPH_CONFIG_PATH / 'ceph.conf'
     GANESHA_KEYRING = CEPH_GANESHA_CONFIG_PATH / 'ceph.keyring'
     GANESHA_CONF = GANESHA_CONFIG_PATH / 'ganesha.conf'
+    GANESHA_EXPORT_DEFAULTS = (
+        GANESHA_CONFIG_PATH / 'ceph-nfs-export-defaults.conf')
 
     SERVICES = ['nfs-ganesha']
+    # Not a service: changes to the files mapped to it only need Ganesha to
+    # reload its exports
+    GANESHA_RELOAD = 'nfs-ganesha-reload'
+    EXPORT_WATCHER_SERVICE = 'ceph-nfs-export-watcher'
+    EXPORT_WATCHER_UNIT = Path(
+        '/etc/systemd/system/{}.service'.format(EXPORT_WATCHER_SERVICE))
+
+    GANESHA_STATS_TIMER = 'ceph-nfs-ganesha-stats.timer'
+    GANESHA_STATS_SERVICE_UNIT = Path(
+        '/etc/systemd/system/ceph-nfs-ganesha-stats.service')
+    GANESHA_STATS_TIMER_UNIT = Path(
+        '/etc/systemd/system/{}'.format(GANESHA_STATS_TIMER))
+
+    EXPORT_CACHE_FILE = 'export-cache.json'
+    CALL_METRICS_STATE_FILE = 'call-metrics.json'
+    CALL_METRICS_TEXTFILE = 'ceph-nfs-charm.prom'
+    GANESHA_STATS_TEXTFILE = 'ganesha.prom'
 
     LB_SERVICE_NAME = "nfs-ganesha"
     NFS_PORT = 2049
 
     RESTART_MAP = {
         str(GANESHA_CONF): SERVICES,
-        str(CEPH_CONF): SERVICES,
-        str(GANESHA_KEYRING): SERVICES}
+        str(GANESHA_EXPORT_DEFAULTS): [GANESHA_RELOAD],
+        str(CEPH_CONF): SERVICES + [EXPORT_WATCHER_SERVICE],
+        str(GANESHA_KEYRING): SERVICES + [EXPORT_WATCHER_SERVICE],
+        str(EXPORT_WATCHER_UNIT): [EXPORT_WATCHER_SERVICE],
+        str(GANESHA_STATS_SERVICE_UNIT): [GANESHA_STATS_TIMER],
+        str(GANESHA_STATS_TIMER_UNIT): [GANESHA_STATS_TIMER]}
 
     release = 'default'
 
@@ -201,6 +316,8 @@ class CephNFSCharm(
             is_started=False,
             is_cluster_setup=False
         )
+        self._ganesha_client = None
+        self.metrics = call_metrics.CallRecorder()
         self.ceph_client = ceph_client.CephClientRequires(
             self,
             'ceph-client')
@@ -221,7 +338,7 @@ class CephNFSCharm(
             self.render_config)
         self.framework.observe(
             self.on.config_changed,
-            self.request_ceph_pool)
+            self.refresh_request)
         self.framework.observe(
             self.on.upgrade_charm,
             self.render_config)
@@ -237,9 +354,18 @@ class CephNFSCharm(
         self.framework.observe(
             self.peers.on.reload_nonce,
             self.on_reload_nonce)
+        self.framework.observe(
+            self.peers.on.export_changes,
+            self.on_export_changes)
         self.framework.observe(
             self.ha.on.ha_ready,
             self._configure_hacluster)
+        self.framework.observe(
+            self.framework.on.commit,
+            self.publish_call_metrics)
+        self.framework.observe(
+            self.framework.on.commit,
+            self.close_ganesha_client)
         # Actions
         self.framework.observe(
             self.on.create_share_action,
@@ -254,6 +380,10 @@ class CephNFSCharm(
             self.on.delete_share_action,
             self.delete_share_action
         )
+        self.framework.observe(
+            self.on.update_share_action,
+            self.update_share_action
+        )
         self.framework.observe(
             self.on.grant_access_action,
             self.grant_access_action
@@ -262,6 +392,46 @@ class CephNFSCharm(
             self.on.revoke_access_action,
             self.revoke_access_action
         )
+        self.framework.observe(
+            self.on.bulk_create_shares_action,
+            self.bulk_create_shares_action
+        )
+        self.framework.observe(
+            self.on.bulk_grant_access_action,
+            self.bulk_grant_access_action
+        )
+        self.framework.observe(
+            self.on.bulk_revoke_access_action,
+            self.bulk_revoke_access_action
+        )
+        self.framework.observe(
+            self.on.optimize_acls_action,
+            self.optimize_acls_action
+        )
+        self.framework.observe(
+            self.on.show_tuning_action,
+            self.show_tuning_action
+        )
+        self.framework.observe(
+            self.on.minimize_exports_action,
+            self.minimize_exports_action
+        )
+
+    def custom_status_check(self):
+        """Block the unit on invalid libcephfs client overrides."""
+        try:
+            if not super().custom_status_check():
+                return False
+        except NotImplementedError:
+            pass
+        try:
+            tuning.parse_client_overrides(
+                self.config_get('client-overrides'))
+        except ValueError as e:
+            self.unit.status = BlockedStatus(
+                'Invalid configuration: {}'.format(e))
+            return False
+        return True
 
     def _get_bind_ip(self) -> str:
         """Return the IP to bind the dashboard to"""
@@ -291,7 +461,83 @@ class CephNFSCharm(
 
     @property
     def ganesha_client(self):
-        return GaneshaNFS(self.client_name, self.pool_name)
+        """Ganesha client shared by everything run in this hook.
+
+        The client, and the RADOS connection it holds, is created on first
+        use and reused until the hook or action exits.
+        """
+        if self._ganesha_client is None:
+            self._ganesha_client = GaneshaNFS(
+                self.client_name, self.pool_name,
+                fetch_concurrency=self.config_get('export-fetch-concurrency'),
+                cache=self.export_cache,
+                recorder=self.metrics)
+        return self._ganesha_client
+
+    @property
+    def export_cache(self):
+        """Local cache of parsed exports, or None if it is disabled."""
+        max_entries = self.config_get('export-cache-size')
+        if not max_entries:
+            return None
+        return ExportCache(self.charm_dir / self.EXPORT_CACHE_FILE,
+                           max_entries=max_entries)
+
+    @property
+    def cache_profile(self):
+        """The configured cache-profile, coherent if it is unknown."""
+        return tuning.cache_profile(self.config_get('cache-profile'))
+
+    @property
+    def attr_expiration_time(self):
+        """Seconds Ganesha caches attributes for.
+
+        :returns: attr-expiration-time if set, else the cache profile's
+        :rtype: int
+        """
+        seconds = self.config_get('attr-expiration-time')
+        if seconds is None:
+            return tuning.attr_expiration_time(self.cache_profile)
+        return max(seconds, 0)
+
+    def ganesha_tuning(self):
+        """Ganesha's RPC settings for this unit's CPUs and memory.
+
+        :returns: Value and source ('auto' or 'config') by parameter
+        :rtype: Dict[str, Dict]
+        """
+        cpus, memory = tuning.host_resources()
+        return tuning.ganesha_tuning(cpus, memory, self.model.config)
+
+    def _check_call(self, op, cmd):
+        """Run a command, recording how long it took under op."""
+        with self.metrics.timed('exec', op):
+            subprocess.check_call(cmd)
+
+    @property
+    def ganesha_stats_enabled(self):
+        """Whether Ganesha's statistics are to be counted and published."""
+        if not self.config_get('ganesha-stats'):
+            return False
+        return bool(self.config_get('metrics-textfile-directory'))
+
+    def publish_call_metrics(self, _event):
+        """Add this hook's calls to the textfile for node-exporter."""
+        directory = self.config_get('metrics-textfile-directory')
+        if not directory:
+            return
+        try:
+            self.metrics.publish(
+                os.path.join(directory, self.CALL_METRICS_TEXTFILE),
+                str(self.charm_dir / self.CALL_METRICS_STATE_FILE))
+        except OSError as e:
+            logging.warning("Failed to write call metrics: {}".format(e))
+
+    def close_ganesha_client(self, _event):
+        """Release the RADOS connection held by this hook's client."""
+        if self._ganesha_client is not None:
+            self._ganesha_client.close()
+            self._ganesha_client = None
 
     def request_ceph_pool(self, event):
         """Request pools from Ceph cluster."""
@@ -342,10 +588,21 @@ class CephNFSCharm(
         def daemon_reload_and_restart(service_name):
             logging.debug("restarting {} after config change"
                           .format(service_name))
-            subprocess.check_call(['systemctl', 'daemon-reload'])
-            subprocess.check_call(['systemctl', 'restart', service_name])
-
-        rfuncs = {}
+            self._check_call('systemctl daemon-reload',
+                             ['systemctl', 'daemon-reload'])
+            self._check_call('systemctl restart',
+                             ['systemctl', 'restart', service_name])
+
+        def reload_stats_timer(timer_name):
+            self._check_call('systemctl daemon-reload',
+                             ['systemctl', 'daemon-reload'])
+            if self.ganesha_stats_enabled:
+                self._check_call('systemctl restart',
+                                 ['systemctl', 'restart', timer_name])
+
+        rfuncs = {self.EXPORT_WATCHER_SERVICE: daemon_reload_and_restart,
+                  self.GANESHA_STATS_TIMER: reload_stats_timer,
+                  self.GANESHA_RELOAD: lambda _: self._reload_ganesha()}
 
         @ch_host.restart_on_change(self.RESTART_MAP, restart_functions=rfuncs)
         def _render_configs():
@@ -356,6 +613,21 @@ class CephNFSCharm(
                     self.adapters)
         logging.info("Rendering config")
         _render_configs()
+        self._check_call(
+            'systemctl enable',
+            ['systemctl', 'enable', '--now', self.EXPORT_WATCHER_SERVICE])
+        if self.ganesha_stats_enabled:
+            self._check_call(
+                'systemctl enable',
+                ['systemctl', 'enable', '--now', self.GANESHA_STATS_TIMER])
+        else:
+            if self.config_get('ganesha-stats'):
+                logging.warning("ganesha-stats needs metrics-textfile-"
+                                "directory to be set, not publishing Ganesha "
+                                "statistics")
+            self._check_call(
+                'systemctl disable',
+                ['systemctl', 'disable', '--now', self.GANESHA_STATS_TIMER])
         logging.info("Setting started state")
         self._stored.is_started = True
         self.update_status()
@@ -363,7 +635,7 @@ class CephNFSCharm(
 
     def on_departing(self, event):
         logging.debug("Removing this unit from Ganesha cluster")
-        subprocess.check_call([
+        self._check_call('ganesha-rados-grace remove', [
             'ganesha-rados-grace', '--userid', self.client_name,
             '--cephconf', self.CEPH_CONF, '--pool', self.pool_name,
             'remove', socket.gethostname()])
@@ -371,34 +643,16 @@ class CephNFSCharm(
 
     def setup_ganesha(self, event):
         if not self._stored.is_cluster_setup:
-            subprocess.check_call([
+            self._check_call('ganesha-rados-grace add', [
                 'ganesha-rados-grace', '--userid', self.client_name,
                 '--cephconf', self.CEPH_CONF, '--pool', self.pool_name,
                 'add', socket.gethostname()])
             self._stored.is_cluster_setup = True
         if not self.model.unit.is_leader():
             return
-        cmd = [
-            'rados', '-p', self.pool_name,
-            '-c', self.CEPH_CONF,
-            '--id', self.client_name,
-            'put', 'ganesha-export-index', '/dev/null'
-        ]
         if not self.peers.pool_initialised:
             try:
-                logging.debug("Creating ganesha-export-index in Ceph")
-                subprocess.check_call(cmd)
-                counter = tempfile.NamedTemporaryFile('w+')
-                counter.write('1000')
-                counter.seek(0)
-                logging.debug("Creating ganesha-export-counter in Ceph")
-                cmd = [
-                    'rados', '-p', self.pool_name,
-                    '-c', self.CEPH_CONF,
-                    '--id', self.client_name,
-                    'put', 'ganesha-export-counter', counter.name
-                ]
-                subprocess.check_call(cmd)
+                self.ganesha_client.initialise_pool()
                 self.peers.initialised_pool()
             except subprocess.CalledProcessError:
                 logging.error("Failed to setup ganesha index object")
@@ -419,14 +673,47 @@ class CephNFSCharm(
     def on_pool_initialised(self, event):
         try:
             logging.debug("Restarting Ganesha after pool initialisation")
-            subprocess.check_call(['systemctl', 'restart', 'nfs-ganesha'])
+            self._check_call('systemctl restart',
+                             ['systemctl', 'restart', 'nfs-ganesha'])
         except subprocess.CalledProcessError:
             logging.error("Failed torestart nfs-ganesha")
             event.defer()
 
+    def _reload_ganesha(self):
+        """Have Ganesha reload its config and exports, without a restart."""
+        with self.metrics.timed('exec', 'killall'):
+            subprocess.call(['killall', '-HUP', 'ganesha.nfsd'])
+
     def on_reload_nonce(self, _event):
         logging.info("Reloading Ganesha after nonce triggered reload")
-        subprocess.call(['killall', '-HUP', 'ganesha.nfsd'])
+        self._reload_ganesha()
+
+    def on_export_changes(self, event):
+        """Apply export changes journaled by the leader, one at a time."""
+        logging.info("Applying {} export changes".format(len(event.changes)))
+        try:
+            for _seq, op, export_id, version in event.changes:
+                self.ganesha_client.apply_change(op, export_id, version)
+        except (GaneshaDBusError, subprocess.CalledProcessError) as e:
+            logging.warning("Failed to apply export changes, reloading "
+                            "Ganesha: {}".format(e))
+            self.on_reload_nonce(event)
+
+    def _publish_export_changes(self):
+        """Hand the exports changed on this unit to its peers.
+
+        Changes are journaled in the peer relation and also sent straight
+        to the export watcher on each unit, which applies them without
+        waiting for the relation hooks to run.
+        """
+        changes = self.ganesha_client.pop_changes()
+        self.peers.publish_export_changes(changes)
+        try:
+            self.ganesha_client.notify_changes(changes)
+        except (subprocess.CalledProcessError,
+                subprocess.TimeoutExpired) as e:
+            logging.warning("Failed to notify export watchers: {}"
+                            .format(e))
 
     def _get_binding_subnet_map(self):
         bindings = {}
@@ -457,6 +744,7 @@ class CephNFSCharm(
         return self._get_space_vip_mapping().get(
             'public', [ingress_address])[0]
 
+    @with_timings
     def create_share_action(self, event):
         if not self.model.unit.is_leader():
             event.fail("Share creation needs to be run "
@@ -466,28 +754,38 @@ class CephNFSCharm(
         name = event.params.get('name')
         allowed_ips = event.params.get('allowed-ips')
         allowed_ips = [ip.strip() for ip in allowed_ips.split(',')]
+        try:
+            options = self._share_options(event.params)
+        except ValueError as e:
+            event.fail(str(e))
+            return
         export_path = self.ganesha_client.create_share(
-            size=share_size, name=name, access_ips=allowed_ips)
+            size=share_size, name=name, access_ips=allowed_ips,
+            options=options)
         if not export_path:
             event.fail("Failed to create share, check the "
                        "log for more details")
             return
-        self.peers.trigger_reload()
+        self._publish_export_changes()
         event.set_results({
             "message": "Share created",
             "path": export_path,
             "ip": self.access_address()})
 
+    @with_timings
     def list_shares_action(self, event):
-        exports = self.ganesha_client.list_shares()
+        exports = self.ganesha_client.list_shares(
+            refresh=bool(event.params.get('refresh')))
         event.set_results({
             "exports": [
                 {
                     "id": export.export_id, "name": export.name
                 } for export in exports
-            ]
+            ],
+            "config-cache": Export.conf_cache.stats(),
         })
 
+    @with_timings
     def delete_share_action(self, event):
         if not self.model.unit.is_leader():
             event.fail("Share creation needs to be run "
@@ -496,11 +794,44 @@ class CephNFSCharm(
         name = event.params.get('name')
         purge = event.params.get('purge')
         self.ganesha_client.delete_share(name, purge=purge)
-        self.peers.trigger_reload()
+        self._publish_export_changes()
         event.set_results({
             "message": "Share deleted",
         })
 
+    @staticmethod
+    def _share_options(params):
+        """Share options from a share action's parameters.
+
+        :raises: ValueError for an unknown profile
+        """
+        return share_options(
+            params.get('profile'),
+            attr_expiration_time=params.get('attr-expiration-time'),
+            read_only=params.get('read-only'))
+
+    @with_timings
+    def update_share_action(self, event):
+        if not self.model.unit.is_leader():
+            event.fail("Share update needs to be run "
+                       "from the application leader")
+            return
+        name = event.params.get('name')
+        try:
+            options = self._share_options(event.params)
+        except ValueError as e:
+            event.fail(str(e))
+            return
+        res = self.ganesha_client.update_share(name, options)
+        if res is not None:
+            event.fail(res)
+            return
+        self._publish_export_changes()
+        event.set_results({
+            "message": "Share updated",
+        })
+
+    @with_timings
     def grant_access_action(self, event):
         if not self.model.unit.is_leader():
             event.fail("Share creation needs to be run "
@@ -512,11 +843,12 @@ class CephNFSCharm(
         if res is not None:
             event.fail(res)
             return
-        self.peers.trigger_reload()
+        self._publish_export_changes()
         event.set_results({
             "message": "Acess granted",
         })
 
+    @with_timings
     def revoke_access_action(self, event):
         if not self.model.unit.is_leader():
             event.fail("Share creation needs to be run "
@@ -528,11 +860,148 @@ class CephNFSCharm(
         if res is not None:
             event.fail(res)
             return
-        self.peers.trigger_reload()
+        self._publish_export_changes()
         event.set_results({
             "message": "Access revoked",
         })
 
+    @staticmethod
+    def _load_bulk_spec(raw):
+        """Parse a JSON or YAML list of mappings that each have a name.
+
+        :raises: ValueError if the spec is malformed
+        """
+        try:
+            spec = yaml.safe_load(raw or '')
+        except yaml.YAMLError as e:
+            raise ValueError("Unable to parse spec: {}".format(e))
+        if not isinstance(spec, list) or not all(
+                isinstance(item, dict) and item.get('name')
+                for item in spec):
+            raise ValueError("Spec must be a list of mappings, each with "
+                             "a name")
+        return spec
+
+    # bulk-create-shares options that actions.yaml would type check for
+    # create-share: (option, type, description)
+    BULK_SHARE_TYPES = (
+        ('size', int, 'an integer'),
+        ('attr-expiration-time', int, 'an integer'),
+        ('read-only', bool, 'true or false'),
+    )
+
+    @classmethod
+    def _bulk_share(cls, item):
+        """The create_shares spec for one bulk-create-shares entry.
+
+        :raises: ValueError if an option of the entry is invalid
+        """
+        for option, option_type, description in cls.BULK_SHARE_TYPES:
+            value = item.get(option)
+            if value is None:
+                continue
+            # bool is a subclass of int
+            valid = isinstance(value, option_type)
+            if option_type is int and isinstance(value, bool):
+                valid = False
+            if not valid:
+                raise ValueError('{} must be {}'.format(option, description))
+        return {
+            'name': str(item['name']),
+            'size': item.get('size'),
+            'access_ips': cls._split_ips(
+                item.get('allowed-ips', '0.0.0.0/0')),
+            'options': cls._share_options(item),
+        }
+
+    @staticmethod
+    def _split_ips(ips):
+        if isinstance(ips, str):
+            ips = ips.split(',')
+        return [str(ip).strip() for ip in ips]
+
+    @with_timings
+    def bulk_create_shares_action(self, event):
+        if not self.model.unit.is_leader():
+            event.fail("Share creation needs to be run "
+                       "from the application leader")
+            return
+        try:
+            spec = self._load_bulk_spec(event.params.get('shares'))
+        except ValueError as e:
+            event.fail(str(e))
+            return
+        shares = []
+        for item in spec:
+            try:
+                shares.append(self._bulk_share(item))
+            except ValueError as e:
+                shares.append({'name': str(item['name']), 'error': str(e)})
+        # The index is rewritten once, however many shares are created
+        with self.ganesha_client.index_batch():
+            created = iter(self.ganesha_client.create_shares(
+                [share for share in shares if 'error' not in share]))
+        results = [
+            share if 'error' in share else next(created)
+            for share in shares]
+        self._publish_export_changes()
+        failed = [result for result in results if 'error' in result]
+        event.set_results({
+            "message": "Created {} shares, {} failed".format(
+                len(results) - len(failed), len(failed)),
+            "shares": results,
+            "ip": self.access_address()})
+
+    def _bulk_access_action(self, event, revoke):
+        if not self.model.unit.is_leader():
+            event.fail("Share creation needs to be run "
+                       "from the application leader")
+            return
+        try:
+            spec = self._load_bulk_spec(event.params.get('clients'))
+        except ValueError as e:
+            event.fail(str(e))
+            return
+        changes = [
+            {'name': str(item['name']), 'client': client}
+            for item in spec
+            for client in self._split_ips(
+                item.get('clients', item.get('client', [])))]
+        results = self.ganesha_client.update_access(changes, revoke=revoke)
+        self._publish_export_changes()
+        failed = [result for result in results if 'error' in result]
+        event.set_results({
+            "message": "Updated {} clients, {} failed".format(
+                len(results) - len(failed), len(failed)),
+            "clients": results})
+
+    @with_timings
+    def bulk_grant_access_action(self, event):
+        self._bulk_access_action(event, revoke=False)
+
+    @with_timings
+    def bulk_revoke_access_action(self, event):
+        self._bulk_access_action(event, revoke=True)
+
+    @with_timings
+    def optimize_acls_action(self, event):
+        if not self.model.unit.is_leader():
+            event.fail("ACL optimization needs to be run "
+                       "from the application leader")
+            return
+        dry_run = bool(event.params.get('dry-run'))
+        results = self.ganesha_client.optimize_acls(dry_run=dry_run)
+        if not dry_run:
+            self._publish_export_changes()
+        removed = sum(result['before'] - result['after']
+                      for result in results)
+        event.set_results({
+            "message": "{} {} client entries from {} shares".format(
+                "Would remove" if dry_run else "Removed",
+                removed, len(results)),
+            "shares": results})
+
+    @with_timings
     def resize_share_action(self, event):
         name = event.params.get('name')
         size = event.params.get('size')
@@ -543,6 +1012,44 @@ class CephNFSCharm(
             "message": f"{name} is now {size}GB",
         })
 
+    @with_timings
+    def minimize_exports_action(self, event):
+        if not self.model.unit.is_leader():
+            event.fail("Export migration needs to be run "
+                       "from the application leader")
+            return
+        dry_run = bool(event.params.get('dry-run'))
+        counts = self.ganesha_client.minimize_exports(dry_run=dry_run)
+        if not dry_run:
+            self._publish_export_changes()
+        event.set_results({
+            "exports": counts['exports'],
+            "bytes-before": counts['before'],
+            "bytes-after": counts['after'],
+            "bytes-saved": counts['before'] - counts['after'],
+        })
+
+    def show_tuning_action(self, event):
+        cpus, memory = tuning.host_resources()
+        chosen = tuning.ganesha_tuning(cpus, memory, self.model.config)
+        profile = self.cache_profile
+        cache = {
+            parameter.lower().replace('_', '-'): value
+            for parameter, value in tuning.mdcache_tuning(
+                profile, memory).items()
+        }
+        cache['attr-expiration-time'] = self.attr_expiration_time
+        cache['profile'] = profile
+        event.set_results({
+            "cpus": cpus,
+            "memory-mib": memory // tuning.MIB,
+            "tuning": {
+                tuning.PARAMETERS[parameter][0]: values
+                for parameter, values in chosen.items()
+            },
+            "cache": cache,
+        })
+
 
 @ops_openstack.core.charm_class
 class CephNFSCharmPacific(CephNFSCharm):
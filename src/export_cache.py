@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# Copyright 2026 OpenStack Charmers
+# See LICENSE file for licensing details.
+
+"""On-disk cache of parsed Ganesha exports.
+
+Each entry holds the parsed form of one export object together with the
+stamp (size and modification time) the object had when it was read. A
+cached entry is only used while the object's current stamp still matches,
+so revalidating an export costs a stat rather than a full read and parse.
+
+The cache is written back by save(), once per hook or action, and only
+when entries were added, replaced or dropped. How recently entries were
+used is saved along with such changes but does not cause a write itself.
+The file is only readable by its owner, as exports hold their share's
+cephx key.
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Objects modified this recently are not cached: RADOS mtimes have one
+# second resolution, so a second write within the same second could keep
+# the same stamp.
+RACY_WINDOW = 2
+
+Stamp = Tuple[int, float]
+
+
+class ExportCache(object):
+    """Bounded, stamp-validated cache of export dictionaries.
+
+    :param path: File the cache is persisted to
+    :param max_entries: Maximum number of exports kept; the least recently
+                        used entries are evicted beyond this.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self._entries = None
+        self._clock = 0
+        self._dirty = False
+
+    @property
+    def entries(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            self._entries = self._load()
+            self._clock = max(
+                (entry['used'] for entry in self._entries.values()),
+                default=0)
+        return self._entries
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning("Ignoring unreadable export cache {}: {}"
+                            .format(self.path, e))
+            return {}
+
+    def _touch(self, entry: Dict):
+        self._clock += 1
+        entry['used'] = self._clock
+
+    def get(self, name: str, stamp: Stamp) -> Optional[Dict]:
+        """Return the cached export for an object if it is still current.
+
+        :param name: Name of the export object
+        :param stamp: The object's current (size, mtime)
+        :returns: The cached export dictionary, or None
+        """
+        entry = self.entries.get(name)
+        if entry is None:
+            return None
+        if tuple(entry['stamp']) != tuple(stamp):
+            del self.entries[name]
+            self._dirty = True
+            return None
+        self._touch(entry)
+        return entry['export']
+
+    def put(self, name: str, stamp: Stamp, export: Dict):
+        """Cache the parsed export read from an object with a given stamp.
+
+        :param name: Name of the export object
+        :param stamp: The object's (size, mtime) when it was read
+        :param export: The parsed export dictionary
+        """
+        if stamp[1] >= time.time() - RACY_WINDOW:
+            self.discard(name)
+            return
+        entry = {'stamp': list(stamp), 'export': export}
+        self.entries[name] = entry
+        self._touch(entry)
+        self._dirty = True
+
+    def discard(self, name: str):
+        """Drop any cached entry for an object."""
+        if self.entries.pop(name, None) is not None:
+            self._dirty = True
+
+    def save(self):
+        """Evict entries beyond max_entries and persist the cache."""
+        if not self._dirty:
+            return
+        entries = self.entries
+        if len(entries) > self.max_entries:
+            keep = sorted(entries, key=lambda name: entries[name]['used'],
+                          reverse=True)[:self.max_entries]
+            self._entries = entries = {name: entries[name] for name in keep}
+        tmp_path = '{}.tmp'.format(self.path)
+        # The exports hold their cephx keys, so only root may read them
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.fchmod(fd, 0o600)
+        with open(fd, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
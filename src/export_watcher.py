@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# Copyright 2026 OpenStack Charmers
+# See LICENSE file for licensing details.
+
+"""Apply export changes to the local Ganesha as soon as they are made.
+
+The leader notifies watchers of the export index object with each batch
+of export changes it makes. This daemon watches the index and applies the
+changes to the local Ganesha over D-Bus, so they do not wait for the
+peer relation hooks to run. Ganesha is resynced with the index when the
+daemon starts, whenever its watch is lost and after a change fails,
+retrying until the resync succeeds. The service is restarted along with
+nfs-ganesha.
+
+Watching needs librados, so the daemon only runs with LibradosBackend.
+Changes this unit has already given Ganesha, such as those made by the
+leader itself, are skipped, as are unchanged exports on a resync.
+"""
+
+import argparse
+import json
+import logging
+import queue
+import subprocess
+import time
+
+import ganesha
+import ganesha_dbus
+import rados_backend
+
+# Queued in place of a batch of changes to ask for a full resync
+RESYNC = 'resync'
+
+# Failures of Ganesha, RADOS or the staged export files that a later
+# resync may recover from
+SYNC_ERRORS = (ganesha_dbus.GaneshaDBusError, subprocess.CalledProcessError,
+               OSError)
+
+
+class ExportWatcher(object):
+    """Queue notified export changes and apply them one batch at a time.
+
+    Notifications are handled on librados' callback thread, so they are
+    only decoded there and applied from the thread calling run.
+
+    :param client: Client for the export pool and the local Ganesha
+    """
+
+    # Seconds to wait before retrying a failed resync, doubled after each
+    # failure up to resync_max_delay
+    resync_delay = 1
+    resync_max_delay = 60
+
+    def __init__(self, client: ganesha.GaneshaNFS):
+        self.client = client
+        self.queue = queue.Queue()
+        self._watch = None
+        self._retry_delay = self.resync_delay
+
+    def on_notify(self, notify_id, notifier_id, watch_id, data):
+        try:
+            payload = json.loads(data)
+        except (TypeError, ValueError) as e:
+            logging.warning("Ignoring malformed notification: {}".format(e))
+            return
+        if payload.get('resync'):
+            self.queue.put(RESYNC)
+        else:
+            self.queue.put(payload.get('changes', []))
+
+    def on_error(self, watch_id, error):
+        logging.warning("Lost watch on the export index: {}".format(error))
+        self.queue.put(RESYNC)
+
+    def watch(self):
+        """(Re)establish the watch on the export index."""
+        self.close()
+        self._watch = self.client.watch_changes(self.on_notify,
+                                                self.on_error)
+
+    def close(self):
+        if self._watch is not None:
+            self._watch.close()
+            self._watch = None
+
+    def resync(self):
+        logging.info("Resyncing Ganesha with the export index")
+        counts = self.client.sync_exports()
+        logging.info("Resynced exports: {}".format(counts))
+
+    def process(self, item):
+        """Apply one queued batch of changes, or resync.
+
+        A change that fails leaves Ganesha in an unknown state, so a
+        resync is queued after it. A resync that fails, for instance while
+        Ganesha restarts, is retried with backoff.
+        """
+        if item == RESYNC:
+            try:
+                self.watch()
+                self.resync()
+            except SYNC_ERRORS as e:
+                logging.warning("Failed to resync, retrying in {}s: {}"
+                                .format(self._retry_delay, e))
+                time.sleep(self._retry_delay)
+                self._retry_delay = min(self._retry_delay * 2,
+                                        self.resync_max_delay)
+                self.queue.put(RESYNC)
+            else:
+                self._retry_delay = self.resync_delay
+            return
+        for op, export_id, version in item:
+            try:
+                self.client.apply_change(op, export_id, version)
+            except SYNC_ERRORS as e:
+                logging.warning("Failed to apply {} of export {}: {}"
+                                .format(op, export_id, e))
+                self.queue.put(RESYNC)
+                return
+
+    def run(self):
+        """Resync, then apply changes as they are notified. Never returns.
+        """
+        self.queue.put(RESYNC)
+        while True:
+            self.process(self.queue.get())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--id', required=True, dest='client_name',
+                        help='CephX user to connect as')
+    parser.add_argument('--pool', required=True,
+                        help='Pool holding the export objects')
+    parser.add_argument('--conf', default=rados_backend.CEPH_CONF,
+                        help='Ceph configuration file')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO,
+                        format='%(levelname)s %(message)s')
+    try:
+        backend = rados_backend.LibradosBackend(
+            args.client_name, args.pool, args.conf)
+    except RuntimeError as e:
+        parser.exit(1, "The export watcher needs librados: {}\n".format(e))
+    client = ganesha.GaneshaNFS(args.client_name, args.pool, backend=backend)
+    watcher = ExportWatcher(client)
+    try:
+        watcher.run()
+    finally:
+        watcher.close()
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,22 +2,446 @@
 # Copyright 2021 OpenStack Charmers
 # See LICENSE file for licensing details.
 
+import bisect
+import call_metrics
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import ganesha_dbus
+import hashlib
+import ipaddress
 import json
 import logging
 import manager
+import os
+import rados_backend
 import subprocess
-from typing import Dict, List, Optional
-import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+import time
 import uuid
 
 logger = logging.getLogger(__name__)
 
 
+# Settings shared by every export, rendered into the EXPORT_DEFAULTS block
+# of ganesha.conf and so left out of the export objects. FSAL and Pseudo
+# cannot have defaults, and a default Access_Type would apply to clients
+# outside the CLIENT blocks.
+EXPORT_DEFAULTS = collections.OrderedDict([
+    ('Squash', 'None'),
+])
+
+# Per-share options, each set by a share profile: the seconds Ganesha
+# caches the share's attributes for (None for the export defaults), and
+# whether its clients may only read
+SHARE_OPTIONS = ('attr_expiration_time', 'read_only')
+
+SHARE_PROFILES = {
+    'default': {'attr_expiration_time': None, 'read_only': False},
+    # Shares mostly read, by clients that can do with attributes a minute
+    # stale, e.g. build artifacts
+    'read-mostly': {'attr_expiration_time': 60, 'read_only': False},
+    'read-only': {'attr_expiration_time': 300, 'read_only': True},
+}
+
+
+def share_options(profile: Optional[str] = None, **options) -> Dict:
+    """Resolve a share profile and explicitly given share options.
+
+    :param profile: One of SHARE_PROFILES, or None
+    :param options: SHARE_OPTIONS overriding the profile's. Options that
+                    are None are not set.
+    :returns: The options to set on the share
+    :raises: ValueError for an unknown profile or option
+    """
+    if profile is not None and profile not in SHARE_PROFILES:
+        raise ValueError('Unknown profile {}, expected one of {}'.format(
+            profile, ', '.join(sorted(SHARE_PROFILES))))
+    resolved = dict(SHARE_PROFILES[profile]) if profile else {}
+    for option, value in options.items():
+        if option not in SHARE_OPTIONS:
+            raise ValueError('Unknown share option {}'.format(option))
+        if value is not None:
+            resolved[option] = value
+    return resolved
+
+
 # TODO: Add ACL with kerberos
 
 
+def _copy_conf(conf):
+    """Copy a parsed config, sharing its immutable leaves."""
+    if isinstance(conf, dict):
+        return {key: _copy_conf(value) for key, value in conf.items()}
+    if isinstance(conf, list):
+        return [_copy_conf(value) for value in conf]
+    return conf
+
+
+class _ConfCacheEntry(object):
+    __slots__ = ('options', 'text')
+
+    def __init__(self, options: Dict):
+        # Export options parsed from the config, never handed out
+        self.options = options
+        # The options serialized by manager.mkconf, once needed
+        self.text = None
+
+
+class ExportConfCache(object):
+    """Bounded LRU cache of parsed and serialized export configs.
+
+    Entries are keyed by a digest of the export config. Exports are
+    always given their own copy of a cached entry's options, and an
+    export whose options still equal the entry's reuses the entry's
+    serialized config.
+
+    :param max_entries: Number of configs kept before the least recently
+                        used are evicted. Raised by reserve to fit every
+                        export when all of them are listed.
+    """
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.parse_hits = 0
+        self.parse_misses = 0
+        self.serialize_hits = 0
+        self.serialize_misses = 0
+
+    @staticmethod
+    def _key(export: str) -> bytes:
+        return hashlib.blake2b(export.encode('utf-8'),
+                               digest_size=16).digest()
+
+    def parse(self, export: str) -> 'Export':
+        """Parse an export config, reusing an earlier parse of it."""
+        key = self._key(export)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.parse_hits += 1
+            else:
+                self.parse_misses += 1
+        if entry is None:
+            parsed = Export(export_options=manager.parseconf(export))
+            entry = _ConfCacheEntry(_copy_conf(parsed.export_options))
+            with self._lock:
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        else:
+            parsed = Export(export_options=_copy_conf(entry.options))
+        parsed._conf_entry = entry
+        return parsed
+
+    def serialize(self, export: 'Export') -> str:
+        """Serialize an export, reusing the config it was parsed from."""
+        entry = export._conf_entry
+        if entry is None or export.export_options != entry.options:
+            self._count_serialize(hit=False)
+            return manager.mkconf(export.export_options)
+        text = entry.text
+        self._count_serialize(hit=text is not None)
+        if text is None:
+            text = entry.text = manager.mkconf(entry.options)
+        return text
+
+    def _count_serialize(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.serialize_hits += 1
+            else:
+                self.serialize_misses += 1
+
+    def reserve(self, count: int):
+        """Make room for count configs, so a scan of that many exports
+        does not evict the configs it is about to parse again.
+        """
+        with self._lock:
+            self.max_entries = max(self.max_entries, count)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit and miss counters, and the number of cached configs."""
+        return {
+            'entries': len(self._entries),
+            'parse-hits': self.parse_hits,
+            'parse-misses': self.parse_misses,
+            'serialize-hits': self.serialize_hits,
+            'serialize-misses': self.serialize_misses,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _command_name(*cmd: str) -> str:
+    """Name a ceph command by its prefix, leaving out its arguments."""
+    try:
+        return rados_backend.build_command(*cmd)[1]['prefix']
+    except ValueError:
+        return cmd[0] if cmd else ''
+
+
+# Ganesha matches every client to this entry, and does not accept 0.0.0.0/0
+MATCH_ALL_CLIENT = '0.0.0.0'
+MATCH_ALL_NETWORK = ipaddress.ip_network('0.0.0.0/0')
+
+
+def _client_network(client: str):
+    """The network a client entry names.
+
+    0.0.0.0 and every IPv4 /0 name MATCH_ALL_NETWORK.
+
+    :returns: An IPv4Network or IPv6Network, or None for hostnames,
+              wildcards and netgroups
+    """
+    try:
+        network = ipaddress.ip_network(client, strict=False)
+    except ValueError:
+        return None
+    if network.version == 4 and not int(network.network_address) and \
+            network.prefixlen in (0, network.max_prefixlen):
+        return MATCH_ALL_NETWORK
+    return network
+
+
+def _network_key(network) -> str:
+    """Normal form of a client network: bare addresses for hosts."""
+    if network == MATCH_ALL_NETWORK:
+        return MATCH_ALL_CLIENT
+    if network.prefixlen == network.max_prefixlen:
+        return str(network.network_address)
+    return str(network)
+
+
+class _Networks(object):
+    """Networks of one IP version and prefix length, by network address.
+
+    The addresses are also kept sorted, so that the networks within a
+    larger one are found by bisection.
+    """
+
+    __slots__ = ('keys', 'addresses')
+
+    def __init__(self):
+        self.keys = {}
+        self.addresses = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, address: int, key: str):
+        self.keys[address] = key
+        bisect.insort(self.addresses, address)
+
+    def remove(self, address: int):
+        del self.keys[address]
+        del self.addresses[bisect.bisect_left(self.addresses, address)]
+
+    def within(self, first: int, last: int) -> List[str]:
+        """Keys of the networks whose addresses are in [first, last]."""
+        start = bisect.bisect_left(self.addresses, first)
+        end = bisect.bisect_right(self.addresses, last, start)
+        return [self.keys[address] for address in self.addresses[start:end]]
+
+
+class ClientACL(object):
+    """The clients of an export, as an ordered set per access type.
+
+    Addresses and networks are kept in normal form, and an address or
+    network is only added to an access type if no network already there
+    covers it. Other client entries are kept as given.
+
+    MATCH_ALL_CLIENT admits every client, but is kept apart from the other
+    entries: it neither covers them when they are added or removed, nor
+    is covered by them.
+
+    Networks are indexed by version and prefix length, so finding the
+    entries covering or covered by a network costs a lookup or bisection
+    per prefix length in use, however many entries there are.
+
+    :param blocks: The export's CLIENT blocks
+    :raises: RuntimeError if a block's access type is not r, ro or rw
+    """
+
+    __slots__ = ('modes', '_networks')
+
+    MODES = ('r', 'ro', 'rw')
+
+    def __init__(self, blocks: List[Dict[str, str]] = ()):
+        # Dictionaries keep insertion order, unlike sets. Each entry maps
+        # to its network, or None if it is not an address or network.
+        self.modes = {mode: {} for mode in self.MODES}
+        # Per mode, _Networks by (version, prefix length)
+        self._networks = {mode: {} for mode in self.MODES}
+        for block in blocks:
+            mode = block['Access_Type'].lower()
+            if mode not in self.modes:
+                raise RuntimeError("Invalid access type")
+            for client in block['Clients'].split(','):
+                self.add(client, mode)
+
+    def __contains__(self, client: str) -> bool:
+        if any(MATCH_ALL_CLIENT in clients
+               for clients in self.modes.values()):
+            return True
+        network = _client_network(client.strip())
+        if network is None:
+            return any(client in clients for clients in self.modes.values())
+        return any(self._covering(mode, network) is not None
+                   for mode in self.MODES)
+
+    def __len__(self) -> int:
+        return sum(len(clients) for clients in self.modes.values())
+
+    def _insert(self, mode: str, key: str, network):
+        self.modes[mode][key] = network
+        if network is not None:
+            prefix = (network.version, network.prefixlen)
+            networks = self._networks[mode].get(prefix)
+            if networks is None:
+                networks = self._networks[mode][prefix] = _Networks()
+            networks.add(int(network.network_address), key)
+
+    def _delete(self, mode: str, key: str):
+        network = self.modes[mode].pop(key)
+        if network is not None:
+            prefix = (network.version, network.prefixlen)
+            networks = self._networks[mode][prefix]
+            networks.remove(int(network.network_address))
+            if not networks:
+                del self._networks[mode][prefix]
+
+    def _covering(self, mode: str, network) -> Optional[str]:
+        """The entry of an access type covering a network, if any.
+
+        MATCH_ALL_CLIENT is not taken to cover anything.
+        """
+        address = int(network.network_address)
+        for (version, prefixlen), networks in self._networks[mode].items():
+            if version != network.version or not prefixlen or \
+                    prefixlen > network.prefixlen:
+                continue
+            host_bits = network.max_prefixlen - prefixlen
+            key = networks.keys.get(address >> host_bits << host_bits)
+            if key is not None:
+                return key
+        return None
+
+    def _covered(self, mode: str, network) -> List[str]:
+        """The entries of an access type a network strictly covers."""
+        if network.prefixlen == network.max_prefixlen or \
+                network == MATCH_ALL_NETWORK:
+            return []
+        host_bits = network.max_prefixlen - network.prefixlen
+        first = int(network.network_address)
+        last = first | ((1 << host_bits) - 1)
+        covered = []
+        for (version, prefixlen), networks in self._networks[mode].items():
+            if version == network.version and prefixlen > network.prefixlen:
+                covered.extend(networks.within(first, last))
+        return covered
+
+    def add(self, client: str, mode: str = 'rw'):
+        mode = mode.lower()
+        client = client.strip()
+        network = _client_network(client)
+        if network is None:
+            self.modes[mode].setdefault(client, None)
+            return
+        key = _network_key(network)
+        if key in self.modes[mode] or \
+                self._covering(mode, network) is not None:
+            return
+        for covered in self._covered(mode, network):
+            self._delete(mode, covered)
+        self._insert(mode, key, network)
+
+    def discard(self, client: str):
+        """Remove a client from every access type.
+
+        Removing a network removes the entries it covers. A client that is
+        only part of a larger network is left alone, as is the network.
+        """
+        client = client.strip()
+        network = _client_network(client)
+        for mode, clients in self.modes.items():
+            if network is None:
+                clients.pop(client, None)
+                continue
+            for key in self._covered(mode, network):
+                self._delete(mode, key)
+            key = _network_key(network)
+            if key in clients:
+                self._delete(mode, key)
+                continue
+            covering = self._covering(mode, network)
+            if covering is not None:
+                logging.warning("Not revoking {}, which is part of {}"
+                                .format(client, covering))
+
+    def move(self, source: str, target: str):
+        """Give every client of one access type another instead."""
+        for key in list(self.modes[source]):
+            self._delete(source, key)
+            self.add(key, target)
+
+    def optimize(self):
+        """Collapse adjacent networks within each access type."""
+        for mode, clients in self.modes.items():
+            others = []
+            networks = {4: [], 6: []}
+            match_all = []
+            for key, network in clients.items():
+                if network is None:
+                    others.append(key)
+                elif network == MATCH_ALL_NETWORK:
+                    match_all.append(network)
+                else:
+                    networks[network.version].append(network)
+            self.modes[mode] = dict.fromkeys(others)
+            self._networks[mode] = {}
+            for network in match_all:
+                self._insert(mode, MATCH_ALL_CLIENT, network)
+            for version in (4, 6):
+                for network in ipaddress.collapse_addresses(
+                        networks[version]):
+                    self._insert(mode, _network_key(network), network)
+
+    def by_mode(self) -> Dict[str, List[str]]:
+        """Clients by access type, with ro only for read-only exports."""
+        return {mode: list(clients) for mode, clients in self.modes.items()
+                if clients or mode != 'ro'}
+
+    def to_blocks(self) -> List[Dict[str, str]]:
+        """CLIENT blocks granting each access type to its clients."""
+        return [
+            {'Access_Type': mode, 'Clients': ', '.join(clients)}
+            for mode, clients in self.modes.items() if clients]
+
+
+# Raised by Export.from_export for configs that are not a valid export
+EXPORT_PARSE_ERRORS = (KeyError, TypeError, ValueError, RuntimeError)
+
+
 class Export(object):
-    """Object that encodes and decodes Ganesha export blocks"""
+    """Object that encodes and decodes Ganesha export blocks
+
+    Clients are indexed in a ClientACL the first time they are needed.
+    Changes made through add_client and remove_client are written back
+    to the CLIENT blocks of export_options when it is next read, and
+    exports whose clients are never changed keep their blocks as parsed.
+    """
+
+    __slots__ = ('_export_options', '_acl', '_acl_changed', '_conf_entry')
+
+    # Shared by every Export parsed with from_export
+    conf_cache = ExportConfCache()
 
     def __init__(self, export_options: Optional[Dict] = None):
         if export_options is None:
@@ -25,16 +449,36 @@ class Export(object):
         if isinstance(export_options, Export):
             raise RuntimeError('export_options must be a dictionary')
         self.export_options = export_options
-        if not isinstance(self.export_options['EXPORT']['CLIENT'], list):
-            self.export_options['EXPORT']['CLIENT'] = [
-                self.export_options['EXPORT']['CLIENT']
-            ]
+        self._conf_entry = None
+        # Exports whose last client was revoked have no CLIENT block
+        clients = self.export_options['EXPORT'].setdefault('CLIENT', [])
+        if not isinstance(clients, list):
+            self.export_options['EXPORT']['CLIENT'] = [clients]
 
     def from_export(export: str) -> 'Export':
-        return Export(export_options=manager.parseconf(export))
+        return Export.conf_cache.parse(export)
 
     def to_export(self) -> str:
-        return manager.mkconf(self.export_options)
+        return Export.conf_cache.serialize(self)
+
+    @property
+    def export_options(self) -> Dict:
+        if self._acl_changed:
+            self._export_options['EXPORT']['CLIENT'] = self._acl.to_blocks()
+            self._acl_changed = False
+        return self._export_options
+
+    @export_options.setter
+    def export_options(self, export_options: Dict):
+        self._export_options = export_options
+        self._acl = None
+        self._acl_changed = False
+
+    @property
+    def acl(self) -> ClientACL:
+        if self._acl is None:
+            self._acl = ClientACL(self.export_options['EXPORT']['CLIENT'])
+        return self._acl
 
     @property
     def name(self):
@@ -51,107 +495,285 @@ class Export(object):
 
     @property
     def clients_by_mode(self):
-        clients_by_mode = {'r': [], 'rw': []}
-        for client in self.clients:
-            if client['Access_Type'].lower() == 'r':
-                clients_by_mode['r'] += [
-                    s.strip() for s in client['Clients'].split(',')
-                ]
-            elif client['Access_Type'].lower() == 'rw':
-                clients_by_mode['rw'] += [
-                    s.strip() for s in client['Clients'].split(',')
-                ]
-            else:
-                raise RuntimeError("Invalid access type")
-        return clients_by_mode
+        return self.acl.by_mode()
 
     @property
     def export_id(self) -> int:
-        return int(self.export_options['EXPORT']['Export_Id'])
+        return int(self._export_options['EXPORT']['Export_Id'])
 
     @property
     def path(self) -> str:
-        return self.export_options['EXPORT']['Path']
+        return self._export_options['EXPORT']['Path']
+
+    @property
+    def read_only(self) -> bool:
+        """Whether the export's clients may only read."""
+        modes = self.acl.modes
+        return bool(modes['ro']) and not modes['rw']
+
+    @read_only.setter
+    def read_only(self, read_only: bool):
+        if read_only:
+            self.acl.move('rw', 'ro')
+        else:
+            self.acl.move('ro', 'rw')
+        self._acl_changed = True
+
+    @property
+    def attr_expiration_time(self) -> Optional[int]:
+        value = self.export.get('Attr_Expiration_Time')
+        return None if value is None else int(value)
+
+    @attr_expiration_time.setter
+    def attr_expiration_time(self, seconds: Optional[int]):
+        if seconds is None:
+            self.export.pop('Attr_Expiration_Time', None)
+        else:
+            self.export['Attr_Expiration_Time'] = int(seconds)
+
+    @property
+    def options(self) -> Dict:
+        """The export's SHARE_OPTIONS."""
+        return {option: getattr(self, option) for option in SHARE_OPTIONS}
+
+    def set_options(self, options: Dict):
+        """Set SHARE_OPTIONS, as resolved by share_options."""
+        for option, value in options.items():
+            if option not in SHARE_OPTIONS:
+                raise ValueError('Unknown share option {}'.format(option))
+            setattr(self, option, value)
 
     def add_client(self, client: str):
-        mode = "rw"
-        clients_by_mode = self.clients_by_mode
-        logging.info(f"About to add {client} to {clients_by_mode}")
-        if client not in clients_by_mode[mode.lower()]:
-            clients_by_mode[mode.lower()].append(client)
-        logging.info(f"new clients_by_mode: to {clients_by_mode}")
-        self.export_options['EXPORT']['CLIENT'] = []
-        for (mode, clients) in clients_by_mode.items():
-            if clients:
-                logging.info(f"Adding {clients} to self.export_options")
-                self.export_options['EXPORT']['CLIENT'].append(
-                    {'Access_Type': mode, 'Clients': ', '.join(clients)})
+        logging.info(f"Adding {client} to export {self.export_id}")
+        self.acl.add(client, 'ro' if self.read_only else 'rw')
+        self._acl_changed = True
 
     def remove_client(self, client: str):
-        clients_by_mode = self.clients_by_mode
-        for (mode, clients) in clients_by_mode.items():
-            clients_by_mode[mode] = [
-                old_client for old_client in clients if old_client != client
-            ]
-        self.export_options['EXPORT']['CLIENT'] = []
-        for (mode, clients) in clients_by_mode.items():
-            if clients:
-                self.export_options['EXPORT']['CLIENT'].append(
-                    {'Access_Type': mode, 'Clients': ', '.join(clients)})
+        self.acl.discard(client)
+        self._acl_changed = True
+
+    def strip_defaults(self) -> bool:
+        """Remove settings equal to their EXPORT_DEFAULTS value.
+
+        :returns: Whether any setting was removed
+        """
+        export = self.export
+        stripped = False
+        for key, value in EXPORT_DEFAULTS.items():
+            if str(export.get(key, '')).lower() == value.lower():
+                del export[key]
+                stripped = True
+        return stripped
+
+    def optimize_acl(self) -> Tuple[int, int]:
+        """Collapse the export's client networks.
+
+        :returns: The number of client entries before and after
+        """
+        acl = self.acl
+        before = acl.by_mode()
+        acl.optimize()
+        if acl.by_mode() != before:
+            self._acl_changed = True
+        return sum(len(clients) for clients in before.values()), len(acl)
 
 
 class GaneshaNFS(object):
     export_index = "ganesha-export-index"
     export_counter = "ganesha-export-counter"
+    # Maps share names and paths to export IDs, see _lookup_export_ids
+    export_lookup = "ganesha-export-lookup"
+    export_lookup_version_key = "lookup-version"
+    # Set on the index's omap once it, rather than the text, is the index
+    export_index_version_key = "index-version"
+    # tmpfs directory export blocks are staged in for Ganesha's D-Bus API
+    export_dir = "/run/ceph-nfs"
+    # Default number of export objects fetched from RADOS at once
+    fetch_concurrency = 16
+    # Advisory lock serialising updates to the export counter
+    export_counter_lock = "ganesha-export-counter-lock"
+    export_counter_lock_duration = 30
+    export_counter_lock_attempts = 20
+    # Advisory lock serialising rewrites of the index's %url text view
+    export_index_lock = "ganesha-export-index-lock"
+    # Watchers of the export index are notified of export changes. Larger
+    # batches ask them to resync instead of carrying every change.
+    export_notify_timeout_ms = 5000
+    export_notify_max_changes = 500
 
-    def __init__(self, client_name, ceph_pool):
+    def __init__(self, client_name, ceph_pool, backend=None,
+                 fetch_concurrency=None, cache=None, export_mgr=None,
+                 recorder=None):
         self.client_name = client_name
         self.ceph_pool = ceph_pool
+        self.cache = cache
+        if export_mgr is None:
+            export_mgr = ganesha_dbus.ExportMgr()
+        if fetch_concurrency is not None:
+            self.fetch_concurrency = max(1, fetch_concurrency)
+        if backend is None:
+            backend = rados_backend.get_backend(client_name, ceph_pool)
+        if recorder is not None:
+            # Time every call to the cluster and to Ganesha
+            backend = call_metrics.Instrumented(
+                backend, 'rados', recorder, kinds={'command': 'ceph'},
+                names={'command': _command_name})
+            export_mgr = call_metrics.Instrumented(
+                export_mgr, 'dbus', recorder)
+        self.export_mgr = export_mgr
+        self.backend = backend
+        self._index_migrated = False
+        self._export_id_lease = []
+        self._index_batch_depth = 0
+        self._index_dirty = False
+        # (op, export_id, version) for each export changed by this client
+        self.changes = []
+
+    def close(self):
+        """Save the export cache and release the backend's connection."""
+        if self.cache is not None:
+            self.cache.save()
+        self.backend.close()
 
     def create_share(self, name: str = None, size: int = None,
-                     access_ips: List[str] = None) -> str:
+                     access_ips: List[str] = None,
+                     options: Dict = None) -> str:
         """Create a CephFS Share and export it via Ganesha
 
         :param name: String name of the share to create
         :param size: Int size in gigabytes of the share to create
+        :param options: Share options, as resolved by share_options
 
         :returns: Path to the export
         """
-        if name is None:
-            name = str(uuid.uuid4())
-        else:
-            existing_shares = [
-                share for share in self.list_shares() if share.name == name
-            ]
-            if existing_shares:
-                return existing_shares[0].path
+        result = self.create_shares([
+            {'name': name, 'size': size, 'access_ips': access_ips,
+             'options': options}])[0]
+        return result.get('path')
+
+    def create_shares(self, shares: List[Dict]) -> List[Dict]:
+        """Create several CephFS shares and export them via Ganesha
+
+        Existing shares are looked up together, the CephFS subvolumes are
+        created and authorised concurrently, export IDs are leased as one
+        block and the export index is written once for the whole batch.
+
+        :param shares: Dictionaries with the 'name', 'size' (in gigabytes),
+                       'access_ips' and share 'options' of each share.
+                       Only 'name' is required, and may be None to
+                       generate one.
+        :returns: A dictionary per share with its 'name' and either its
+                  'path' and whether it was 'created', or an 'error'.
+        :rtype: List[Dict]
+        """
+        results = []
+        pending = []
+        seen = set()
+        named = list(dict.fromkeys(
+            spec['name'] for spec in shares if spec.get('name') is not None))
+        existing = dict(zip(named, self.get_shares(named) if named else []))
+        for spec in shares:
+            name = spec.get('name')
+            if name is None:
+                name = str(uuid.uuid4())
+            result = {'name': name}
+            results.append(result)
+            if name in seen:
+                result['error'] = 'Share requested more than once'
+                continue
+            seen.add(name)
+            existing_share = existing.get(name)
+            if existing_share is not None:
+                result.update(path=existing_share.path, created=False)
+                continue
+            pending.append((result, spec))
+        if len(pending) > 1:
+            self.reserve_export_ids(len(pending))
+
+        provisioned = self._map_concurrently(
+            lambda item: self._provision_share(
+                item[0]['name'], item[1].get('size')),
+            pending)
+        built = []
+        for (result, spec), share in zip(pending, provisioned):
+            if share is None:
+                result['error'] = ('Failed to create share, check the '
+                                   'log for more details')
+                continue
+            path, secret = share
+            export = self._new_export(
+                self._get_next_export_id(), result['name'], path, secret,
+                spec.get('access_ips'))
+            export.set_options(spec.get('options') or {})
+            template = export.to_export()
+            logging.debug("Export template::\n{}".format(template))
+            built.append((result, export, template))
+        stored = self._map_concurrently(
+            lambda item: self._try_put(
+                self._export_object_name(item[1].export_id), item[2]),
+            built)
+        created = []
+        for (result, export, template), ok in zip(built, stored):
+            if not ok:
+                result['error'] = ('Failed to store the export, check the '
+                                   'log for more details')
+                continue
+            result.update(path=export.path, created=True)
+            created.append(export)
+            self._record_change('add', export.export_id, template)
+            try:
+                self._ganesha_add_export(
+                    export.export_id, export.path, template)
+            except ganesha_dbus.GaneshaDBusError as e:
+                logging.warning("Failed to add export {} to Ganesha: {}"
+                                .format(export.export_id, e))
+        if created:
+            with self.index_batch():
+                self._add_shares_to_index(
+                    [export.export_id for export in created])
+                self._add_shares_to_lookup(created)
+        return results
+
+    def _provision_share(self, name: str,
+                         size: Optional[int]) -> Optional[Tuple[str, str]]:
+        """Create and authorise the CephFS subvolume backing a share.
+
+        :returns: The subvolume path and the CephX key for the share, or
+                  None if provisioning failed.
+        """
+        size_in_bytes = None
         if size is not None:
             size_in_bytes = size * 1024 * 1024 * 1024
+        path = self._create_cephfs_share(name, size_in_bytes)
+        if not path:
+            return None
+        try:
+            secret = self._ceph_auth_key('ganesha-{}'.format(name))
+        except subprocess.CalledProcessError:
+            logging.error("failed to get the key for share {}".format(name))
+            return None
+        return path, secret
+
+    def _new_export(self, export_id: int, name: str, path: str,
+                    secret: str, access_ips: List[str] = None) -> Export:
+        """Build the export for a newly provisioned share."""
         if access_ips is None:
             access_ips = ['0.0.0.0']
         # Ganesha deals with networks just fine, except when the network is
         # 0.0.0.0/0, then it has to be 0.0.0.0 which works as expected :-/
-        if '0.0.0.0/0' in access_ips:
-            access_ips[access_ips.index('0.0.0.0/0')] = '0.0.0.0'
-
-        access_id = 'ganesha-{}'.format(name)
-        path = self._create_cephfs_share(name, size_in_bytes)
-        if not path:
-            return
-        self.export_path = path
-        export_id = self._get_next_export_id()
-        export = Export(
+        access_ips = [
+            '0.0.0.0' if ip == '0.0.0.0/0' else ip for ip in access_ips]
+        return Export(
             {
                 'EXPORT': {
                     'Export_Id': export_id,
-                    'Path': self.export_path,
+                    'Path': path,
                     'FSAL': {
                         'Name': 'Ceph',
-                        'User_Id': access_id,
-                        'Secret_Access_Key': self._ceph_auth_key(access_id)
+                        'User_Id': 'ganesha-{}'.format(name),
+                        'Secret_Access_Key': secret
                     },
-                    'Pseudo': self.export_path,
-                    'Squash': 'None',
+                    'Pseudo': path,
                     'CLIENT': [
                         {
                             'Access_Type': 'RW',
@@ -161,30 +783,71 @@ class GaneshaNFS(object):
                 }
             }
         )
-        export_template = export.to_export()
-        logging.debug("Export template::\n{}".format(export_template))
-        tmp_file = self._tmpfile(export_template)
-        self._rados_put('ganesha-export-{}'.format(export_id), tmp_file.name)
-        self._ganesha_add_export(self.export_path, tmp_file.name)
-        self._add_share_to_index(export_id)
-        return self.export_path
-
-    def list_shares(self) -> List[Export]:
-        share_urls = [
-            url.replace('%url rados://{}/'.format(self.ceph_pool), '')
-            for url
-            in self._rados_get('ganesha-export-index').splitlines()]
-        exports_raw = [
-            self._rados_get(url)
-            for url in share_urls
-            if url.strip()
-        ]
+
+    def list_shares(self, refresh: bool = False) -> List[Export]:
+        """List the shares in the export index.
+
+        When the client has an export cache, cached exports are
+        revalidated against the objects' current size and mtime and only
+        changed exports are read from RADOS.
+
+        :param refresh: Re-read every export, ignoring the cache
+        :returns: The exports, in index order
+        """
+        names = [
+            self._export_object_name(export_id)
+            for export_id in self._index_export_ids()]
+        Export.conf_cache.reserve(len(names))
+        exports = self._read_exports(names, refresh=refresh)
+        logging.info("Export config cache: {}".format(
+            Export.conf_cache.stats()))
+        return [export for export in exports if export is not None]
+
+    def _read_exports(self, names: List[str], refresh: bool = False,
+                      use_cache: bool = True) -> List[Optional[Export]]:
+        """Read and parse export objects, using the cache where possible.
+
+        :param names: Names of the export objects
+        :param refresh: Re-read every export, ignoring cached entries
+        :param use_cache: Whether to revalidate and update the export cache
+        :returns: The exports, with None for unreadable ones
+        """
+        cache = self.cache if use_cache else None
+        if cache is None:
+            stamps = [None] * len(names)
+            cached = [None] * len(names)
+        else:
+            stamps = self._map_concurrently(self._rados_stat, names)
+            cached = [
+                None if refresh or stamp is None
+                else cache.get(name, stamp)
+                for name, stamp in zip(names, stamps)]
+        missing = [
+            name for name, entry in zip(names, cached) if entry is None]
+        fetched = dict(zip(missing, self._rados_get_many(missing)))
         exports = []
-        for export_raw in exports_raw:
+        for name, stamp, entry in zip(names, stamps, cached):
+            if entry is not None:
+                exports.append(Export(_copy_conf(entry)))
+                continue
+            export_raw = fetched[name]
+            if export_raw is None:
+                exports.append(None)
+                continue
             try:
-                exports.append(Export.from_export(export_raw))
-            except RuntimeError:
-                logging.warning("Encountered an independently created export")
+                export = Export.from_export(export_raw)
+            except EXPORT_PARSE_ERRORS as e:
+                # One bad object must not hide every other share
+                logging.warning("Skipping export {} that cannot be parsed: "
+                                "{!r}".format(name, e))
+                exports.append(None)
+                continue
+            if cache is not None and stamp is not None:
+                cache.put(
+                    name, stamp, _copy_conf(export.export_options))
+            exports.append(export)
+        logging.debug("Export config cache: {}".format(
+            Export.conf_cache.stats()))
         return exports
 
     def resize_share(self, name: str, size: int):
@@ -193,18 +856,18 @@ class GaneshaNFS(object):
                                      str(size_in_bytes), '--no_shrink')
 
     def delete_share(self, name: str, purge=False):
-        share = [share for share in self.list_shares() if share.name == name]
-        if share:
-            share = share[0]
-        else:
+        share = self.get_share(name)
+        if share is None:
             return
         logging.info("About to remove export {} ({})"
                      .format(share.name, share.export_id))
         self._ganesha_remove_export(share.export_id)
+        self._record_change('remove', share.export_id)
         logging.debug("Removing export from index")
         self._remove_share_from_index(share.export_id)
+        self._remove_share_from_lookup(share)
         logging.debug("Removing export file from RADOS")
-        self._rados_rm('ganesha-export-{}'.format(share.export_id))
+        self._rados_rm(self._export_object_name(share.export_id))
         if purge:
             self._delete_cephfs_share(name)
 
@@ -213,63 +876,432 @@ class GaneshaNFS(object):
         if share is None:
             return 'Share does not exist'
         share.add_client(client)
-        export_template = share.to_export()
-        logging.debug("Export template::\n{}".format(export_template))
-        tmp_file = self._tmpfile(export_template)
-        self._rados_put('ganesha-export-{}'.format(share.export_id),
-                        tmp_file.name)
-        self._ganesha_update_export(share.export_id, tmp_file.name)
+        self._write_share(share)
 
     def revoke_access(self, name: str, client: str):
         share = self.get_share(name)
         if share is None:
             return 'Share does not exist'
         share.remove_client(client)
+        self._write_share(share)
+
+    def update_access(self, changes: List[Dict],
+                      revoke: bool = False) -> List[Dict]:
+        """Grant or revoke access to several shares at once.
+
+        Shares are looked up together and written concurrently, and each
+        share is written once however many of its clients change.
+
+        :param changes: Dictionaries with the share 'name' and 'client'
+        :param revoke: Revoke rather than grant access
+        :returns: The changes, each with an 'error' added if it failed
+        :rtype: List[Dict]
+        """
+        results = [dict(change) for change in changes]
+        names = list(dict.fromkeys(result['name'] for result in results))
+        shares = dict(zip(names, self.get_shares(names)))
+        for result in results:
+            share = shares[result['name']]
+            if share is None:
+                result['error'] = 'Share does not exist'
+            elif revoke:
+                share.remove_client(result['client'])
+            else:
+                share.add_client(result['client'])
+        modified = [share for share in shares.values() if share is not None]
+        templates = self._map_concurrently(
+            self._try_store_share, modified)
+        errors = {}
+        for share, template in zip(modified, templates):
+            if template is None:
+                errors[share.name] = ('Failed to store the share, check '
+                                      'the log for more details')
+                continue
+            try:
+                self._ganesha_update_export(share.export_id, template)
+            except ganesha_dbus.GaneshaDBusError as e:
+                logging.warning("Failed to update export {} in Ganesha: {}"
+                                .format(share.export_id, e))
+                errors[share.name] = ('Stored, but not applied by Ganesha: '
+                                      '{}'.format(e))
+        for result in results:
+            if 'error' not in result and result['name'] in errors:
+                result['error'] = errors[result['name']]
+        return results
+
+    def optimize_acls(self, dry_run: bool = False) -> List[Dict]:
+        """Collapse the client networks of every share's ACL.
+
+        :param dry_run: Report the savings without writing any share
+        :returns: The 'name' of each share whose ACL would shrink, with
+                  its client entry count 'before' and 'after'
+        :rtype: List[Dict]
+        """
+        results = []
+        modified = []
+        for share in self.list_shares():
+            try:
+                before, after = share.optimize_acl()
+            except RuntimeError as e:
+                logging.warning("Skipping ACL of export {}: {}"
+                                .format(share.export_id, e))
+                continue
+            if after < before:
+                results.append(
+                    {'name': share.name, 'before': before, 'after': after})
+                modified.append(share)
+        if not dry_run:
+            templates = self._map_concurrently(self._store_share, modified)
+            for share, template in zip(modified, templates):
+                self._ganesha_update_export(share.export_id, template)
+        return results
+
+    def minimize_exports(self, dry_run: bool = False) -> Dict[str, int]:
+        """Remove the settings EXPORT_DEFAULTS provides from every export.
+
+        Ganesha must already have the EXPORT_DEFAULTS block, or the
+        exports lose these settings when they are updated.
+
+        :param dry_run: Report the savings without writing any export
+        :returns: The number of 'exports' changed, and the total size in
+                  bytes of every export object 'before' and 'after'
+        """
+        before = after = 0
+        modified = []
+        for share in self.list_shares():
+            before += len(share.to_export().encode('utf-8'))
+            if share.strip_defaults():
+                modified.append(share)
+            after += len(share.to_export().encode('utf-8'))
+        if not dry_run:
+            templates = self._map_concurrently(self._store_share, modified)
+            for share, template in zip(modified, templates):
+                self._ganesha_update_export(share.export_id, template)
+        return {'exports': len(modified), 'before': before, 'after': after}
+
+    def get_share(self, name: str) -> Optional[Export]:
+        """Look up a share by name.
+
+        :param name: Name of the share
+        :returns: The share's export, or None if there is no such share
+        """
+        return self._get_shares_by('name', [name])[0]
+
+    def get_shares(self, names: List[str]) -> List[Optional[Export]]:
+        """Look up several shares by name, reading their exports at once.
+
+        :param names: Names of the shares
+        :returns: Each share's export, or None if there is no such share
+        """
+        return self._get_shares_by('name', names)
+
+    def _get_shares_by(self, attribute: str,
+                       values: List[str]) -> List[Optional[Export]]:
+        """Look up shares through the lookup object.
+
+        This costs one omap read of the lookup and one read per share
+        found. The export cache is bypassed, as revalidating an entry
+        would add a stat to every read.
+        """
+        export_ids = self._lookup_export_ids(attribute, values)
+        found = [(value, export_id)
+                 for value, export_id in zip(values, export_ids)
+                 if export_id is not None]
+        exports = self._read_exports(
+            [self._export_object_name(export_id) for _, export_id in found],
+            use_cache=False)
+        shares = {}
+        for (value, export_id), share in zip(found, exports):
+            if share is None:
+                logging.warning("Export {} for {} {} is unreadable"
+                                .format(export_id, attribute, value))
+            elif getattr(share, attribute) != value:
+                logging.warning("Lookup for {} {} returned export {}"
+                                .format(attribute, value, export_id))
+            else:
+                shares[value] = share
+        return [shares.get(value) for value in values]
+
+    def initialise_pool(self):
+        """Create an empty export index and the export counter."""
+        logging.debug("Creating {} in Ceph".format(self.export_index))
+        self._rados_put(self.export_index, '')
+        self._rados_omap_set(self.export_index,
+                             {self.export_index_version_key: '1'})
+        logging.debug("Creating {} in Ceph".format(self.export_counter))
+        self._rados_put(self.export_counter, '1000')
+
+    def update_share(self, name: str, options: Dict) -> Optional[str]:
+        """Change a share's options, which Ganesha applies without a restart.
+
+        :param name: Name of the share
+        :param options: Share options, as resolved by share_options
+        :returns: An error message, or None if the share was updated
+        """
+        share = self.get_share(name)
+        if share is None:
+            return 'Share does not exist'
+        share.set_options(options)
+        self._write_share(share)
+
+    def _write_share(self, share: Export):
+        """Store a modified export in RADOS and update it in Ganesha."""
+        export_template = self._store_share(share)
+        self._ganesha_update_export(share.export_id, export_template)
+
+    def _store_share(self, share: Export) -> str:
+        """Store a modified export in RADOS.
+
+        :returns: The serialized export
+        """
         export_template = share.to_export()
         logging.debug("Export template::\n{}".format(export_template))
-        tmp_file = self._tmpfile(export_template)
-        self._rados_put('ganesha-export-{}'.format(share.export_id),
-                        tmp_file.name)
-        self._ganesha_update_export(share.export_id, tmp_file.name)
+        self._rados_put(self._export_object_name(share.export_id),
+                        export_template)
+        self._record_change('update', share.export_id, export_template)
+        return export_template
 
-    def get_share(self, name: str) -> Optional[Export]:
-        share = [share for share in self.list_shares() if share.name == name]
-        if share:
-            return share[0]
+    def _try_put(self, name: str, data: str) -> bool:
+        """Store an object in RADOS, logging any failure.
+
+        :returns: Whether the object was stored
+        """
+        try:
+            self._rados_put(name, data)
+        except subprocess.CalledProcessError as e:
+            logging.error("Failed to store {}: {}".format(name, e))
+            return False
+        return True
+
+    def _try_store_share(self, share: Export) -> Optional[str]:
+        """Store a modified export in RADOS, logging any failure.
+
+        :returns: The serialized export, or None if it was not stored
+        """
+        try:
+            return self._store_share(share)
+        except subprocess.CalledProcessError as e:
+            logging.error("Failed to store export {}: {}"
+                          .format(share.export_id, e))
+            return None
 
-    def update_share(self, id):
-        pass
+    @staticmethod
+    def export_version(export_template: str) -> str:
+        """Short digest identifying one revision of an export."""
+        return hashlib.sha1(export_template.encode('utf-8')).hexdigest()[:12]
+
+    def _record_change(self, op: str, export_id: int,
+                       export_template: Optional[str] = None):
+        version = ''
+        if export_template is not None:
+            version = self.export_version(export_template)
+        self.changes.append((op, export_id, version))
+
+    def pop_changes(self) -> List[Tuple[str, int, str]]:
+        """Return and forget the export changes made by this client.
+
+        :returns: (op, export_id, version) tuples, where op is one of
+                  'add', 'update' or 'remove'
+        """
+        changes, self.changes = self.changes, []
+        return changes
+
+    def notify_changes(self, changes: List[Tuple[str, int, str]]):
+        """Notify watchers of the export index of export changes.
+
+        :param changes: (op, export_id, version) tuples, see pop_changes
+        """
+        if not changes:
+            return
+        if len(changes) > self.export_notify_max_changes:
+            payload = {'resync': True}
+        else:
+            payload = {'changes': [list(change) for change in changes]}
+        self.backend.notify(self.export_index, json.dumps(payload),
+                            self.export_notify_timeout_ms)
 
-    def _ganesha_add_export(self, export_path: str, tmp_path: str):
-        """Add a configured NFS export to Ganesha"""
-        self._dbus_send(
-            'ExportMgr', 'AddExport',
-            'string:{}'.format(tmp_path),
-            'string:EXPORT(Path={})'.format(export_path))
+    def watch_changes(self, callback, error_callback):
+        """Watch the export index for notifications sent by notify_changes.
+
+        Only LibradosBackend can watch objects.
+
+        :returns: The watch, which must be closed to stop watching
+        """
+        return self.backend.watch(self.export_index, callback,
+                                  error_callback)
+
+    def sync_exports(self) -> Dict[str, int]:
+        """Bring local Ganesha in line with the export index.
+
+        Every export in the index is updated in Ganesha, or added if
+        Ganesha is not serving it, and exports missing from the index are
+        removed. Exports Ganesha serves as last staged on this unit are
+        left unchanged.
+
+        :returns: Number of exports 'added', 'updated', 'unchanged' and
+                  'removed'
+        """
+        served = set(self.export_mgr.show_exports())
+        counts = {'added': 0, 'updated': 0, 'unchanged': 0, 'removed': 0}
+        shares = self.list_shares()
+        for share in shares:
+            export_template = share.to_export()
+            expression = 'EXPORT(Export_Id={})'.format(share.export_id)
+            if share.export_id not in served:
+                self._apply_export(self.export_mgr.add_export,
+                                   share.export_id, export_template,
+                                   expression)
+                counts['added'] += 1
+            elif self._is_staged(share):
+                counts['unchanged'] += 1
+            else:
+                self._apply_export(self.export_mgr.update_export,
+                                   share.export_id, export_template,
+                                   expression)
+                counts['updated'] += 1
+        # Export 0 is Ganesha's pseudo root rather than a share
+        stale = served - {share.export_id for share in shares} - {0}
+        for export_id in sorted(stale):
+            self._ganesha_remove_export(export_id)
+            counts['removed'] += 1
+        return counts
+
+    def apply_change(self, op: str, export_id: int, version: str = ''):
+        """Apply an export change made on another unit to local Ganesha.
+
+        Added and updated exports are read back from RADOS, so a change
+        that has since been superseded applies the latest revision. An
+        export this unit has already staged for Ganesha as it is, as the
+        leader has for its own changes, is skipped.
+
+        :param op: One of 'add', 'update' or 'remove'
+        :param export_id: ID of the changed export
+        :param version: Revision the change wrote, from export_version
+        :raises: GaneshaDBusError if Ganesha rejects the export
+        """
+        if op == 'remove':
+            try:
+                self._ganesha_remove_export(export_id)
+            except ganesha_dbus.GaneshaDBusError as e:
+                logging.debug("Export {} already removed: {}"
+                              .format(export_id, e))
+            return
+        try:
+            export_template = self._rados_get(
+                self._export_object_name(export_id))
+        except subprocess.CalledProcessError:
+            logging.debug("Export {} no longer exists".format(export_id))
+            return
+        if version and self.export_version(export_template) != version:
+            logging.debug("Export {} has changed again since version {}"
+                          .format(export_id, version))
+        if self._staged_export(export_id) == export_template:
+            logging.debug("Export {} is already applied".format(export_id))
+            return
+        expression = 'EXPORT(Export_Id={})'.format(export_id)
+        calls = [self.export_mgr.update_export, self.export_mgr.add_export]
+        if op == 'add':
+            calls.reverse()
+        try:
+            self._apply_export(calls[0], export_id, export_template,
+                               expression)
+        except ganesha_dbus.GaneshaDBusError as e:
+            logging.debug("Retrying export {} after: {}".format(export_id, e))
+            self._apply_export(calls[1], export_id, export_template,
+                               expression)
+
+    def _export_file(self, export_id: int, export_template: str) -> str:
+        """Stage an export block in a file for Ganesha to read over D-Bus.
+
+        Files are written to export_dir, which lives on tmpfs and is reused
+        between calls, one file per export ID.
+
+        :returns: Path to the staged file
+        """
+        os.makedirs(self.export_dir, mode=0o700, exist_ok=True)
+        path = self._export_file_path(export_id)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(export_template)
+        return path
+
+    def _export_file_path(self, export_id: int) -> str:
+        return os.path.join(self.export_dir,
+                            'export-{}.conf'.format(export_id))
+
+    def _staged_export(self, export_id: int) -> Optional[str]:
+        """The export block last given to Ganesha for an export ID.
+
+        Staged files are removed when Ganesha rejects them and when their
+        export is removed, so this is what Ganesha serves, unless Ganesha
+        has since been restarted and loaded the export from the index.
+
+        :returns: The staged export block, or None if there is none
+        """
+        try:
+            with open(self._export_file_path(export_id)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _is_staged(self, share: Export) -> bool:
+        """Whether the share's export is staged for Ganesha as it is now."""
+        staged = self._staged_export(share.export_id)
+        if staged is None:
+            return False
+        try:
+            staged_options = Export.from_export(staged).export_options
+        except EXPORT_PARSE_ERRORS:
+            return False
+        return staged_options == share.export_options
+
+    def _unstage_export(self, export_id: int):
+        try:
+            os.unlink(self._export_file_path(export_id))
+        except FileNotFoundError:
+            pass
+
+    def _apply_export(self, call, export_id: int, export_template: str,
+                      expression: str) -> Optional[int]:
+        """Stage an export block and hand it to an ExportMgr method.
+
+        :param call: ExportMgr.add_export or ExportMgr.update_export
+        :returns: What call returned
+        :raises: GaneshaDBusError if Ganesha rejects the export
+        """
+        path = self._export_file(export_id, export_template)
+        try:
+            return call(path, expression)
+        except ganesha_dbus.GaneshaDBusError:
+            self._unstage_export(export_id)
+            raise
+
+    def _ganesha_add_export(self, export_id: int, export_path: str,
+                            export_template: str) -> Optional[int]:
+        """Add a configured NFS export to Ganesha
+
+        :returns: Number of exports Ganesha added
+        """
+        return self._apply_export(
+            self.export_mgr.add_export, export_id, export_template,
+            'EXPORT(Path={})'.format(export_path))
 
     def _ganesha_remove_export(self, share_id: int):
         """Remove a configured NFS export from Ganesha"""
-        self._dbus_send(
-            'ExportMgr',
-            'RemoveExport',
-            "uint16:{}".format(share_id))
-
-    def _ganesha_update_export(self, share_id: int, tmp_path: str):
-        """Update a configured NFS export in Ganesha"""
-        self._dbus_send(
-            'ExportMgr', 'UpdateExport',
-            'string:{}'.format(tmp_path),
-            'string:EXPORT(Export_Id={})'.format(share_id))
-
-    def _dbus_send(self, section: str, action: str, *args):
-        """Send a command to Ganesha via Dbus"""
-        cmd = [
-            'dbus-send', '--print-reply', '--system',
-            '--dest=org.ganesha.nfsd',
-            '/org/ganesha/nfsd/{}'.format(section),
-            'org.ganesha.nfsd.exportmgr.{}'.format(action)] + [*args]
-        logging.debug("About to call: {}".format(cmd))
-        return subprocess.check_output(cmd)
+        try:
+            self.export_mgr.remove_export(share_id)
+        finally:
+            self._unstage_export(share_id)
+
+    def _ganesha_update_export(self, share_id: int,
+                               export_template: str) -> Optional[int]:
+        """Update a configured NFS export in Ganesha
+
+        :returns: Number of exports Ganesha updated
+        """
+        return self._apply_export(
+            self.export_mgr.update_export, share_id, export_template,
+            'EXPORT(Export_Id={})'.format(share_id))
 
     def _delete_cephfs_share(self, name: str):
         """Delete a CephFS share.
@@ -309,19 +1341,16 @@ class GaneshaNFS(object):
             return False
 
         try:
-            output = self._ceph_subvolume_command('getpath', 'ceph-fs', name)
-            return output.decode('utf-8').strip()
+            return self._ceph_subvolume_command('getpath', 'ceph-fs', name)
         except subprocess.CalledProcessError:
             logging.error("failed to get path")
             return False
 
-    def _ceph_subvolume_command(
-        self, *cmd: List[str]
-    ) -> subprocess.CompletedProcess:
+    def _ceph_subvolume_command(self, *cmd: List[str]):
         """Run a ceph fs subvolume command"""
         return self._ceph_fs_command('subvolume', *cmd)
 
-    def _ceph_fs_command(self, *cmd: List[str]) -> subprocess.CompletedProcess:
+    def _ceph_fs_command(self, *cmd: List[str]):
         """Run a ceph fs command"""
         return self._ceph_command('fs', *cmd)
 
@@ -332,33 +1361,88 @@ class GaneshaNFS(object):
         :rtype: str
         """
         output = self._ceph_command(
-            'auth', 'get', 'client.{}'.format(access_id), '--format=json')
-        return json.loads(output.decode('UTF-8'))[0]['key']
+            'auth', 'get', 'client.{}'.format(access_id))
+        return output[0]['key']
 
-    def _ceph_command(self, *cmd: List[str]) -> subprocess.CompletedProcess:
-        """Run a ceph command"""
-        cmd = [
-            "ceph", "--id", self.client_name,
-            "--conf=/etc/ceph/ceph.conf"
-        ] + [*cmd]
-        return subprocess.check_output(cmd, stderr=subprocess.DEVNULL)
+    def _ceph_command(self, *cmd: List[str]):
+        """Run a ceph command
+
+        :returns: The command output, decoded from JSON where possible
+        """
+        return self.backend.command(*cmd)
 
     def _get_next_export_id(self) -> int:
         """Retrieve the next available export ID, and update the rados key
 
+        IDs previously leased with reserve_export_ids are handed out first.
+
         :returns: The export ID
-        :rtype: str
+        :rtype: int
+        """
+        if not self._export_id_lease:
+            self.reserve_export_ids(1)
+        return self._export_id_lease.pop(0)
+
+    def reserve_export_ids(self, count: int) -> List[int]:
+        """Lease a block of export IDs for use by this client.
+
+        The block is taken from the export counter in a single atomic
+        update, so provisioning many shares only touches the counter once.
+        IDs left unused when the client goes away are simply skipped.
+
+        :param count: Number of IDs to lease
+        :returns: The leased IDs
+        :rtype: List[int]
+        """
+        first_id = self._allocate_export_ids(count)
+        ids = list(range(first_id, first_id + count))
+        self._export_id_lease.extend(ids)
+        return ids
+
+    def _allocate_export_ids(self, count: int) -> int:
+        """Atomically advance the export counter by count.
+
+        The read-modify-write of the counter is done under an exclusive
+        advisory lock on the counter object, retrying while another unit
+        holds it.
+
+        :param count: Number of IDs to allocate
+        :returns: The first allocated ID
+        :rtype: int
+        :raises: CalledProcessError if the lock cannot be taken
         """
-        next_id = int(self._rados_get(self.export_counter))
-        file = self._tmpfile(next_id + 1)
-        self._rados_put(self.export_counter, file.name)
+        with self._rados_locked(self.export_counter,
+                                self.export_counter_lock):
+            next_id = int(self._rados_get(self.export_counter))
+            self._rados_put(self.export_counter, str(next_id + count))
         return next_id
 
-    def _tmpfile(self, value: str) -> tempfile._TemporaryFileWrapper:
-        file = tempfile.NamedTemporaryFile(mode='w+')
-        file.write(str(value))
-        file.seek(0)
-        return file
+    @contextlib.contextmanager
+    def _rados_locked(self, name: str, lock_name: str):
+        """Hold an exclusive advisory lock on a RADOS object for a block.
+
+        Taking the lock is retried, with backoff, while another unit holds
+        it.
+
+        :param name: Name of the RADOS object to lock
+        :param lock_name: Name of the lock
+        :raises: CalledProcessError if the lock cannot be taken
+        """
+        cookie = str(uuid.uuid4())
+        for attempt in range(self.export_counter_lock_attempts):
+            try:
+                self._rados_lock(name, lock_name, cookie,
+                                 self.export_counter_lock_duration)
+                break
+            except subprocess.CalledProcessError:
+                if attempt + 1 == self.export_counter_lock_attempts:
+                    raise
+                logging.debug("{} is locked, retrying".format(name))
+                time.sleep(min(0.05 * 2 ** attempt, 2))
+        try:
+            yield
+        finally:
+            self._rados_unlock(name, lock_name, cookie)
 
     def _rados_get(self, name: str) -> str:
         """Retrieve the content of the RADOS object with a given name
@@ -368,69 +1452,244 @@ class GaneshaNFS(object):
         :returns: Contents of the RADOS object
         :rtype: str
         """
-        cmd = [
-            'rados', '-p', self.ceph_pool, '--id', self.client_name,
-            'get', name, '/dev/stdout'
-        ]
-        logging.debug("About to call: {}".format(cmd))
-        output = subprocess.check_output(cmd)
-        return output.decode('utf-8')
+        return self.backend.get(name)
 
-    def _rados_put(self, name: str, source: str):
-        """Store the contents of the source file in a named RADOS object.
+    def _rados_put(self, name: str, data: str):
+        """Store data in a named RADOS object.
 
-        :param name: Name of the RADOS object to retrieve
-        :param source: Path to a file to upload to RADOS.
+        :param name: Name of the RADOS object to write
+        :param data: Content to store
 
         :returns: None
         """
-        cmd = [
-            'rados', '-p', self.ceph_pool, '--id', self.client_name,
-            'put', name, source
-        ]
-        logging.debug("About to call: {}".format(cmd))
-        subprocess.check_call(cmd)
+        self.backend.put(name, data)
 
     def _rados_rm(self, name: str):
         """Remove a named RADOS object.
 
         :param name: Name of the RADOS object to remove
-        :param source: Path to a file to upload to RADOS.
 
         :returns: None
         """
-        cmd = [
-            'rados', '-p', self.ceph_pool, '--id', self.client_name,
-            'rm', name
+        self.backend.remove(name)
+
+    def _rados_stat(self, name: str) -> Optional[Tuple[int, float]]:
+        """Return the size and mtime of a RADOS object, or None on error."""
+        try:
+            return self.backend.stat(name)
+        except (subprocess.CalledProcessError, ValueError) as e:
+            logging.warning("Failed to stat {}: {}".format(name, e))
+            return None
+
+    def _rados_get_many(self, names: List[str]) -> List[Optional[str]]:
+        """Retrieve the content of several RADOS objects concurrently.
+
+        An object that cannot be read is logged and returned as None rather
+        than failing the whole batch.
+
+        :param names: Names of the RADOS objects to retrieve
+
+        :returns: Contents of the RADOS objects, in the order requested
+        :rtype: List[Optional[str]]
+        """
+        def fetch(name):
+            try:
+                return self._rados_get(name)
+            except subprocess.CalledProcessError as e:
+                logging.warning("Failed to read {}: {}".format(name, e))
+                return None
+
+        return self._map_concurrently(fetch, names)
+
+    def _map_concurrently(self, func, items: List) -> List:
+        """Apply func to items using up to fetch_concurrency threads.
+
+        :returns: The results, in the order of items
+        """
+        workers = min(self.fetch_concurrency, len(items))
+        if workers <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, items))
+
+    def _rados_lock(self, name: str, lock_name: str, cookie: str,
+                    duration: int):
+        """Take an exclusive advisory lock on a named RADOS object."""
+        self.backend.lock(name, lock_name, cookie, duration)
+
+    def _rados_unlock(self, name: str, lock_name: str, cookie: str):
+        """Release an advisory lock on a named RADOS object."""
+        self.backend.unlock(name, lock_name, cookie)
+
+    def _rados_omap_keys(self, name: str) -> List[str]:
+        """List the omap keys of a named RADOS object."""
+        return self.backend.omap_keys(name)
+
+    def _rados_omap_get(self, name: str, keys: List[str]) -> Dict[str, str]:
+        """Retrieve the values of some omap keys of a named RADOS object."""
+        return self.backend.omap_get(name, keys)
+
+    def _rados_omap_set(self, name: str, values: Dict[str, str]):
+        """Set omap keys on a named RADOS object."""
+        self.backend.omap_set(name, values)
+
+    def _rados_omap_rm(self, name: str, keys: List[str]):
+        """Remove omap keys from a named RADOS object."""
+        self.backend.omap_remove(name, keys)
+
+    @staticmethod
+    def _export_object_name(export_id: int) -> str:
+        return 'ganesha-export-{}'.format(export_id)
+
+    def _export_url(self, export_id: int) -> str:
+        return '%url rados://{}/{}'.format(
+            self.ceph_pool, self._export_object_name(export_id))
+
+    @staticmethod
+    def _export_ids_from_names(names: List[str]) -> List[int]:
+        """Extract export IDs from export object names, skipping others."""
+        prefix = 'ganesha-export-'
+        return [
+            int(name[len(prefix):])
+            for name in names
+            if name.startswith(prefix) and name[len(prefix):].isdigit()
         ]
-        logging.debug("About to call: {}".format(cmd))
-        subprocess.check_call(cmd)
-
-    def _add_share_to_index(self, export_id: int):
-        """Add an export RADOS object's URL to the RADOS URL index."""
-        index_data = self._rados_get(self.export_index)
-        url = '%url rados://{}/ganesha-export-{}'.format(
-            self.ceph_pool, export_id
-        )
-        rados_urls = index_data.split('\n')
-        if url not in rados_urls:
-            rados_urls.append(url)
-            tmpfile = self._tmpfile('\n'.join(rados_urls))
-            self._rados_put(self.export_index, tmpfile.name)
 
-    def _remove_share_from_index(self, export_id: int):
-        """Remove an export RADOS object's URL from the RADOS URL index."""
-        index_data = self._rados_get(self.export_index)
-        if not index_data:
+    def _index_export_ids_from_text(self) -> List[int]:
+        """Read export IDs from the %url text view of the index."""
+        names = [
+            url.strip().replace('%url rados://{}/'.format(self.ceph_pool), '')
+            for url in self._rados_get(self.export_index).splitlines()]
+        return self._export_ids_from_names(names)
+
+    def _index_export_ids(self) -> List[int]:
+        """Return the IDs of all exports in the index, in ascending order.
+
+        The omap keys of the index object are authoritative. Indexes
+        created before the omap index existed only have the text view, so
+        that is read instead if the omap has no keys at all, not even
+        export_index_version_key, which stays once the last export is
+        removed.
+        """
+        keys = self._rados_omap_keys(self.export_index)
+        if keys:
+            ids = self._export_ids_from_names(keys)
+        else:
+            ids = self._index_export_ids_from_text()
+        return sorted(ids)
+
+    def _migrate_index(self):
+        """Seed the omap index from the text view if it has not been yet."""
+        if self._index_migrated:
             return
+        keys = self._rados_omap_keys(self.export_index)
+        if self.export_index_version_key not in keys:
+            values = {self.export_index_version_key: '1'}
+            if not keys:
+                ids = self._index_export_ids_from_text()
+                logging.info("Migrating {} exports to the omap index"
+                             .format(len(ids)))
+                values.update(
+                    (self._export_object_name(export_id), '')
+                    for export_id in ids)
+            self._rados_omap_set(self.export_index, values)
+        self._index_migrated = True
 
-        unwanted_url = "%url rados://{0}/{1}".format(
-            self.ceph_pool,
-            'ganesha-export-{}'.format(export_id))
-        logging.debug("Looking for '{}' in index".format(unwanted_url))
-        rados_urls = index_data.split('\n')
-        logging.debug("Index URLs: {}".format(rados_urls))
-        index = [url.strip() for url in rados_urls if url != unwanted_url]
-        logging.debug("Index URLs without unwanted: {}".format(index))
-        tmpfile = self._tmpfile('\n'.join(index))
-        self._rados_put(self.export_index, tmpfile.name)
+    @contextlib.contextmanager
+    def index_batch(self):
+        """Defer regenerating the text index until the block exits.
+
+        Shares added or removed inside the block update the omap index
+        immediately, while the %url text view read by Ganesha is rewritten
+        once at the end. create_shares batches every share it creates.
+        """
+        self._index_batch_depth += 1
+        try:
+            yield
+        finally:
+            self._index_batch_depth -= 1
+            if not self._index_batch_depth and self._index_dirty:
+                self._write_index()
+
+    def _index_changed(self):
+        self._index_dirty = True
+        if not self._index_batch_depth:
+            self._write_index()
+
+    def _write_index(self):
+        """Regenerate the %url text view of the index from the omap.
+
+        Ganesha only reads the text view, so it is rewritten in full, which
+        index_batch amortises over many changes. The omap is listed and the
+        text written under export_index_lock: every writer changes the omap
+        before taking the lock, so the last rewrite sees every change and
+        an older view never replaces a newer one.
+        """
+        with self._rados_locked(self.export_index, self.export_index_lock):
+            urls = [
+                self._export_url(export_id)
+                for export_id in self._index_export_ids()]
+            logging.debug("Writing {} URLs to the index".format(len(urls)))
+            self._rados_put(self.export_index, '\n'.join(urls))
+        self._index_dirty = False
+
+    @staticmethod
+    def _lookup_keys(share: Export) -> List[str]:
+        return ['name:{}'.format(share.name), 'path:{}'.format(share.path)]
+
+    def _lookup_export_ids(self, attribute: str,
+                           values: List[str]) -> List[Optional[int]]:
+        """Find the IDs of the exports whose names or paths are values.
+
+        The lookup object maps 'name:<name>' and 'path:<path>' keys to
+        export IDs. It is built from a full scan of the exports the first
+        time it is needed.
+
+        :param attribute: 'name' or 'path'
+        :param values: Names or paths to look up
+        :returns: The export ID of each value, or None if there is no such
+                  export
+        """
+        keys = ['{}:{}'.format(attribute, value) for value in values]
+        found = self._rados_omap_get(
+            self.export_lookup, keys + [self.export_lookup_version_key])
+        if self.export_lookup_version_key not in found:
+            found = self._rebuild_lookup()
+        return [int(found[key]) if key in found else None for key in keys]
+
+    def _rebuild_lookup(self) -> Dict[str, str]:
+        """Rebuild the name and path lookup from the exports themselves."""
+        logging.info("Building the export lookup")
+        values = {}
+        for share in self.list_shares():
+            for key in self._lookup_keys(share):
+                values[key] = str(share.export_id)
+        values[self.export_lookup_version_key] = '1'
+        self._rados_omap_set(self.export_lookup, values)
+        return values
+
+    def _add_shares_to_lookup(self, shares: List[Export]):
+        """Record the names and paths of several shares in the lookup."""
+        self._rados_omap_set(self.export_lookup, {
+            key: str(share.export_id)
+            for share in shares
+            for key in self._lookup_keys(share)})
+
+    def _remove_share_from_lookup(self, share: Export):
+        """Forget a share's name and path in the lookup."""
+        self._rados_omap_rm(self.export_lookup, self._lookup_keys(share))
+
+    def _add_shares_to_index(self, export_ids: List[int]):
+        """Add several export RADOS objects' URLs to the RADOS URL index."""
+        self._migrate_index()
+        self._rados_omap_set(self.export_index, {
+            self._export_object_name(export_id): ''
+            for export_id in export_ids})
+        self._index_changed()
+
+    def _remove_share_from_index(self, export_id: int):
+        """Remove an export RADOS object's URL from the RADOS URL index."""
+        self._migrate_index()
+        self._rados_omap_rm(
+            self.export_index, [self._export_object_name(export_id)])
+        self._index_changed()
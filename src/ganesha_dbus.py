@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# Copyright 2026 OpenStack Charmers
+# See LICENSE file for licensing details.
+
+"""Client for the NFS-Ganesha ExportMgr D-Bus interface.
+
+The same client reads Ganesha's statistics, from the exportstats
+interface of the ExportMgr object and from the ClientMgr object.
+
+``ExportMgr`` opens one connection to the system bus (or to any bus
+address it is given) through the ``dbus`` Python bindings, shipped by the
+``python3-dbus`` package, and reuses it for every call. If the bindings
+are not importable it falls back to running ``dbus-send`` for each call.
+Method proxies are cached, and dropped when a call fails so that the next
+call reaches a restarted Ganesha.
+"""
+
+import logging
+import re
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+GANESHA_BUS_NAME = 'org.ganesha.nfsd'
+EXPORTMGR_PATH = '/org/ganesha/nfsd/ExportMgr'
+EXPORTMGR_INTERFACE = 'org.ganesha.nfsd.exportmgr'
+EXPORTSTATS_INTERFACE = 'org.ganesha.nfsd.exportstats'
+CLIENTMGR_PATH = '/org/ganesha/nfsd/ClientMgr'
+CLIENTMGR_INTERFACE = 'org.ganesha.nfsd.clientmgr'
+UNKNOWN_METHOD = 'org.freedesktop.DBus.Error.UnknownMethod'
+
+# Fields of the read and write structs of a GetNFSv4xIO reply, in the
+# order Ganesha's server_dbus_iostats appends them. latency and queue_wait
+# are totals in nanoseconds; releases before queue_wait omit it.
+IO_FIELDS = ('requested', 'transferred', 'total', 'errors', 'latency',
+             'queue_wait')
+
+
+class GaneshaDBusError(Exception):
+    """A call to Ganesha over D-Bus failed.
+
+    :param name: D-Bus error name, e.g. org.freedesktop.DBus.Error.InvalidArgs
+    :param message: Error message returned by Ganesha
+    """
+
+    def __init__(self, name: str, message: str):
+        super().__init__('{}: {}'.format(name, message))
+        self.name = name
+        self.message = message
+
+
+def _import_dbus():
+    """Import the dbus bindings, if they are installed.
+
+    :returns: The dbus module or None
+    """
+    try:
+        import dbus
+    except ImportError:
+        return None
+    return dbus
+
+
+def _io_counters(method: str, iostats) -> Dict[str, int]:
+    """Name the fields of an iostats struct from a GetNFSv4xIO reply."""
+    values = [int(value) for value in iostats]
+    if len(values) < IO_FIELDS.index('latency') + 1:
+        raise GaneshaDBusError(
+            method, 'Unexpected I/O counters {!r}'.format(tuple(iostats)))
+    return dict(zip(IO_FIELDS, values))
+
+
+def _export_count(message: Optional[str]) -> Optional[int]:
+    """Extract the export count from an AddExport/UpdateExport reply."""
+    if message is None:
+        return None
+    match = re.search(r'(\d+) exports?', message)
+    if match:
+        return int(match.group(1))
+    return None
+
+
+class ExportMgr(object):
+    """Typed client for Ganesha's ExportMgr D-Bus interface.
+
+    :param bus: An already connected bus to use. This may be a stub
+                providing get_object(bus_name, object_path).
+    :param bus_address: Address of a bus to connect to instead of the
+                        system bus.
+    """
+
+    def __init__(self, bus=None, bus_address: Optional[str] = None):
+        self._bus = bus
+        self.bus_address = bus_address
+        self._dbus = _import_dbus()
+        self._methods = {}
+
+    @property
+    def bus(self):
+        """Bus connection, opened on first use."""
+        if self._bus is None:
+            if self.bus_address:
+                self._bus = self._dbus.bus.BusConnection(self.bus_address)
+            else:
+                self._bus = self._dbus.SystemBus()
+        return self._bus
+
+    @property
+    def native(self) -> bool:
+        """Whether calls go over a D-Bus connection rather than dbus-send."""
+        return self._bus is not None or self._dbus is not None
+
+    def _method(self, method: str, path: str, interface: str):
+        key = (path, interface, method)
+        if key not in self._methods:
+            proxy = self.bus.get_object(GANESHA_BUS_NAME, path)
+            self._methods[key] = proxy.get_dbus_method(
+                method, dbus_interface=interface)
+        return self._methods[key]
+
+    def _call(self, method: str, *args: Tuple[str, object],
+              path: str = EXPORTMGR_PATH,
+              interface: str = EXPORTMGR_INTERFACE):
+        """Call a Ganesha method, by default one of ExportMgr's.
+
+        :param method: Name of the method, e.g. AddExport
+        :param args: (type, value) pairs, with types 'string' or 'uint16'
+        :param path: Path of the object the method belongs to
+        :param interface: Interface the method belongs to
+        :returns: The method's reply, or the output of dbus-send
+        :raises: GaneshaDBusError
+        """
+        logging.debug("Calling {}.{}{}".format(interface, method, args))
+        if not self.native:
+            return self._dbus_send(method, *args, path=path,
+                                   interface=interface)
+        try:
+            return self._call_method(method, *args, path=path,
+                                     interface=interface)
+        except GaneshaDBusError:
+            # The proxies are bound to the unique bus name Ganesha had when
+            # they were made, which changes whenever it restarts
+            self._methods.clear()
+            raise
+
+    def _call_method(self, method: str, *args: Tuple[str, object],
+                     path: str, interface: str):
+        """Call a Ganesha method over the bus connection."""
+        if self._dbus is None:
+            # A stub bus, which takes plain Python values
+            return self._method(method, path, interface)(
+                *[value for _, value in args])
+        types = {'string': self._dbus.String, 'uint16': self._dbus.UInt16}
+        try:
+            return self._method(method, path, interface)(*[
+                types[arg_type](value) for arg_type, value in args])
+        except self._dbus.exceptions.DBusException as e:
+            raise GaneshaDBusError(
+                e.get_dbus_name(), e.get_dbus_message()) from e
+
+    def _call_native(self, method: str, *args: Tuple[str, object],
+                     **kwargs):
+        """Call a method whose reply is only parsed from the bindings."""
+        if not self.native:
+            raise GaneshaDBusError(
+                'dbus-send', '{} needs the python3-dbus bindings'
+                .format(method))
+        return self._call(method, *args, **kwargs)
+
+    def _dbus_send(self, method: str, *args: Tuple[str, object],
+                   path: str = EXPORTMGR_PATH,
+                   interface: str = EXPORTMGR_INTERFACE):
+        """Call a Ganesha method by running dbus-send."""
+        cmd = [
+            'dbus-send', '--print-reply', '--system',
+            '--dest={}'.format(GANESHA_BUS_NAME),
+            path,
+            '{}.{}'.format(interface, method)] + [
+                '{}:{}'.format(arg_type, value) for arg_type, value in args]
+        logging.debug("About to call: {}".format(cmd))
+        try:
+            output = subprocess.check_output(
+                cmd, stderr=subprocess.PIPE).decode('utf-8')
+        except subprocess.CalledProcessError as e:
+            stderr = (e.stderr or b'').decode('utf-8').strip()
+            match = re.match(r'Error (\S+): (.*)', stderr, re.DOTALL)
+            if match:
+                raise GaneshaDBusError(match.group(1), match.group(2))
+            raise GaneshaDBusError('dbus-send', stderr or str(e))
+        return output
+
+    def add_export(self, conf_path: str, expression: str) -> Optional[int]:
+        """Load exports matching expression from a config file.
+
+        :param conf_path: Path to a file holding the EXPORT block
+        :param expression: Selects the block, e.g. 'EXPORT(Path=/x)'
+        :returns: Number of exports added, as reported by Ganesha
+        """
+        return _export_count(self._call(
+            'AddExport', ('string', conf_path), ('string', expression)))
+
+    def update_export(self, conf_path: str,
+                      expression: str) -> Optional[int]:
+        """Reload exports matching expression from a config file.
+
+        :param conf_path: Path to a file holding the EXPORT block
+        :param expression: Selects the block, e.g. 'EXPORT(Export_Id=1)'
+        :returns: Number of exports updated, as reported by Ganesha
+        """
+        return _export_count(self._call(
+            'UpdateExport', ('string', conf_path), ('string', expression)))
+
+    def remove_export(self, export_id: int):
+        """Remove an export from Ganesha.
+
+        :param export_id: ID of the export to remove
+        """
+        self._call('RemoveExport', ('uint16', export_id))
+
+    def show_exports(self) -> List[int]:
+        """List the exports Ganesha is currently serving.
+
+        :returns: IDs of the exports, including the pseudo root (0)
+        """
+        reply = self._call('ShowExports')
+        if isinstance(reply, str):
+            return [int(export_id) for export_id in re.findall(
+                r'struct {\s*uint16 (\d+)', reply)]
+        _timestamp, exports = reply
+        return [int(export[0]) for export in exports]
+
+    def export_paths(self) -> Dict[int, str]:
+        """Map the IDs of the exports Ganesha is serving to their paths.
+
+        :returns: Paths by export ID, including the pseudo root (0)
+        """
+        _timestamp, exports = self._call_native('ShowExports')
+        return {int(export[0]): str(export[1]) for export in exports}
+
+    def export_io_stats(self, export_id: int,
+                        minor_version: int = 1) -> Optional[Dict]:
+        """Read and write counters of an export for an NFSv4 minor version.
+
+        Ganesha only has counters for exports that have been used over
+        that version since it started, and only gathers them while its
+        NFS statistics are enabled.
+
+        :param export_id: ID of the export
+        :param minor_version: NFSv4 minor version, 1 or 2
+        :returns: {'read': counters, 'write': counters}, each mapping
+                  IO_FIELDS to their values. None if Ganesha has no
+                  counters.
+        :raises: GaneshaDBusError, with name UNKNOWN_METHOD if this
+                 Ganesha does not count I/O for the minor version
+        """
+        method = 'GetNFSv4{}IO'.format(minor_version)
+        reply = self._call_native(method, ('uint16', export_id),
+                                  interface=EXPORTSTATS_INTERFACE)
+        # A failed reply stops after the timestamp
+        status, message = reply[0], reply[1]
+        if not status:
+            logging.debug("No NFSv4.{} I/O counters for export {}: {}"
+                          .format(minor_version, export_id, message))
+            return None
+        _timestamp, read, write = reply[2:5]
+        return {'read': _io_counters(method, read),
+                'write': _io_counters(method, write)}
+
+    def global_ops(self) -> Dict[str, int]:
+        """Operations Ganesha has served, by protocol version.
+
+        :returns: Operation counts keyed by version, e.g. {'NFSv41': 10}
+        """
+        reply = self._call_native('GetGlobalOPS',
+                                  interface=EXPORTSTATS_INTERFACE)
+        status, message = reply[0], reply[1]
+        if not status:
+            raise GaneshaDBusError('GetGlobalOPS', str(message))
+        # Alternating version names and counts, e.g. ('NFSv3:', 0, ...)
+        totals = list(reply[3])
+        return {str(name).rstrip(':'): int(count)
+                for name, count in zip(totals[::2], totals[1::2])}
+
+    def client_count(self) -> int:
+        """Number of clients Ganesha currently knows of."""
+        _timestamp, clients = self._call_native(
+            'ShowClients', path=CLIENTMGR_PATH,
+            interface=CLIENTMGR_INTERFACE)
+        return len(clients)
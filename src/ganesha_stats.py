@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# Copyright 2026 OpenStack Charmers
+# See LICENSE file for licensing details.
+
+"""Publish NFS-Ganesha's I/O and client statistics for Prometheus.
+
+Run periodically by a systemd timer, this reads Ganesha's global operation
+counts, its number of clients and the NFSv4.1 and NFSv4.2 read and write
+counters of each export over D-Bus, and writes them in the Prometheus
+text format to a file read by node-exporter's textfile collector.
+
+Ganesha only keeps the per-export counters while its NFS statistics are
+enabled, which the charm does in ganesha.conf along with the timer.
+"""
+
+import argparse
+import logging
+import time
+from typing import Dict, List, Tuple
+
+import call_metrics
+import ganesha_dbus
+
+METRIC_PREFIX = 'ganesha'
+
+# NFSv4 minor versions whose per-export I/O is published
+MINOR_VERSIONS = (1, 2)
+
+# Per-export counter metrics: (name, help, I/O field, scale)
+EXPORT_IO_METRICS = (
+    ('export_io_operations_total',
+     'Read and write operations served for the export.', 'total', 1),
+    ('export_io_errors_total',
+     'Read and write operations for the export that failed.', 'errors', 1),
+    ('export_io_requested_bytes_total',
+     'Bytes clients asked to read or write on the export.', 'requested',
+     1),
+    ('export_io_transferred_bytes_total',
+     'Bytes read from or written to the export.', 'transferred', 1),
+    ('export_io_latency_seconds_total',
+     'Time spent serving reads and writes for the export.', 'latency',
+     1e-9),
+)
+
+
+class Metric(object):
+    """A Prometheus metric family and its samples.
+
+    :param name: Name of the metric, without METRIC_PREFIX
+    :param metric_type: 'counter' or 'gauge'
+    :param help_text: Description of the metric
+    """
+
+    def __init__(self, name: str, metric_type: str, help_text: str):
+        self.name = '{}_{}'.format(METRIC_PREFIX, name)
+        self.metric_type = metric_type
+        self.help_text = help_text
+        self.samples = []
+
+    def add(self, value, **labels):
+        self.samples.append((labels, value))
+
+    def render(self) -> List[str]:
+        lines = ['# HELP {} {}'.format(self.name, self.help_text),
+                 '# TYPE {} {}'.format(self.name, self.metric_type)]
+        for labels, value in self.samples:
+            lines.append('{}{} {}'.format(
+                self.name,
+                call_metrics.format_labels(labels) if labels else '',
+                value))
+        return lines
+
+
+def collect(export_mgr: ganesha_dbus.ExportMgr) -> List[Metric]:
+    """Read Ganesha's statistics.
+
+    If Ganesha cannot be reached, only ganesha_up is reported, as 0.
+
+    :param export_mgr: Client for the local Ganesha
+    :returns: The metrics to publish
+    """
+    start = time.monotonic()
+    up = Metric('up', 'gauge', 'Whether Ganesha answered over D-Bus.')
+    metrics = [up]
+    try:
+        exports = export_mgr.export_paths()
+        global_ops = export_mgr.global_ops()
+        clients = export_mgr.client_count()
+    except ganesha_dbus.GaneshaDBusError as e:
+        logging.warning("Failed to read Ganesha statistics: {}".format(e))
+        up.add(0)
+        return metrics
+    up.add(1)
+
+    metric = Metric('clients', 'gauge', 'Clients known to Ganesha.')
+    metric.add(clients)
+    metrics.append(metric)
+    metric = Metric('exports', 'gauge', 'Exports served by Ganesha.')
+    metric.add(len([export_id for export_id in exports if export_id]))
+    metrics.append(metric)
+    metric = Metric('operations_total', 'counter',
+                    'Operations served by Ganesha, by protocol version.')
+    for version, count in sorted(global_ops.items()):
+        metric.add(count, version=version)
+    metrics.append(metric)
+
+    io_metrics = [(Metric(name, 'counter', help_text), field, scale)
+                  for name, help_text, field, scale in EXPORT_IO_METRICS]
+    for minor_version, export_id, stats in _export_io(export_mgr, exports):
+        for metric, field, scale in io_metrics:
+            for op in ('read', 'write'):
+                metric.add(stats[op][field] * scale,
+                           export_id=export_id, path=exports[export_id],
+                           version='4.{}'.format(minor_version), op=op)
+    metrics.extend(metric for metric, _, _ in io_metrics)
+
+    metric = Metric('stats_collection_seconds', 'gauge',
+                    'Time taken to read Ganesha\'s statistics.')
+    metric.add(time.monotonic() - start)
+    metrics.append(metric)
+    return metrics
+
+
+def _export_io(export_mgr: ganesha_dbus.ExportMgr,
+               exports: Dict[int, str]) -> List[Tuple[int, int, Dict]]:
+    """I/O counters of each export, by NFSv4 minor version.
+
+    Minor versions this Ganesha does not count I/O for are skipped, as are
+    exports removed since they were listed.
+    """
+    counters = []
+    for minor_version in MINOR_VERSIONS:
+        for export_id in sorted(exports):
+            if not export_id:
+                # The pseudo root has no I/O of its own
+                continue
+            try:
+                stats = export_mgr.export_io_stats(export_id, minor_version)
+            except ganesha_dbus.GaneshaDBusError as e:
+                if e.name == ganesha_dbus.UNKNOWN_METHOD:
+                    logging.debug("Ganesha does not count NFSv4.{} I/O"
+                                  .format(minor_version))
+                    break
+                logging.warning("Failed to read I/O counters of export {}:"
+                                " {}".format(export_id, e))
+                continue
+            if stats is not None:
+                counters.append((minor_version, export_id, stats))
+    return counters
+
+
+def render(metrics: List[Metric]) -> str:
+    """Render metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--textfile', required=True,
+                        help='The .prom file to write')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO,
+                        format='%(levelname)s %(message)s')
+    call_metrics.write_atomically(
+        args.textfile, render(collect(ganesha_dbus.ExportMgr())))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,9 @@
 #!/usr/bin/env python3
 
-# import json
+import json
 import logging
 import os
 # import socket
-import uuid
 
 from ops.framework import (
     StoredState,
@@ -22,6 +21,24 @@ class ReloadNonceEvent(EventBase):
     pass
 
 
+class ExportChangesEvent(EventBase):
+    """Exports changed on the leader and need applying on this unit.
+
+    changes is a list of [seq, op, export_id, version] journal entries,
+    where op is one of 'add', 'update' or 'remove'.
+    """
+
+    def __init__(self, handle, changes=None):
+        super().__init__(handle)
+        self.changes = changes or []
+
+    def snapshot(self):
+        return {'changes': self.changes}
+
+    def restore(self, snapshot):
+        self.changes = snapshot['changes']
+
+
 class DepartedEvent(EventBase):
     pass
 
@@ -29,6 +46,7 @@ class DepartedEvent(EventBase):
 class CephNFSPeerEvents(ObjectEvents):
     pool_initialised = EventSource(PoolInitialisedEvent)
     reload_nonce = EventSource(ReloadNonceEvent)
+    export_changes = EventSource(ExportChangesEvent)
     departing = EventSource(DepartedEvent)
 
 
@@ -37,13 +55,18 @@ class CephNFSPeers(Object):
     on = CephNFSPeerEvents()
     _stored = StoredState()
 
+    # Number of export changes kept in the journal. Units that fall
+    # further behind than this do a full reload instead.
+    JOURNAL_LENGTH = 100
+
     def __init__(self, charm, relation_name):
         super().__init__(charm, relation_name)
         self.relation_name = relation_name
         self.this_unit = self.framework.model.unit
         self._stored.set_default(
             pool_initialised=False,
-            reload_nonce=None)
+            reload_nonce=None,
+            journal_position=0)
         self.framework.observe(
             charm.on[relation_name].relation_changed,
             self.on_changed)
@@ -64,6 +87,27 @@ class CephNFSPeers(Object):
             logging.info("emiting reload nonce")
             self.on.reload_nonce.emit()
         self._stored.reload_nonce = self.reload_nonce
+        self._replay_journal()
+
+    def _replay_journal(self):
+        """Emit the journal entries this unit has not applied yet.
+
+        If entries this unit has not seen have already been dropped from
+        the journal, a full reload is emitted instead.
+        """
+        journal = self.export_journal
+        position = self._stored.journal_position
+        pending = [entry for entry in journal if entry[0] > position]
+        if not pending:
+            return
+        if pending[0][0] > position + 1:
+            logging.info("Export journal position {} is too old to replay, "
+                         "reloading".format(position))
+            self.on.reload_nonce.emit()
+        else:
+            logging.info("emiting {} export changes".format(len(pending)))
+            self.on.export_changes.emit(pending)
+        self._stored.journal_position = pending[-1][0]
 
     def on_departed(self, event):
         logging.warning("CephNFSPeers on_departed")
@@ -75,11 +119,28 @@ class CephNFSPeers(Object):
         self.peer_rel.data[self.peer_rel.app]['pool_initialised'] = 'True'
         self.on.pool_initialised.emit()
 
-    def trigger_reload(self):
-        self.peer_rel.data[
-            self.peer_rel.app
-        ]['reload_nonce'] = str(uuid.uuid4())
-        self.on.reload_nonce.emit()
+    def publish_export_changes(self, changes):
+        """Journal export changes for the other units to apply.
+
+        This unit is assumed to have applied the changes already.
+
+        :param changes: (op, export_id, version) tuples
+        """
+        if not changes:
+            return
+        journal = self.export_journal
+        seq = journal[-1][0] if journal else 0
+        for op, export_id, version in changes:
+            seq += 1
+            journal.append([seq, op, export_id, version])
+        self.peer_rel.data[self.peer_rel.app]['export_journal'] = json.dumps(
+            journal[-self.JOURNAL_LENGTH:])
+        self._stored.journal_position = seq
+
+    @property
+    def export_journal(self):
+        journal = self.peer_rel.data[self.peer_rel.app].get('export_journal')
+        return json.loads(journal) if journal else []
 
     @property
     def pool_initialised(self):
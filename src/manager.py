@@ -17,7 +17,9 @@
 # https://github.com/openstack/manila/blob/a3aaea91494665a25bdccebf69d9e85e8475983d/manila/share/drivers/ganesha/manager.py#L205
 #
 # The key differences is the lack of other Ganesha control code
-# and the removal of oslo's JSON helpers.
+# and the removal of oslo's JSON helpers. The config parser has since been
+# rewritten as a single pass recursive descent parser which gives the same
+# results as manila's _conf2json.
 
 
 import io
@@ -29,97 +31,188 @@ import sys
 IWIDTH = 4
 
 
-def _conf2json(conf):
-    """Convert Ganesha config to JSON."""
-
-    # tokenize config string
-    token_list = [io.StringIO()]
-    state = {
-        'in_quote': False,
-        'in_comment': False,
-        'escape': False,
-    }
-
-    cbk = []
-    for char in conf:
-        if state['in_quote']:
-            if not state['escape']:
-                if char == '"':
-                    state['in_quote'] = False
-                    cbk.append(lambda: token_list.append(io.StringIO()))
-                elif char == '\\':
-                    cbk.append(lambda: state.update({'escape': True}))
-        else:
-            if char == "#":
-                state['in_comment'] = True
-            if state['in_comment']:
-                if char == "\n":
-                    state['in_comment'] = False
-            else:
-                if char == '"':
-                    token_list.append(io.StringIO())
-                    state['in_quote'] = True
-        state['escape'] = False
-        if not state['in_comment']:
-            token_list[-1].write(char)
-        while cbk:
-            cbk.pop(0)()
-
-    if state['in_quote']:
-        raise RuntimeError("Unterminated quoted string")
-
-    # jsonify tokens
-    js_token_list = ["{"]
-    for tok in token_list:
-        tok = tok.getvalue()
-
-        if tok[0] == '"':
-            js_token_list.append(tok)
+# Tokens of a Ganesha config, with comments and whitespace matching no
+# group. A double quote with no closing quote matches the last group.
+_TOKEN_RE = re.compile(r'''
+      \s+
+    | \#[^\n]*
+    | "([^"\\]*(?:\\.[^"\\]*)*)"
+    | ([;{}=])
+    | ([^\s;{}="\#]+)
+    | (")
+''', re.VERBOSE | re.DOTALL)
+
+_QUOTED, _PUNCT, _WORD, _UNTERMINATED = 1, 2, 3, 4
+
+_NUMBER_RE = re.compile(r'-?[1-9]\d*(\.\d+)?\Z')
+
+# Quoted strings containing these need decoding as JSON strings
+_NEEDS_DECODE_RE = re.compile(r'[\x00-\x1f\\]')
+
+_END = (None, None)
+
+
+def _tokenize(conf):
+    """Split Ganesha config into (kind, text) tokens."""
+    tokens = []
+    for match in _TOKEN_RE.finditer(conf):
+        kind = match.lastindex
+        if kind is None:
             continue
+        if kind == _UNTERMINATED:
+            raise RuntimeError("Unterminated quoted string")
+        text = match.group(kind)
+        if text == '}' and kind == _PUNCT and tokens and \
+                tokens[-1] == (_PUNCT, ';'):
+            # A semicolon before a closing brace is dropped
+            tokens.pop()
+        tokens.append((kind, text))
+    tokens.append(_END)
+    return tokens
+
+
+def _number(word):
+    """Return the int or float an unquoted word stands for, if any."""
+    if _NUMBER_RE.match(word) is None:
+        return None
+    if not word.isascii():
+        raise ValueError("Invalid number: {}".format(word))
+    if '.' in word:
+        return float(word)
+    return int(word)
+
+
+class _ConfParser(object):
+    """Recursive descent parser for Ganesha config.
 
-        for pat, s in [
-                # add omitted "=" signs to block openings
-                (r'([^=\s])\s*{', '\\1={'),
-                # delete trailing semicolons in blocks
-                (r';\s*}', '}'),
-                # add omitted semicolons after blocks
-                (r'}\s*([^}\s])', '};\\1'),
-                # separate syntactically significant characters
-                (r'([;{}=])', ' \\1 ')]:
-            tok = re.sub(pat, s, tok)
-
-        # map tokens to JSON equivalents
-        for word in tok.split():
-            if word == "=":
-                word = ":"
-            elif word == ";":
-                word = ','
-            elif word in ['{', '}'] or  \
-                    re.search(r'\A-?[1-9]\d*(\.\d+)?\Z', word):
-                pass
+    Blocks become dictionaries, and the values of a key given more than
+    once are collected into a list. Unquoted words that are decimal
+    numbers become ints or floats. Other values become strings, with
+    adjacent words and quoted strings joined together.
+
+    Separators follow the rules of the JSON-rewriting parser this
+    replaces: ';' separates values from what follows them, is optional
+    after blocks and before '}', and cannot end the top level.
+    """
+
+    def __init__(self, conf):
+        self.tokens = _tokenize(conf)
+        self.pos = 0
+
+    def error(self, message):
+        kind, text = self.tokens[self.pos]
+        found = 'end of config' if kind is None else repr(text)
+        return ValueError("{}, found {} at token {}".format(
+            message, found, self.pos))
+
+    def parse(self):
+        return self.block(top=True)
+
+    def block(self, top=False):
+        """Parse statements up to the closing brace, or the end if top."""
+        tokens = self.tokens
+        result = {}
+        while True:
+            kind, text = tokens[self.pos]
+            if kind is None:
+                if not top:
+                    raise self.error("Expected '}'")
+                return result
+            if kind == _PUNCT and text == '}':
+                if top:
+                    raise self.error("Unexpected '}'")
+                self.pos += 1
+                return result
+            key, ends_in_word = self.string()
+            if key is None:
+                raise self.error("Expected a key")
+            kind, text = tokens[self.pos]
+            self.pos += 1
+            if kind == _PUNCT and text == '=':
+                value, is_block = self.value()
+            elif kind == _PUNCT and text == '{' and ends_in_word:
+                value, is_block = self.block(), True
             else:
-                word = json.dumps(word)
-            js_token_list.append(word)
-    js_token_list.append("}")
-
-    # group quoted strings
-    token_grp_list = []
-    for tok in js_token_list:
-        if tok[0] == '"':
-            if not (token_grp_list and isinstance(token_grp_list[-1], list)):
-                token_grp_list.append([])
-            token_grp_list[-1].append(tok)
-        else:
-            token_grp_list.append(tok)
+                self.pos -= 1
+                raise self.error("Expected '=' or '{'")
+            if key in result:
+                result[key] = [result[key]]
+                result[key].append(value)
+            else:
+                result[key] = value
+            self.separator(is_block, top)
+
+    def value(self):
+        """Parse the value after '=', returning it and whether it is a block.
+        """
+        kind, text = self.tokens[self.pos]
+        if kind == _PUNCT and text == '{':
+            self.pos += 1
+            return self.block(), True
+        if kind == _WORD and _number(text) is not None:
+            # Adjacent numbers run together, as in "10 24"
+            words = []
+            while kind == _WORD and _number(text) is not None:
+                words.append(text)
+                self.pos += 1
+                kind, text = self.tokens[self.pos]
+            number = _number(''.join(words))
+            if number is None:
+                raise self.error("Invalid number {}".format(''.join(words)))
+            return number, False
+        value, _ = self.string()
+        if value is None:
+            raise self.error("Expected a value")
+        return value, False
 
-    # process quoted string groups by joining them
-    js_token_list2 = []
-    for x in token_grp_list:
-        if isinstance(x, list):
-            x = ''.join(['"'] + [tok[1:-1] for tok in x] + ['"'])
-        js_token_list2.append(x)
+    def separator(self, after_block, top):
+        """Consume what may follow a statement before the next one."""
+        kind, text = self.tokens[self.pos]
+        if kind is None or kind == _PUNCT and text == '}':
+            return
+        if kind == _PUNCT and text == ';':
+            if after_block:
+                raise self.error("Unexpected ';'")
+            self.pos += 1
+            if top and self.tokens[self.pos] is _END:
+                raise self.error("Unexpected ';'")
+            return
+        if after_block and kind == _WORD:
+            return
+        raise self.error("Expected ';'")
 
-    return ''.join(js_token_list2)
+    def string(self):
+        """Parse a run of words and quoted strings into one string.
+
+        :returns: The string, or None if there is none here, and whether
+                  it ended with an unquoted word
+        """
+        tokens = self.tokens
+        pieces = []
+        decode = False
+        kind = None
+        while True:
+            next_kind, text = tokens[self.pos]
+            if next_kind == _QUOTED:
+                if _NEEDS_DECODE_RE.search(text):
+                    decode = True
+            elif next_kind != _WORD or _number(text) is not None:
+                break
+            pieces.append((next_kind, text))
+            kind = next_kind
+            self.pos += 1
+        if not pieces:
+            return None, False
+        if decode:
+            raw = ''.join(
+                text if piece_kind == _QUOTED else json.dumps(text)[1:-1]
+                for piece_kind, text in pieces)
+            value = json.loads('"{}"'.format(raw))
+        elif len(pieces) == 1:
+            value = pieces[0][1]
+        else:
+            value = ''.join(text for _, text in pieces)
+        return value, kind == _WORD
 
 
 def _dump_to_conf(confdict, out=sys.stdout, indent=0):
@@ -160,36 +253,12 @@ def parseconf(conf):
     Both native format and JSON are supported.
     Convert config to a (nested) dictionary.
     """
-    def list_to_dict(src_list):
-        # Convert a list of key-value pairs stored as tuples to a dict.
-        # For tuples with identical keys, preserve all the values in a
-        # list. e.g., argument [('k', 'v1'), ('k', 'v2')] to function
-        # returns {'k': ['v1', 'v2']}.
-        dst_dict = {}
-        for i in src_list:
-            if isinstance(i, tuple):
-                k, v = i
-                if isinstance(v, list):
-                    v = list_to_dict(v)
-                if k in dst_dict:
-                    dst_dict[k] = [dst_dict[k]]
-                    dst_dict[k].append(v)
-                else:
-                    dst_dict[k] = v
-        return dst_dict
-
     try:
         # allow config to be specified in JSON --
         # for sake of people who might feel Ganesha config foreign.
         d = json.loads(conf)
     except ValueError:
-        # Customize JSON decoder to convert Ganesha config to a list
-        # of key-value pairs stored as tuples. This allows multiple
-        # occurrences of a config block to be later converted to a
-        # dict key-value pair, with block name being the key and a
-        # list of block contents being the value.
-        li = json.loads(_conf2json(conf), object_pairs_hook=lambda x: x)
-        d = list_to_dict(li)
+        d = _ConfParser(conf).parse()
     return d
 
 
@@ -0,0 +1,586 @@
+#!/usr/bin/env python3
+# Copyright 2026 OpenStack Charmers
+# See LICENSE file for licensing details.
+
+"""Backends used by GaneshaNFS to talk to the Ceph cluster.
+
+A backend reads and writes RADOS objects and dispatches mon/mgr commands.
+Two backends are provided. ``LibradosBackend`` uses the ``rados`` Python
+bindings (shipped by the ``python3-rados`` package) and holds a single
+cluster connection and I/O context for as long as the backend is alive,
+which is normally one hook or action. ``RadosCLIBackend`` forks the
+``rados`` and ``ceph`` CLIs for every call and is used whenever the
+bindings are not importable, e.g. before the charm has installed its
+packages.
+"""
+
+import datetime
+import json
+import logging
+import re
+import subprocess
+import threading
+import time
+from typing import Dict, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+CEPH_CONF = '/etc/ceph/ceph.conf'
+
+# Objects managed by the charm are small, so a single read of this size
+# normally fetches the whole object in one round trip.
+READ_CHUNK_SIZE = 4 * 1024 * 1024
+# Number of omap keys listed per round trip.
+OMAP_PAGE_SIZE = 1000
+
+
+class RadosError(subprocess.CalledProcessError):
+    """A RADOS operation or command performed through librados failed.
+
+    This subclasses CalledProcessError so that callers handle failures
+    from both backends the same way.
+    """
+
+
+# Commands GaneshaNFS sends to the cluster, keyed by their prefix. Each
+# entry records the daemon that serves the command and the name and type
+# of its positional arguments, which is what is needed to turn a CLI style
+# argument list into the JSON form taken by mon_command and mgr_command.
+COMMANDS = {
+    'auth get': ('mon', (('entity', str),)),
+    'fs subvolume create': ('mgr', (
+        ('vol_name', str), ('sub_name', str), ('size', int))),
+    'fs subvolume resize': ('mgr', (
+        ('vol_name', str), ('sub_name', str), ('new_size', str))),
+    'fs subvolume authorize': ('mgr', (
+        ('vol_name', str), ('sub_name', str), ('auth_id', str))),
+    'fs subvolume deauthorize': ('mgr', (
+        ('vol_name', str), ('sub_name', str), ('auth_id', str))),
+    'fs subvolume rm': ('mgr', (('vol_name', str), ('sub_name', str))),
+    'fs subvolume getpath': ('mgr', (('vol_name', str), ('sub_name', str))),
+}
+
+
+def build_command(*cmd: str):
+    """Convert a CLI style ceph command into its JSON form.
+
+    Flags of the form ``--name`` become boolean arguments, and
+    ``--name=value`` become string arguments.
+
+    :param cmd: Command words and arguments, e.g. ('auth', 'get', 'client.x')
+
+    :returns: The daemon to send the command to and the command dictionary
+    :rtype: Tuple[str, Dict]
+    :raises: ValueError if the command is not known
+    """
+    words = [word for word in cmd if not word.startswith('--')]
+    flags = [word[2:] for word in cmd if word.startswith('--')]
+    for length in range(len(words), 0, -1):
+        prefix = ' '.join(words[:length])
+        if prefix in COMMANDS:
+            break
+    else:
+        raise ValueError('Unsupported ceph command: {}'.format(cmd))
+    target, params = COMMANDS[prefix]
+    args = words[length:]
+    if len(args) > len(params):
+        raise ValueError('Too many arguments for {}: {}'.format(prefix, args))
+    command = {'prefix': prefix, 'format': 'json'}
+    for (param, param_type), value in zip(params, args):
+        command[param] = param_type(value)
+    for flag in flags:
+        key, sep, value = flag.partition('=')
+        command[key] = value if sep else True
+    return target, command
+
+
+def parse_output(output: bytes):
+    """Decode the output of a ceph command.
+
+    :returns: The decoded JSON document, the output as a stripped string if
+              it is not JSON, or None if there was no output.
+    """
+    output = output.decode('utf-8').strip()
+    if not output:
+        return None
+    try:
+        return json.loads(output)
+    except ValueError:
+        return output
+
+
+def _import_rados():
+    """Import the rados bindings, if they are installed.
+
+    :returns: The rados module or None
+    """
+    try:
+        import rados
+    except ImportError:
+        return None
+    return rados
+
+
+class RadosCLIBackend(object):
+    """Object store backend that runs the rados CLI for every call."""
+
+    def __init__(self, client_name: str, ceph_pool: str,
+                 ceph_conf: str = CEPH_CONF):
+        self.client_name = client_name
+        self.ceph_pool = ceph_pool
+        self.ceph_conf = ceph_conf
+
+    def _cmd(self, *args: str):
+        return [
+            'rados', '-p', self.ceph_pool, '--id', self.client_name,
+        ] + [*args]
+
+    def get(self, name: str) -> str:
+        """Retrieve the content of the RADOS object with a given name
+
+        :param name: Name of the RADOS object to retrieve
+
+        :returns: Contents of the RADOS object
+        :rtype: str
+        """
+        cmd = self._cmd('get', name, '/dev/stdout')
+        logging.debug("About to call: {}".format(cmd))
+        output = subprocess.check_output(cmd)
+        return output.decode('utf-8')
+
+    def put(self, name: str, data: Union[str, bytes]):
+        """Store data in a named RADOS object.
+
+        The data is streamed to the rados CLI over stdin.
+
+        :param name: Name of the RADOS object to write
+        :param data: Content to store
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        cmd = self._cmd('put', name, '-')
+        logging.debug("About to call: {}".format(cmd))
+        subprocess.run(cmd, input=data, check=True)
+
+    def remove(self, name: str):
+        """Remove a named RADOS object.
+
+        :param name: Name of the RADOS object to remove
+        """
+        cmd = self._cmd('rm', name)
+        logging.debug("About to call: {}".format(cmd))
+        subprocess.check_call(cmd)
+
+    def stat(self, name: str) -> Tuple[int, float]:
+        """Return the size and modification time of a named RADOS object.
+
+        :param name: Name of the RADOS object
+        :returns: Size in bytes and mtime in seconds since the epoch
+        """
+        cmd = self._cmd('stat', name)
+        logging.debug("About to call: {}".format(cmd))
+        output = subprocess.check_output(cmd).decode('utf-8')
+        match = re.search(r' mtime (.+), size (\d+)', output)
+        if match is None:
+            raise ValueError('Unexpected rados stat output: {}'.format(output))
+        mtime = match.group(1).strip()
+        for fmt in ('%Y-%m-%dT%H:%M:%S.%f%z', '%Y-%m-%d %H:%M:%S.%f'):
+            try:
+                parsed = datetime.datetime.strptime(mtime, fmt)
+            except ValueError:
+                continue
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+            return int(match.group(2)), parsed.timestamp()
+        raise ValueError('Unexpected rados stat mtime: {}'.format(mtime))
+
+    def omap_keys(self, name: str) -> List[str]:
+        """List the omap keys of a named RADOS object.
+
+        :param name: Name of the RADOS object
+
+        :returns: The object's omap keys, in sorted order
+        """
+        cmd = self._cmd('listomapkeys', name)
+        logging.debug("About to call: {}".format(cmd))
+        return subprocess.check_output(cmd).decode('utf-8').splitlines()
+
+    def omap_get(self, name: str, keys: List[str]) -> Dict[str, str]:
+        """Retrieve the values of some omap keys of a named RADOS object.
+
+        :param name: Name of the RADOS object
+        :param keys: Keys to look up
+
+        :returns: Mapping of the keys that exist to their values
+        """
+        values = {}
+        for key in keys:
+            cmd = self._cmd('getomapval', name, key, '/dev/stdout')
+            logging.debug("About to call: {}".format(cmd))
+            try:
+                output = subprocess.check_output(
+                    cmd, stderr=subprocess.DEVNULL)
+            except subprocess.CalledProcessError:
+                continue
+            values[key] = output.decode('utf-8')
+        return values
+
+    def omap_set(self, name: str, values: Dict[str, str]):
+        """Set omap keys on a named RADOS object, creating it if needed.
+
+        :param name: Name of the RADOS object
+        :param values: Mapping of keys to values to set
+        """
+        for key, value in values.items():
+            cmd = self._cmd('setomapval', name, key, value)
+            logging.debug("About to call: {}".format(cmd))
+            subprocess.check_call(cmd)
+
+    def omap_remove(self, name: str, keys: List[str]):
+        """Remove omap keys from a named RADOS object.
+
+        :param name: Name of the RADOS object
+        :param keys: Keys to remove
+        """
+        for key in keys:
+            cmd = self._cmd('rmomapkey', name, key)
+            logging.debug("About to call: {}".format(cmd))
+            subprocess.check_call(cmd)
+
+    def lock(self, name: str, lock_name: str, cookie: str, duration: int):
+        """Take an exclusive advisory lock on a named RADOS object.
+
+        :param name: Name of the RADOS object to lock
+        :param lock_name: Name of the lock
+        :param cookie: Cookie identifying this holder of the lock
+        :param duration: Seconds after which the lock expires
+        :raises: CalledProcessError if the lock is held elsewhere
+        """
+        cmd = self._cmd('lock', 'get', name, lock_name,
+                        '--lock-cookie', cookie,
+                        '--lock-duration', str(duration))
+        logging.debug("About to call: {}".format(cmd))
+        subprocess.check_call(cmd, stderr=subprocess.DEVNULL)
+
+    def unlock(self, name: str, lock_name: str, cookie: str):
+        """Release an advisory lock taken with lock.
+
+        :param name: Name of the locked RADOS object
+        :param lock_name: Name of the lock
+        :param cookie: Cookie the lock was taken with
+        """
+        cmd = self._cmd('lock', 'release', name, lock_name,
+                        '--lock-cookie', cookie)
+        logging.debug("About to call: {}".format(cmd))
+        subprocess.check_call(cmd)
+
+    def notify(self, name: str, data: str, timeout_ms: int):
+        """Notify the watchers of a named RADOS object.
+
+        :param name: Name of the watched RADOS object
+        :param data: Payload sent to each watcher
+        :param timeout_ms: How long to wait for watchers to acknowledge
+        """
+        cmd = self._cmd('notify', name, data)
+        logging.debug("About to call: {}".format(cmd))
+        subprocess.check_call(cmd, timeout=timeout_ms / 1000 + 5)
+
+    def command(self, *cmd: str):
+        """Run a ceph command.
+
+        :param cmd: Command words and arguments, e.g. ('auth', 'get', 'x')
+
+        :returns: The parsed command output, see parse_output
+        """
+        cmd = [
+            "ceph", "--id", self.client_name,
+            "--conf={}".format(self.ceph_conf)
+        ] + [*cmd] + ['--format=json']
+        logging.debug("About to call: {}".format(cmd))
+        return parse_output(
+            subprocess.check_output(cmd, stderr=subprocess.DEVNULL))
+
+    def close(self):
+        pass
+
+
+class LibradosBackend(object):
+    """Object store backend using a pooled librados connection.
+
+    The cluster connection is opened lazily on first use and reused by
+    every subsequent call until ``close`` is called. The backend may be
+    shared between threads.
+    """
+
+    def __init__(self, client_name: str, ceph_pool: str,
+                 ceph_conf: str = CEPH_CONF):
+        self.client_name = client_name
+        self.ceph_pool = ceph_pool
+        self.ceph_conf = ceph_conf
+        self._rados = _import_rados()
+        if self._rados is None:
+            raise RuntimeError('The rados python bindings are not installed')
+        self._cluster = None
+        self._ioctx = None
+        self._lock = threading.Lock()
+
+    @property
+    def cluster(self):
+        """Connected cluster handle, created on first use."""
+        with self._lock:
+            if self._cluster is None:
+                logging.debug(
+                    "Connecting to ceph as {}".format(self.client_name))
+                cluster = self._rados.Rados(
+                    conffile=self.ceph_conf,
+                    rados_id=self.client_name)
+                cluster.connect()
+                self._cluster = cluster
+            return self._cluster
+
+    @property
+    def ioctx(self):
+        """I/O context for the backend's pool, created on first use."""
+        cluster = self.cluster
+        with self._lock:
+            if self._ioctx is None:
+                self._ioctx = cluster.open_ioctx(self.ceph_pool)
+            return self._ioctx
+
+    def _error(self, exc: Exception, *cmd: str) -> RadosError:
+        return RadosError(getattr(exc, 'errno', None) or 1,
+                          [*cmd], stderr=str(exc))
+
+    def get(self, name: str) -> str:
+        """Retrieve the content of the RADOS object with a given name
+
+        :param name: Name of the RADOS object to retrieve
+
+        :returns: Contents of the RADOS object
+        :rtype: str
+        """
+        chunks = []
+        offset = 0
+        try:
+            while True:
+                chunk = self.ioctx.read(
+                    name, length=READ_CHUNK_SIZE, offset=offset)
+                chunks.append(chunk)
+                if len(chunk) < READ_CHUNK_SIZE:
+                    break
+                offset += len(chunk)
+        except self._rados.Error as e:
+            raise self._error(e, 'get', name) from e
+        return b''.join(chunks).decode('utf-8')
+
+    def put(self, name: str, data: Union[str, bytes]):
+        """Store data in a named RADOS object.
+
+        :param name: Name of the RADOS object to write
+        :param data: Content to store
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        try:
+            self.ioctx.write_full(name, data)
+        except self._rados.Error as e:
+            raise self._error(e, 'put', name) from e
+
+    def remove(self, name: str):
+        """Remove a named RADOS object.
+
+        :param name: Name of the RADOS object to remove
+        """
+        try:
+            self.ioctx.remove_object(name)
+        except self._rados.Error as e:
+            raise self._error(e, 'rm', name) from e
+
+    def stat(self, name: str) -> Tuple[int, float]:
+        """Return the size and modification time of a named RADOS object.
+
+        :param name: Name of the RADOS object
+        :returns: Size in bytes and mtime in seconds since the epoch
+        """
+        try:
+            size, mtime = self.ioctx.stat(name)
+        except self._rados.Error as e:
+            raise self._error(e, 'stat', name) from e
+        return size, time.mktime(mtime)
+
+    def omap_keys(self, name: str) -> List[str]:
+        """List the omap keys of a named RADOS object.
+
+        :param name: Name of the RADOS object
+
+        :returns: The object's omap keys, in sorted order
+        """
+        keys = []
+        start_after = ''
+        try:
+            while True:
+                with self._rados.ReadOpCtx() as op:
+                    it, _ = self.ioctx.get_omap_keys(
+                        op, start_after, OMAP_PAGE_SIZE)
+                    self.ioctx.operate_read_op(op, name)
+                    page = [key for key, _ in it]
+                keys.extend(page)
+                if len(page) < OMAP_PAGE_SIZE:
+                    break
+                start_after = page[-1]
+        except self._rados.Error as e:
+            raise self._error(e, 'listomapkeys', name) from e
+        return keys
+
+    def omap_get(self, name: str, keys: List[str]) -> Dict[str, str]:
+        """Retrieve the values of some omap keys of a named RADOS object.
+
+        :param name: Name of the RADOS object
+        :param keys: Keys to look up
+
+        :returns: Mapping of the keys that exist to their values
+        """
+        try:
+            with self._rados.ReadOpCtx() as op:
+                it, _ = self.ioctx.get_omap_vals_by_keys(op, tuple(keys))
+                self.ioctx.operate_read_op(op, name)
+                return {
+                    key: value.decode('utf-8') for key, value in it
+                }
+        except self._rados.ObjectNotFound:
+            return {}
+        except self._rados.Error as e:
+            raise self._error(e, 'getomapval', name) from e
+
+    def omap_set(self, name: str, values: Dict[str, str]):
+        """Set omap keys on a named RADOS object, creating it if needed.
+
+        All keys are set in a single atomic write operation.
+
+        :param name: Name of the RADOS object
+        :param values: Mapping of keys to values to set
+        """
+        keys = tuple(values.keys())
+        data = tuple(str(values[key]).encode('utf-8') for key in keys)
+        try:
+            with self._rados.WriteOpCtx() as op:
+                self.ioctx.set_omap(op, keys, data)
+                self.ioctx.operate_write_op(op, name)
+        except self._rados.Error as e:
+            raise self._error(e, 'setomapval', name) from e
+
+    def omap_remove(self, name: str, keys: List[str]):
+        """Remove omap keys from a named RADOS object.
+
+        All keys are removed in a single atomic write operation.
+
+        :param name: Name of the RADOS object
+        :param keys: Keys to remove
+        """
+        try:
+            with self._rados.WriteOpCtx() as op:
+                self.ioctx.remove_omap_keys(op, tuple(keys))
+                self.ioctx.operate_write_op(op, name)
+        except self._rados.Error as e:
+            raise self._error(e, 'rmomapkey', name) from e
+
+    def lock(self, name: str, lock_name: str, cookie: str, duration: int):
+        """Take an exclusive advisory lock on a named RADOS object.
+
+        :param name: Name of the RADOS object to lock
+        :param lock_name: Name of the lock
+        :param cookie: Cookie identifying this holder of the lock
+        :param duration: Seconds after which the lock expires
+        :raises: RadosError if the lock is held elsewhere
+        """
+        try:
+            self.ioctx.lock_exclusive(name, lock_name, cookie,
+                                      duration=duration)
+        except self._rados.Error as e:
+            raise self._error(e, 'lock', 'get', name) from e
+
+    def unlock(self, name: str, lock_name: str, cookie: str):
+        """Release an advisory lock taken with lock.
+
+        :param name: Name of the locked RADOS object
+        :param lock_name: Name of the lock
+        :param cookie: Cookie the lock was taken with
+        """
+        try:
+            self.ioctx.unlock(name, lock_name, cookie)
+        except self._rados.Error as e:
+            raise self._error(e, 'lock', 'release', name) from e
+
+    def notify(self, name: str, data: str, timeout_ms: int):
+        """Notify the watchers of a named RADOS object.
+
+        :param name: Name of the watched RADOS object
+        :param data: Payload sent to each watcher
+        :param timeout_ms: How long to wait for watchers to acknowledge
+        """
+        try:
+            self.ioctx.notify(name, data, timeout_ms=timeout_ms)
+        except self._rados.Error as e:
+            raise self._error(e, 'notify', name) from e
+
+    def watch(self, name: str, callback, error_callback):
+        """Watch a named RADOS object for notifications.
+
+        :param name: Name of the RADOS object to watch
+        :param callback: Called with (notify_id, notifier_id, watch_id,
+                         data) for each notification
+        :param error_callback: Called with (watch_id, error) if the watch
+                               is lost
+        :returns: The watch, which must be closed to stop watching
+        """
+        try:
+            return self.ioctx.watch(name, callback, error_callback)
+        except self._rados.Error as e:
+            raise self._error(e, 'watch', name) from e
+
+    def command(self, *cmd: str):
+        """Send a ceph command over the backend's cluster connection.
+
+        :param cmd: Command words and arguments, e.g. ('auth', 'get', 'x')
+
+        :returns: The parsed command output, see parse_output
+        """
+        target, command = build_command(*cmd)
+        logging.debug("Sending {} command: {}".format(target, command))
+        if target == 'mgr':
+            send = self.cluster.mgr_command
+        else:
+            send = self.cluster.mon_command
+        try:
+            ret, output, status = send(json.dumps(command), b'')
+        except self._rados.Error as e:
+            raise self._error(e, *cmd) from e
+        if ret != 0:
+            raise RadosError(-ret, [*cmd], output=output, stderr=status)
+        return parse_output(output)
+
+    def close(self):
+        """Release the I/O context and shut down the cluster connection."""
+        if self._ioctx is not None:
+            self._ioctx.close()
+            self._ioctx = None
+        if self._cluster is not None:
+            self._cluster.shutdown()
+            self._cluster = None
+
+
+def get_backend(client_name: str, ceph_pool: str,
+                ceph_conf: str = CEPH_CONF):
+    """Return the preferred object store backend available on this unit.
+
+    :param client_name: CephX user to connect as
+    :param ceph_pool: Pool holding the Ganesha objects
+    :param ceph_conf: Path to the ceph.conf to use
+
+    :returns: A LibradosBackend if the bindings are installed, otherwise a
+              RadosCLIBackend.
+    """
+    if _import_rados() is not None:
+        return LibradosBackend(client_name, ceph_pool, ceph_conf)
+    logging.info("rados python bindings unavailable, using the rados CLI")
+    return RadosCLIBackend(client_name, ceph_pool, ceph_conf)
@@ -0,0 +1,243 @@
+# Copyright 2026 OpenStack Charmers
+# See LICENSE file for licensing details.
+
+"""Size Ganesha's RPC threads, connections, queues and cache to the unit.
+
+Ganesha's defaults suit a small VM. Larger units get more RPC I/O queue
+threads, which serve the NFS requests, in proportion to their CPUs, and
+more connections and outstanding requests in proportion to their memory,
+each request holding up to a 1 MiB read or write buffer. Every value can
+be set through the charm config instead.
+
+The metadata cache is sized by a cache profile, as a share of the unit's
+memory but no smaller than Ganesha's default, and the profile also sets
+how long attributes are cached for.
+
+FSAL_CEPH's libcephfs clients are tuned through the [client] section of
+ceph.conf, from charm options and a map of overrides limited to
+CLIENT_OPTIONS.
+"""
+
+import collections
+import logging
+import os
+from typing import Dict, Optional, Tuple
+
+import yaml
+
+MIB = 1024 * 1024
+
+# Ganesha parameter: (charm config option, minimum, maximum), in the order
+# they are rendered into NFS_CORE_PARAM
+PARAMETERS = collections.OrderedDict([
+    ('RPC_Ioq_ThrdMin', ('rpc-ioq-threads-min', 2, 1024 * 128)),
+    ('RPC_Ioq_ThrdMax', ('rpc-ioq-threads-max', 2, 1024 * 128)),
+    ('RPC_Max_Connections', ('rpc-max-connections', 1, 10000)),
+    ('Dispatch_Max_Reqs', ('dispatch-max-requests', 1, 10000)),
+])
+
+# Approximate memory held by one cached entry, with its handle and
+# attributes
+MDCACHE_ENTRY_SIZE = 2048
+
+# Ganesha's own Entries_HWMark, which no profile goes below
+DEFAULT_ENTRIES_HWMARK = 100000
+
+# Cache profile: (share of memory for cached entries, Dir_Chunk,
+# Attr_Expiration_Time). A Dir_Chunk of 0 disables directory caching, and
+# a share of None leaves Entries_HWMark at Ganesha's default.
+CACHE_PROFILES = collections.OrderedDict([
+    # libcephfs caches coherently itself, so Ganesha caches as little as it
+    # can on top, as needed by active/active clusters
+    ('coherent', (None, 0, 0)),
+    ('balanced', (0.05, 128, 10)),
+    # Large, mostly read trees such as build artifacts
+    ('read-heavy', (0.10, 1024, 60)),
+])
+DEFAULT_CACHE_PROFILE = 'coherent'
+
+
+def host_resources(meminfo: str = '/proc/meminfo') -> Tuple[int, int]:
+    """Number of CPUs and bytes of memory of this unit."""
+    memory = 0
+    try:
+        with open(meminfo) as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    memory = int(line.split()[1]) * 1024
+                    break
+    except (OSError, ValueError, IndexError) as e:
+        logging.warning("Failed to read total memory: {}".format(e))
+    return os.cpu_count() or 1, memory
+
+
+def _clamp(value: int, minimum: int, maximum: int) -> int:
+    return max(minimum, min(value, maximum))
+
+
+def automatic(cpus: int, memory: int) -> Dict[str, int]:
+    """Values derived from the unit's resources, never below Ganesha's
+    defaults.
+
+    :param cpus: Number of CPUs
+    :param memory: Bytes of memory
+    """
+    memory_mib = memory // MIB
+    return {
+        'RPC_Ioq_ThrdMin': _clamp(cpus, 2, 1024),
+        'RPC_Ioq_ThrdMax': _clamp(cpus * 16, 200, 1024),
+        'RPC_Max_Connections': _clamp(memory_mib // 16, 1024, 10000),
+        # Outstanding requests may use up to a quarter of the memory
+        'Dispatch_Max_Reqs': _clamp(memory_mib // 4, 5000, 10000),
+    }
+
+
+def ganesha_tuning(cpus: int, memory: int,
+                   config: Dict[str, Optional[int]]) -> Dict[str, Dict]:
+    """The values to render into NFS_CORE_PARAM.
+
+    Values set in config replace the automatic ones, within the range
+    Ganesha accepts. RPC_Ioq_ThrdMax is raised to RPC_Ioq_ThrdMin if it
+    is lower.
+
+    :param cpus: Number of CPUs
+    :param memory: Bytes of memory
+    :param config: The charm config, or any mapping of its options
+    :returns: {parameter: {'value': value, 'source': 'auto' or 'config'}},
+              ordered as PARAMETERS
+    """
+    auto = automatic(cpus, memory)
+    tuning = collections.OrderedDict()
+    for parameter, (option, minimum, maximum) in PARAMETERS.items():
+        value = config.get(option)
+        if value is None:
+            tuning[parameter] = {'value': auto[parameter], 'source': 'auto'}
+            continue
+        if not minimum <= value <= maximum:
+            logging.warning("{} must be between {} and {}, using {}".format(
+                option, minimum, maximum, _clamp(value, minimum, maximum)))
+        tuning[parameter] = {'value': _clamp(value, minimum, maximum),
+                             'source': 'config'}
+    threads_min = tuning['RPC_Ioq_ThrdMin']['value']
+    if tuning['RPC_Ioq_ThrdMax']['value'] < threads_min:
+        logging.warning("Raising RPC_Ioq_ThrdMax to RPC_Ioq_ThrdMin ({})"
+                        .format(threads_min))
+        tuning['RPC_Ioq_ThrdMax']['value'] = threads_min
+    return tuning
+
+
+def cache_profile(profile: Optional[str]) -> str:
+    """The profile to use, coherent if profile is not a known one."""
+    if profile not in CACHE_PROFILES:
+        logging.warning("Unknown cache-profile {}, using {}; expected one of "
+                        "{}".format(profile, DEFAULT_CACHE_PROFILE,
+                                    ', '.join(CACHE_PROFILES)))
+        return DEFAULT_CACHE_PROFILE
+    return profile
+
+
+def mdcache_tuning(profile: str, memory: int) -> Dict[str, int]:
+    """The values to render into the MDCACHE block.
+
+    :param profile: One of CACHE_PROFILES
+    :param memory: Bytes of memory
+    :returns: Value by MDCACHE parameter, in the order to render them
+    """
+    share, dir_chunk, _ = CACHE_PROFILES[profile]
+    if share is None:
+        return collections.OrderedDict([('Dir_Chunk', dir_chunk)])
+    entries = _clamp(int(memory * share) // MDCACHE_ENTRY_SIZE,
+                     DEFAULT_ENTRIES_HWMARK, 10000000)
+    tuning = collections.OrderedDict([
+        ('Entries_HWMark', entries),
+        ('Dir_Chunk', dir_chunk),
+    ])
+    if dir_chunk:
+        # Enough chunks to hold every cached entry
+        tuning['Chunks_HWMark'] = entries // dir_chunk
+    return tuning
+
+
+def attr_expiration_time(profile: str) -> int:
+    """Seconds attributes are cached for, for EXPORT_DEFAULTS."""
+    return CACHE_PROFILES[profile][2]
+
+
+# libcephfs client options that may be set, to tune its caches, readahead
+# and capability handling. Anything that changes what is mounted, or how,
+# is left out.
+CLIENT_OPTIONS = frozenset([
+    'client_oc',
+    'client_oc_size',
+    'client_oc_max_dirty',
+    'client_oc_max_dirty_age',
+    'client_oc_max_objects',
+    'client_oc_target_dirty',
+    'client_cache_size',
+    'client_cache_mid',
+    'client_readahead_min',
+    'client_readahead_max_bytes',
+    'client_readahead_max_periods',
+    'client_caps_release_delay',
+    'client_tick_interval',
+    'client_trim_interval',
+    'client_dirsize_rbytes',
+])
+
+# Charm option: (client option, multiplier)
+CLIENT_CHARM_OPTIONS = collections.OrderedDict([
+    ('client-oc-size', ('client_oc_size', MIB)),
+    ('client-cache-size', ('client_cache_size', 1)),
+    ('client-readahead-max-bytes', ('client_readahead_max_bytes', 1)),
+])
+
+
+def parse_client_overrides(text: Optional[str]) -> Dict[str, str]:
+    """Parse the client-overrides option.
+
+    :param text: YAML map of libcephfs client options to values. Option
+                 names may use spaces, dashes or underscores.
+    :returns: Rendered value by option name, with underscores
+    :raises: ValueError if text is not a map of CLIENT_OPTIONS to scalar
+             values
+    """
+    if not text:
+        return {}
+    try:
+        overrides = yaml.safe_load(text)
+    except yaml.YAMLError as e:
+        raise ValueError('client-overrides is not valid YAML: {}'.format(e))
+    if not isinstance(overrides, dict):
+        raise ValueError('client-overrides must be a map of options')
+    options = {}
+    for key, value in overrides.items():
+        option = str(key).strip().replace(' ', '_').replace('-', '_')
+        if option not in CLIENT_OPTIONS:
+            raise ValueError('client-overrides: unsupported option {}'
+                             .format(key))
+        if value is None or isinstance(value, (dict, list)):
+            raise ValueError('client-overrides: {} must be a single value'
+                             .format(key))
+        if isinstance(value, bool):
+            value = str(value).lower()
+        options[option] = str(value)
+    return options
+
+
+def client_options(config: Dict) -> Dict[str, str]:
+    """libcephfs client options to render into the [client] section.
+
+    Options in client-overrides replace those set by the dedicated charm
+    options.
+
+    :param config: The charm config, or any mapping of its options
+    :returns: Rendered value by option name, sorted by name
+    :raises: ValueError if client-overrides is invalid
+    """
+    options = {}
+    for charm_option, (option, multiplier) in CLIENT_CHARM_OPTIONS.items():
+        value = config.get(charm_option)
+        if value is not None:
+            options[option] = str(value * multiplier)
+    options.update(parse_client_overrides(config.get('client-overrides')))
+    return collections.OrderedDict(sorted(options.items()))
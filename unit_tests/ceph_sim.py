@@ -0,0 +1,570 @@
+# Copyright 2026 OpenStack Charmers
+# See LICENSE file for licensing details.
+
+"""In-process stand-ins for a Ceph cluster and Ganesha.
+
+``SimCluster`` holds in-memory RADOS pools, CephFS subvolumes and CephX
+entities. ``SimBackend`` exposes a pool through the same interface as the
+backends in rados_backend, and ``SimGanesha`` serves the ExportMgr D-Bus
+methods to a real ganesha_dbus.ExportMgr through a stub bus. Every call
+can be given a latency and a failure rate with ``Faults``, so GaneshaNFS
+and the charm's action handlers can be run against thousands of shares,
+a slow cluster or a flaky one without any Ceph or Ganesha daemons.
+
+Typical use::
+
+    cluster = ceph_sim.SimCluster()
+    nfs = cluster.ganesha_client('ceph-nfs', 'ceph-nfs', export_dir)
+    nfs.initialise_pool()
+"""
+
+import errno
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+import ganesha
+import ganesha_dbus
+import manager
+import rados_backend
+
+INVALID_ARGS = 'org.freedesktop.DBus.Error.InvalidArgs'
+
+
+class Faults(object):
+    """Latency and failures to inject into simulated calls.
+
+    Operations are named after the backend method (get, put, omap_set,
+    command, ...) or the ExportMgr method (AddExport, ...) they stand for.
+    The key '*' applies to every operation without its own entry.
+
+    :param latency: Seconds each call of an operation takes
+    :param failure_rate: Probability, from 0 to 1, that a call fails
+    :param seed: Seed for choosing which calls fail
+    """
+
+    def __init__(self, latency: Optional[Dict[str, float]] = None,
+                 failure_rate: Optional[Dict[str, float]] = None,
+                 seed: int = 0):
+        self.latency = dict(latency or {})
+        self.failure_rate = dict(failure_rate or {})
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = {}
+        self.failures = {}
+
+    def _lookup(self, table: Dict[str, float], op: str) -> float:
+        return table.get(op, table.get('*', 0))
+
+    def apply(self, op: str) -> bool:
+        """Count and delay a call, and decide whether it fails.
+
+        :returns: True if the call should fail
+        """
+        delay = self._lookup(self.latency, op)
+        if delay:
+            time.sleep(delay)
+        rate = self._lookup(self.failure_rate, op)
+        with self._lock:
+            self.calls[op] = self.calls.get(op, 0) + 1
+            failed = bool(rate) and self._random.random() < rate
+            if failed:
+                self.failures[op] = self.failures.get(op, 0) + 1
+        return failed
+
+
+class SimObject(object):
+    """A RADOS object. The version increases with every write to it."""
+
+    __slots__ = ('data', 'omap', 'version', 'mtime')
+
+    def __init__(self):
+        self.data = ''
+        self.omap = {}
+        self.version = 0
+        self.mtime = 0.0
+
+
+class SimPool(object):
+    """An in-memory RADOS pool.
+
+    mtimes come from a logical clock advanced by every write, so writes
+    in quick succession still change an object's mtime.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.objects = {}
+        self.locks = {}
+        self.watches = {}
+        self._clock = itertools.count(1)
+        self._watch_ids = itertools.count(1)
+        self.lock = threading.RLock()
+
+    def touch(self, name: str) -> SimObject:
+        """Return an object for writing, creating it if need be."""
+        obj = self.objects.get(name)
+        if obj is None:
+            obj = self.objects[name] = SimObject()
+        obj.version += 1
+        obj.mtime = 1700000000.0 + next(self._clock)
+        return obj
+
+    def version(self, name: str) -> Optional[int]:
+        """The version of an object, or None if it does not exist."""
+        obj = self.objects.get(name)
+        return None if obj is None else obj.version
+
+
+class SimWatch(object):
+
+    def __init__(self, pool: SimPool, name: str, watch_id: int,
+                 callback, error_callback):
+        self.pool = pool
+        self.name = name
+        self.watch_id = watch_id
+        self.callback = callback
+        self.error_callback = error_callback
+
+    def close(self):
+        with self.pool.lock:
+            self.pool.watches.get(self.name, {}).pop(self.watch_id, None)
+
+
+class SimCluster(object):
+    """A simulated Ceph cluster with a single CephFS volume.
+
+    :param faults: Latency and failures for calls into the cluster
+    :param volume: Name of the CephFS volume
+    """
+
+    def __init__(self, faults: Optional[Faults] = None,
+                 volume: str = 'ceph-fs'):
+        self.faults = faults or Faults()
+        self.volume = volume
+        self.pools = {}
+        # Subvolume name to its 'path', 'size' and authorized 'auth_ids'
+        self.subvolumes = {}
+        # CephX entity to its key
+        self.auth = {}
+        self.lock = threading.RLock()
+
+    def pool(self, name: str) -> SimPool:
+        with self.lock:
+            if name not in self.pools:
+                self.pools[name] = SimPool(name)
+            return self.pools[name]
+
+    def backend(self, client_name: str, pool: str) -> 'SimBackend':
+        """A backend for a pool, as rados_backend.get_backend would give."""
+        return SimBackend(self, client_name, pool)
+
+    def ganesha_client(self, client_name: str, pool: str, export_dir: str,
+                       server: 'SimGanesha' = None, **kwargs):
+        """A GaneshaNFS client using this cluster and a simulated Ganesha.
+
+        :param export_dir: Directory export blocks are staged in
+        :param server: Ganesha to talk to, by default a new one sharing
+                       the cluster's faults
+        :param kwargs: Passed on to GaneshaNFS
+        """
+        if server is None:
+            server = SimGanesha(self.faults)
+        nfs = ganesha.GaneshaNFS(
+            client_name, pool, backend=self.backend(client_name, pool),
+            export_mgr=server.export_mgr(), **kwargs)
+        nfs.export_dir = export_dir
+        return nfs
+
+    def _fail(self, op: str, *cmd: str):
+        if self.faults.apply(op):
+            raise rados_backend.RadosError(
+                errno.EIO, [op, *cmd], stderr='Injected failure')
+
+    def command(self, *cmd: str):
+        """Run a ceph command, as LibradosBackend.command would.
+
+        Commands are validated with rados_backend.build_command, so only
+        the commands GaneshaNFS is known to send are accepted.
+        """
+        self._fail('command', *cmd)
+        _target, command = rados_backend.build_command(*cmd)
+        handler = getattr(
+            self, '_' + command['prefix'].replace(' ', '_'))
+        with self.lock:
+            output = handler(command)
+        if output is None:
+            return None
+        return rados_backend.parse_output(
+            output if isinstance(output, bytes)
+            else json.dumps(output).encode('utf-8'))
+
+    def _error(self, code: int, command: Dict, message: str):
+        return rados_backend.RadosError(
+            code, [command['prefix']], stderr=message)
+
+    def _subvolume(self, command: Dict) -> Dict:
+        if command['vol_name'] != self.volume:
+            raise self._error(errno.ENOENT, command, 'volume {} not found'
+                              .format(command['vol_name']))
+        try:
+            return self.subvolumes[command['sub_name']]
+        except KeyError:
+            raise self._error(errno.ENOENT, command, 'subvolume {} not found'
+                              .format(command['sub_name']))
+
+    def _fs_subvolume_create(self, command):
+        if command['vol_name'] != self.volume:
+            raise self._error(errno.ENOENT, command, 'volume {} not found'
+                              .format(command['vol_name']))
+        subvolume = self.subvolumes.setdefault(command['sub_name'], {
+            'path': '/volumes/_nogroup/{}/{}'.format(
+                command['sub_name'], uuid.uuid4()),
+            'size': None,
+            'auth_ids': set()})
+        if 'size' in command:
+            subvolume['size'] = command['size']
+
+    def _fs_subvolume_resize(self, command):
+        subvolume = self._subvolume(command)
+        size = int(command['new_size'])
+        if command.get('no_shrink') and subvolume['size'] is not None \
+                and size < subvolume['size']:
+            raise self._error(errno.EINVAL, command,
+                              "Can't resize the subvolume. The new size "
+                              "would be lesser than the current used size")
+        subvolume['size'] = size
+
+    def _fs_subvolume_authorize(self, command):
+        subvolume = self._subvolume(command)
+        entity = 'client.{}'.format(command['auth_id'])
+        if entity not in self.auth:
+            self.auth[entity] = 'AQ{}=='.format(uuid.uuid4().hex)
+        subvolume['auth_ids'].add(command['auth_id'])
+        return self.auth[entity].encode('utf-8')
+
+    def _fs_subvolume_deauthorize(self, command):
+        subvolume = self._subvolume(command)
+        if command['auth_id'] not in subvolume['auth_ids']:
+            raise self._error(errno.ENOENT, command, 'auth ID {} not found'
+                              .format(command['auth_id']))
+        subvolume['auth_ids'].discard(command['auth_id'])
+        self.auth.pop('client.{}'.format(command['auth_id']), None)
+
+    def _fs_subvolume_rm(self, command):
+        self._subvolume(command)
+        del self.subvolumes[command['sub_name']]
+
+    def _fs_subvolume_getpath(self, command):
+        return self._subvolume(command)['path'].encode('utf-8')
+
+    def _auth_get(self, command):
+        entity = command['entity']
+        if entity not in self.auth:
+            raise self._error(errno.ENOENT, command,
+                              'failed to find {} in keyring'.format(entity))
+        return [{'entity': entity, 'key': self.auth[entity], 'caps': {}}]
+
+
+class SimBackend(object):
+    """Object store backend over a pool of a SimCluster."""
+
+    def __init__(self, cluster: SimCluster, client_name: str,
+                 ceph_pool: str):
+        self.cluster = cluster
+        self.client_name = client_name
+        self.ceph_pool = ceph_pool
+        self.pool = cluster.pool(ceph_pool)
+        self._notifier_id = next(_notifier_ids)
+
+    def _op(self, op: str, name: str):
+        self.cluster._fail(op, name)
+
+    def _object(self, op: str, name: str) -> SimObject:
+        obj = self.pool.objects.get(name)
+        if obj is None:
+            raise rados_backend.RadosError(
+                errno.ENOENT, [op, name], stderr='No such file or directory')
+        return obj
+
+    def get(self, name: str) -> str:
+        self._op('get', name)
+        with self.pool.lock:
+            return self._object('get', name).data
+
+    def put(self, name: str, data: str):
+        self._op('put', name)
+        with self.pool.lock:
+            self.pool.touch(name).data = data
+
+    def stat(self, name: str):
+        self._op('stat', name)
+        with self.pool.lock:
+            obj = self._object('stat', name)
+            return len(obj.data.encode('utf-8')), obj.mtime
+
+    def remove(self, name: str):
+        self._op('remove', name)
+        with self.pool.lock:
+            self._object('remove', name)
+            del self.pool.objects[name]
+
+    def omap_keys(self, name: str):
+        self._op('omap_keys', name)
+        with self.pool.lock:
+            return sorted(self._object('omap_keys', name).omap)
+
+    def omap_get(self, name: str, keys):
+        self._op('omap_get', name)
+        with self.pool.lock:
+            obj = self.pool.objects.get(name)
+            omap = {} if obj is None else obj.omap
+            return {key: omap[key] for key in keys if key in omap}
+
+    def omap_set(self, name: str, values):
+        self._op('omap_set', name)
+        with self.pool.lock:
+            self.pool.touch(name).omap.update(values)
+
+    def omap_remove(self, name: str, keys):
+        self._op('omap_remove', name)
+        with self.pool.lock:
+            obj = self.pool.touch(name)
+            for key in keys:
+                obj.omap.pop(key, None)
+
+    def lock(self, name: str, lock_name: str, cookie: str, duration: int):
+        self._op('lock', name)
+        with self.pool.lock:
+            holder = self.pool.locks.get((name, lock_name))
+            if holder is not None and holder[0] != cookie \
+                    and holder[1] > time.monotonic():
+                raise rados_backend.RadosError(
+                    errno.EBUSY, ['lock', name], stderr='Device or '
+                    'resource busy')
+            self.pool.touch(name)
+            self.pool.locks[(name, lock_name)] = (
+                cookie, time.monotonic() + duration)
+
+    def unlock(self, name: str, lock_name: str, cookie: str):
+        self._op('unlock', name)
+        with self.pool.lock:
+            holder = self.pool.locks.get((name, lock_name))
+            if holder is None or holder[0] != cookie:
+                raise rados_backend.RadosError(
+                    errno.ENOENT, ['unlock', name], stderr='No such lock')
+            del self.pool.locks[(name, lock_name)]
+
+    def notify(self, name: str, data: str, timeout_ms: int):
+        """Deliver a notification to the object's watchers, in turn."""
+        self._op('notify', name)
+        with self.pool.lock:
+            watches = list(self.pool.watches.get(name, {}).values())
+        for watch in watches:
+            watch.callback(next(_notify_ids), self._notifier_id,
+                           watch.watch_id, data)
+
+    def watch(self, name: str, callback, error_callback) -> SimWatch:
+        self._op('watch', name)
+        with self.pool.lock:
+            self._object('watch', name)
+            watch = SimWatch(self.pool, name, next(self.pool._watch_ids),
+                             callback, error_callback)
+            self.pool.watches.setdefault(name, {})[watch.watch_id] = watch
+        return watch
+
+    def break_watches(self, name: str):
+        """Drop every watch on an object, as a lost connection would."""
+        with self.pool.lock:
+            watches = list(self.pool.watches.pop(name, {}).values())
+        for watch in watches:
+            watch.error_callback(watch.watch_id, -errno.ENOTCONN)
+
+    def command(self, *cmd: str):
+        return self.cluster.command(*cmd)
+
+    def close(self):
+        pass
+
+
+_notifier_ids = itertools.count(1)
+_notify_ids = itertools.count(1)
+
+
+class SimGanesha(object):
+    """The ExportMgr D-Bus object of a simulated ganesha.nfsd.
+
+    Exports are read from the staged files GaneshaNFS passes, as Ganesha
+    would, and are kept by export ID along with the config they were
+    loaded from. I/O recorded with record_io is reported through the
+    exportstats methods.
+
+    :param faults: Latency and failures for ExportMgr calls
+    """
+
+    def __init__(self, faults: Optional[Faults] = None):
+        self.faults = faults or Faults()
+        self.exports = {0: {'Export_Id': 0, 'Path': '/'}}
+        self.lock = threading.Lock()
+        # Counters by (minor version, export ID) and op, in the order of
+        # ganesha_dbus.IO_FIELDS
+        self.io = {}
+        self.clients = set()
+
+    def export_mgr(self) -> ganesha_dbus.ExportMgr:
+        """A real ExportMgr client connected to this Ganesha."""
+        return ganesha_dbus.ExportMgr(bus=_SimBus(self))
+
+    def _fail(self, method: str):
+        if self.faults.apply(method):
+            raise ganesha_dbus.GaneshaDBusError(
+                'org.freedesktop.DBus.Error.Failed', 'Injected failure')
+
+    def _select(self, conf_path: str, expression: str) -> Dict:
+        match = re.match(r'EXPORT\((\w+)=(.*)\)\Z', expression)
+        if match is None:
+            raise ganesha_dbus.GaneshaDBusError(
+                INVALID_ARGS, 'Invalid expression {}'.format(expression))
+        try:
+            with open(conf_path) as f:
+                conf = manager.parseconf(f.read())
+        except (OSError, ValueError, RuntimeError) as e:
+            raise ganesha_dbus.GaneshaDBusError(
+                INVALID_ARGS, 'Error while parsing {}: {}'.format(
+                    conf_path, e))
+        blocks = conf.get('EXPORT', [])
+        if isinstance(blocks, dict):
+            blocks = [blocks]
+        key, value = match.group(1).lower(), match.group(2)
+        for block in blocks:
+            for block_key, block_value in block.items():
+                if block_key.lower() == key and str(block_value) == value:
+                    return block
+        raise ganesha_dbus.GaneshaDBusError(
+            INVALID_ARGS, 'No EXPORT block matching {} in {}'.format(
+                expression, conf_path))
+
+    def AddExport(self, conf_path, expression):
+        self._fail('AddExport')
+        block = self._select(conf_path, expression)
+        export_id = int(block['Export_Id'])
+        with self.lock:
+            if export_id in self.exports:
+                raise ganesha_dbus.GaneshaDBusError(
+                    INVALID_ARGS, 'Export id {} already in use'
+                    .format(export_id))
+            self.exports[export_id] = block
+        return '1 exports added'
+
+    def UpdateExport(self, conf_path, expression):
+        self._fail('UpdateExport')
+        block = self._select(conf_path, expression)
+        export_id = int(block['Export_Id'])
+        with self.lock:
+            if export_id not in self.exports:
+                raise ganesha_dbus.GaneshaDBusError(
+                    INVALID_ARGS, 'Export id {} not found'.format(export_id))
+            self.exports[export_id] = block
+        return '1 exports updated'
+
+    def RemoveExport(self, export_id):
+        self._fail('RemoveExport')
+        with self.lock:
+            if self.exports.pop(int(export_id), None) is None:
+                raise ganesha_dbus.GaneshaDBusError(
+                    INVALID_ARGS, 'lookup_export failed with Export id {}'
+                    .format(export_id))
+
+    def ShowExports(self):
+        self._fail('ShowExports')
+        with self.lock:
+            exports = sorted(self.exports.items())
+        return (int(time.time()), 0), [
+            (export_id, block.get('Path', ''), True, True, False, False,
+             False, (0, 0))
+            for export_id, block in exports]
+
+    def record_io(self, client: str, export_id: int, op: str, nbytes: int,
+                  latency: float = 0.001, minor_version: int = 1):
+        """Count a read or write served to client."""
+        with self.lock:
+            self.clients.add(client)
+            counters = self.io.setdefault((minor_version, export_id), {
+                'read': [0] * 6, 'write': [0] * 6})[op]
+            for i, value in enumerate(
+                    (nbytes, nbytes, 1, 0, int(latency * 1e9), 0)):
+                counters[i] += value
+
+    def _io(self, minor_version: int, export_id: int):
+        self._fail('GetNFSv4{}IO'.format(minor_version))
+        timestamp = (int(time.time()), 0)
+        with self.lock:
+            counters = self.io.get((minor_version, int(export_id)))
+            if counters is None:
+                return (False, 'Export does not have any NFSv4.{} activity'
+                        .format(minor_version), timestamp)
+            return (True, 'OK', timestamp, tuple(counters['read']),
+                    tuple(counters['write']))
+
+    def GetNFSv41IO(self, export_id):
+        return self._io(1, export_id)
+
+    def GetNFSv42IO(self, export_id):
+        return self._io(2, export_id)
+
+    def GetGlobalOPS(self):
+        self._fail('GetGlobalOPS')
+        totals = {1: 0, 2: 0}
+        with self.lock:
+            for (minor_version, _), counters in self.io.items():
+                totals[minor_version] += sum(
+                    op[2] for op in counters.values())
+        return (True, 'OK', (int(time.time()), 0), (
+            'NFSv3:', 0, 'NFSv40:', 0, 'NFSv41:', totals[1],
+            'NFSv42:', totals[2]))
+
+    def ShowClients(self):
+        self._fail('ShowClients')
+        with self.lock:
+            return (int(time.time()), 0), [
+                (client, False, False, False, False, False, True, False,
+                 False, (0, 0)) for client in sorted(self.clients)]
+
+
+class _SimBus(object):
+    """Stub bus routing Ganesha method lookups to a SimGanesha."""
+
+    def __init__(self, server: SimGanesha):
+        self.server = server
+
+    def get_object(self, bus_name, object_path):
+        return self
+
+    def get_dbus_method(self, method, dbus_interface=None):
+        return getattr(self.server, method)
+
+
+class SimActionEvent(object):
+    """Stand-in for the ActionEvent passed to a charm's action handlers.
+
+    :param params: The action's parameters
+    """
+
+    def __init__(self, params: Optional[Dict] = None):
+        self.params = dict(params or {})
+        self.results = None
+        self.failure = None
+
+    def set_results(self, results: Dict):
+        self.results = results
+
+    def fail(self, message: str = ''):
+        self.failure = message
+
+    def log(self, message: str):
+        pass
@@ -0,0 +1,106 @@
+# Copyright 2026 OpenStack Charmers
+# See LICENSE file for licensing details.
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.append('src')  # noqa
+
+import call_metrics
+
+from unit_tests import ceph_sim
+
+
+class CallRecorderTest(unittest.TestCase):
+
+    def test_record(self):
+        recorder = call_metrics.CallRecorder()
+        recorder.record('rados', 'get', 0.002, 100)
+        recorder.record('rados', 'get', 0.5, 50)
+        recorder.record('rados', 'get', 60)
+        with self.assertRaises(KeyError):
+            with recorder.timed('ceph', 'auth get') as timing:
+                timing.nbytes = 10
+                raise KeyError('client.x')
+        stats = recorder.stats[('rados', 'get')]
+        self.assertEqual(stats.count, 3)
+        self.assertEqual(stats.bytes, 150)
+        self.assertEqual(stats.buckets[1], 1)
+        self.assertEqual(stats.buckets[call_metrics.BUCKETS.index(0.5)], 1)
+        self.assertEqual(stats.buckets[-1], 1)
+        failed = recorder.stats[('ceph', 'auth get')]
+        self.assertEqual((failed.count, failed.errors, failed.bytes),
+                         (1, 1, 10))
+        self.assertEqual(recorder.summary().splitlines(), [
+            'rados get: 3 calls, 60502.0ms, 150 bytes',
+            'ceph auth get: 1 calls, 0.0ms, 10 bytes, 1 failed'])
+
+    def test_publish(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        textfile = os.path.join(tmpdir.name, 'charm.prom')
+        state_file = os.path.join(tmpdir.name, 'state.json')
+        for seconds in (0.002, 2):
+            # One recorder per hook
+            recorder = call_metrics.CallRecorder()
+            recorder.record('exec', 'systemctl restart', seconds)
+            recorder.record('rados', 'put', 0.001, 5)
+            recorder.publish(textfile, state_file)
+            self.assertEqual(recorder.stats, {})
+        with open(textfile) as f:
+            lines = f.read().splitlines()
+        prefix = 'ceph_nfs_charm_call'
+        self.assertIn(
+            prefix + '_calls_total{kind="exec",op="systemctl restart"} 2',
+            lines)
+        self.assertIn(
+            prefix + '_bytes_total{kind="rados",op="put"} 10', lines)
+        self.assertIn(
+            prefix + '_duration_seconds_bucket{kind="exec",'
+            'op="systemctl restart",le="0.0025"} 1', lines)
+        self.assertIn(
+            prefix + '_duration_seconds_bucket{kind="exec",'
+            'op="systemctl restart",le="+Inf"} 2', lines)
+        self.assertIn(
+            prefix + '_duration_seconds_count{kind="rados",op="put"} 2',
+            lines)
+        self.assertIn('# TYPE {}_duration_seconds histogram'.format(prefix),
+                      lines)
+
+    def test_unreadable_state_is_reset(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        state_file = os.path.join(tmpdir.name, 'state.json')
+        with open(state_file, 'w') as f:
+            f.write('{')
+        recorder = call_metrics.CallRecorder()
+        recorder.record('rados', 'get', 0.001)
+        recorder.publish(os.path.join(tmpdir.name, 'charm.prom'), state_file)
+        self.assertEqual(len(call_metrics._load_state(state_file)), 1)
+
+
+class InstrumentedGaneshaNFSTest(unittest.TestCase):
+
+    def test_calls_are_recorded(self):
+        export_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(export_dir.cleanup)
+        recorder = call_metrics.CallRecorder()
+        cluster = ceph_sim.SimCluster()
+        nfs = cluster.ganesha_client('ceph-nfs', 'ceph-nfs', export_dir.name,
+                                     recorder=recorder)
+        nfs.initialise_pool()
+        nfs.create_share('a')
+        cluster.faults.failure_rate['get'] = 1
+        with self.assertRaises(subprocess.CalledProcessError):
+            nfs._rados_get(nfs.export_counter)
+        stats = recorder.stats
+        self.assertEqual(stats[('ceph', 'fs subvolume create')].count, 1)
+        self.assertEqual(stats[('ceph', 'auth get')].count, 1)
+        self.assertEqual(stats[('dbus', 'add_export')].count, 1)
+        self.assertEqual(stats[('rados', 'get')].errors, 1)
+        export = cluster.pool('ceph-nfs').objects['ganesha-export-1000']
+        self.assertGreaterEqual(stats[('rados', 'put')].bytes,
+                                len(export.data))
@@ -4,6 +4,8 @@
 # Learn more about testing at: https://juju.is/docs/sdk/testing
 
 
+import json
+import tempfile
 import unittest
 import sys
 
@@ -20,6 +22,8 @@ with patch('charmhelpers.core.host_factory.ubuntu.cmp_pkgrevno',
            Mock(return_value=1)):
     import charm
 
+from unit_tests import ceph_sim
+
 
 class CharmTestCase(unittest.TestCase):
 
@@ -65,3 +69,159 @@ class TestCephNFSCharmBase(CharmTestCase):
     def test_init(self):
         self.harness.begin()
         self.assertFalse(self.harness.charm._stored.is_started)
+
+
+class TestCephNFSCharmActions(CharmTestCase):
+    """Run the share actions against a simulated cluster and Ganesha."""
+
+    PATCHES = [
+        'ch_templating',
+    ]
+
+    def setUp(self):
+        super().setUp(charm, self.PATCHES)
+        export_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(export_dir.cleanup)
+        self.harness = Harness(_CephNFSCharm)
+        self.addCleanup(self.harness.cleanup)
+        self.harness.add_relation('cluster', 'ceph-nfs')
+        self.harness.set_leader(True)
+        self.harness.begin()
+        self.charm = self.harness.charm
+        self.cluster = ceph_sim.SimCluster()
+        self.server = ceph_sim.SimGanesha()
+        nfs = self.cluster.ganesha_client(
+            self.charm.client_name, self.charm.pool_name, export_dir.name,
+            server=self.server, recorder=self.charm.metrics)
+        nfs.initialise_pool()
+        self.charm._ganesha_client = nfs
+        access_address = patch.object(
+            _CephNFSCharm, 'access_address', return_value='10.5.0.100')
+        access_address.start()
+        self.addCleanup(access_address.stop)
+
+    def run_action(self, handler, **params):
+        event = ceph_sim.SimActionEvent(params)
+        handler(event)
+        return event
+
+    def test_create_share_action(self):
+        event = self.run_action(
+            self.charm.create_share_action, name='a', size=1,
+            **{'allowed-ips': '10.0.0.0/8, 192.168.0.1'})
+        self.assertIsNone(event.failure)
+        self.assertEqual(event.results['ip'], '10.5.0.100')
+        self.assertEqual(event.results['path'],
+                         self.cluster.subvolumes['a']['path'])
+        self.assertEqual(self.server.exports[1000]['CLIENT']['Clients'],
+                         '10.0.0.0/8,192.168.0.1')
+        self.assertEqual([entry[1:3] for entry in
+                          self.charm.peers.export_journal],
+                         [['add', 1000]])
+
+    def test_access_actions(self):
+        self.run_action(self.charm.create_share_action, name='a',
+                        **{'allowed-ips': '10.0.0.0/8'})
+        event = self.run_action(self.charm.grant_access_action,
+                                name='a', client='192.168.0.1')
+        self.assertIsNone(event.failure)
+        self.assertEqual(self.server.exports[1000]['CLIENT']['Clients'],
+                         '10.0.0.0/8,192.168.0.1')
+        event = self.run_action(self.charm.revoke_access_action,
+                                name='a', client='10.0.0.0/8')
+        self.assertIsNone(event.failure)
+        self.assertEqual(self.server.exports[1000]['CLIENT']['Clients'],
+                         '192.168.0.1')
+        event = self.run_action(self.charm.grant_access_action,
+                                name='b', client='192.168.0.1')
+        self.assertEqual(event.failure, 'Share does not exist')
+
+    def test_share_profiles(self):
+        event = self.run_action(
+            self.charm.create_share_action, name='a', profile='read-only',
+            **{'allowed-ips': '10.0.0.0/8'})
+        self.assertIsNone(event.failure)
+        self.assertEqual(self.server.exports[1000]['CLIENT']['Access_Type'],
+                         'ro')
+        event = self.run_action(
+            self.charm.update_share_action, name='a', profile='read-mostly',
+            **{'attr-expiration-time': 30})
+        self.assertIsNone(event.failure)
+        export = self.server.exports[1000]
+        self.assertEqual(export['CLIENT']['Access_Type'], 'rw')
+        self.assertEqual(export['Attr_Expiration_Time'], 30)
+        event = self.run_action(self.charm.update_share_action, name='a',
+                                profile='fast')
+        self.assertIn('Unknown profile', event.failure)
+
+    def test_bulk_create_shares_action(self):
+        event = self.run_action(
+            self.charm.bulk_create_shares_action, shares=json.dumps([
+                {'name': 'a', 'size': 1, 'profile': 'read-only'},
+                {'name': 'b', 'size': '10'},
+                {'name': 'c', 'profile': 'fast'},
+                {'name': 'd', 'read-only': 'yes'}]))
+        results = event.results['shares']
+        self.assertTrue(results[0]['created'])
+        self.assertEqual(self.server.exports[1000]['CLIENT']['Access_Type'],
+                         'ro')
+        self.assertEqual(results[1]['error'], 'size must be an integer')
+        self.assertIn('Unknown profile', results[2]['error'])
+        self.assertEqual(results[3]['error'],
+                         'read-only must be true or false')
+        self.assertEqual(event.results['message'],
+                         'Created 1 shares, 3 failed')
+
+    def test_list_and_delete_share_actions(self):
+        for name in ('a', 'b'):
+            self.run_action(self.charm.create_share_action, name=name,
+                            **{'allowed-ips': '0.0.0.0'})
+        event = self.run_action(self.charm.list_shares_action)
+        self.assertEqual(event.results['exports'], [
+            {'id': 1000, 'name': 'a'}, {'id': 1001, 'name': 'b'}])
+        self.assertIn('parse-hits', event.results['config-cache'])
+        self.run_action(self.charm.delete_share_action, name='a',
+                        purge=True)
+        self.assertEqual(sorted(self.server.exports), [0, 1001])
+        self.assertNotIn('a', self.cluster.subvolumes)
+
+    def test_action_timings(self):
+        event = self.run_action(self.charm.create_share_action, name='a',
+                                **{'allowed-ips': '0.0.0.0'})
+        self.assertNotIn('timings', event.results)
+        self.harness.update_config({'action-timings': True})
+        event = self.run_action(self.charm.grant_access_action, name='a',
+                                client='192.168.0.1')
+        timings = event.results['timings']
+        self.assertIn('action grant_access_action: 1 calls', timings)
+        self.assertIn('rados put: ', timings)
+        self.assertIn('dbus update_export: 1 calls', timings)
+
+    def test_close_ganesha_client(self):
+        nfs = self.charm._ganesha_client
+        with patch.object(nfs, 'close') as close:
+            self.charm.close_ganesha_client(None)
+        close.assert_called_once_with()
+        self.assertIsNone(self.charm._ganesha_client)
+        # Nothing to close in hooks that did not use the client
+        self.charm.close_ganesha_client(None)
+
+    @patch.object(charm.tuning, 'host_resources')
+    def test_show_tuning_action(self, host_resources):
+        host_resources.return_value = (32, 64 * 1024 ** 3)
+        self.harness.update_config({'rpc-max-connections': 2000})
+        event = self.run_action(self.charm.show_tuning_action)
+        self.assertEqual(event.results['cpus'], 32)
+        self.assertEqual(event.results['memory-mib'], 65536)
+        self.assertEqual(event.results['tuning']['rpc-ioq-threads-max'],
+                         {'value': 512, 'source': 'auto'})
+        self.assertEqual(event.results['tuning']['rpc-max-connections'],
+                         {'value': 2000, 'source': 'config'})
+        self.assertEqual(event.results['cache']['profile'], 'coherent')
+        self.harness.update_config({'cache-profile': 'read-heavy',
+                                    'attr-expiration-time': 300})
+        event = self.run_action(self.charm.show_tuning_action)
+        self.assertEqual(event.results['cache'], {
+            'profile': 'read-heavy', 'entries-hwmark': 3355443,
+            'dir-chunk': 1024, 'chunks-hwmark': 3276,
+            'attr-expiration-time': 300})
@@ -0,0 +1,249 @@
+# Copyright 2026 OpenStack Charmers
+# See LICENSE file for licensing details.
+
+import errno
+import subprocess
+import sys
+import tempfile
+import unittest
+import unittest.mock
+
+sys.path.append('src')  # noqa
+
+import ganesha_dbus
+import rados_backend
+
+from unit_tests import ceph_sim
+
+
+class SimClusterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cluster = ceph_sim.SimCluster()
+        self.backend = self.cluster.backend('ceph-nfs', 'ceph-nfs')
+
+    def test_object_versions(self):
+        pool = self.cluster.pool('ceph-nfs')
+        self.assertIsNone(pool.version('obj'))
+        self.backend.put('obj', 'a')
+        _, first_mtime = self.backend.stat('obj')
+        self.backend.put('obj', 'b')
+        self.backend.omap_set('obj', {'k': 'v'})
+        self.assertEqual(pool.version('obj'), 3)
+        self.assertEqual(self.backend.get('obj'), 'b')
+        self.assertEqual(self.backend.stat('obj')[0], 1)
+        self.assertGreater(self.backend.stat('obj')[1], first_mtime)
+        self.backend.remove('obj')
+        with self.assertRaises(subprocess.CalledProcessError) as cm:
+            self.backend.get('obj')
+        self.assertEqual(cm.exception.returncode, errno.ENOENT)
+
+    def test_locks(self):
+        self.backend.lock('counter', 'lock', 'a', 30)
+        other = self.cluster.backend('ceph-nfs', 'ceph-nfs')
+        with self.assertRaises(rados_backend.RadosError) as cm:
+            other.lock('counter', 'lock', 'b', 30)
+        self.assertEqual(cm.exception.returncode, errno.EBUSY)
+        self.backend.unlock('counter', 'lock', 'a')
+        other.lock('counter', 'lock', 'b', 30)
+
+    def test_watch_notify(self):
+        self.backend.put('index', '')
+        received, errors = [], []
+        watch = self.backend.watch(
+            'index', lambda *args: received.append(args[-1]),
+            lambda watch_id, error: errors.append(error))
+        self.backend.notify('index', 'hello', 1000)
+        self.assertEqual(received, ['hello'])
+        self.backend.break_watches('index')
+        self.assertEqual(errors, [-errno.ENOTCONN])
+        watch.close()
+
+    def test_subvolume_commands(self):
+        self.backend.command('fs', 'subvolume', 'create', 'ceph-fs', 'a',
+                             '1024')
+        self.backend.command('fs', 'subvolume', 'authorize', 'ceph-fs', 'a',
+                             'ganesha-a')
+        path = self.backend.command('fs', 'subvolume', 'getpath', 'ceph-fs',
+                                    'a')
+        self.assertTrue(path.startswith('/volumes/_nogroup/a/'))
+        key = self.backend.command('auth', 'get', 'client.ganesha-a')
+        self.assertEqual(key[0]['key'], self.cluster.auth['client.ganesha-a'])
+        with self.assertRaises(rados_backend.RadosError):
+            self.backend.command('fs', 'subvolume', 'resize', 'ceph-fs', 'a',
+                                 '10', '--no_shrink')
+        self.backend.command('fs', 'subvolume', 'deauthorize', 'ceph-fs',
+                             'a', 'ganesha-a')
+        self.backend.command('fs', 'subvolume', 'rm', 'ceph-fs', 'a')
+        with self.assertRaises(rados_backend.RadosError) as cm:
+            self.backend.command('fs', 'subvolume', 'getpath', 'ceph-fs', 'a')
+        self.assertEqual(cm.exception.returncode, errno.ENOENT)
+        with self.assertRaises(ValueError):
+            self.backend.command('osd', 'pool', 'ls')
+
+    def test_faults(self):
+        faults = ceph_sim.Faults(failure_rate={'put': 1},
+                                 latency={'*': 0.001})
+        backend = ceph_sim.SimCluster(faults).backend('ceph-nfs', 'ceph-nfs')
+        with self.assertRaises(subprocess.CalledProcessError):
+            backend.put('obj', 'a')
+        backend.omap_set('obj', {})
+        self.assertEqual(faults.calls, {'put': 1, 'omap_set': 1})
+        self.assertEqual(faults.failures, {'put': 1})
+
+
+class SimGaneshaNFSTest(unittest.TestCase):
+
+    def setUp(self):
+        self.export_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.export_dir.cleanup)
+        self.cluster = ceph_sim.SimCluster()
+        self.server = ceph_sim.SimGanesha()
+        self.nfs = self.cluster.ganesha_client(
+            'ceph-nfs', 'ceph-nfs', self.export_dir.name, server=self.server)
+        self.nfs.initialise_pool()
+
+    def test_share_lifecycle(self):
+        path = self.nfs.create_share('a', size=1, access_ips=['10.0.0.0/8'])
+        self.assertEqual(self.cluster.subvolumes['a']['path'], path)
+        self.assertEqual(self.cluster.subvolumes['a']['size'], 1024 ** 3)
+        self.assertEqual(self.nfs.export_mgr.show_exports(), [0, 1000])
+        self.assertEqual(self.server.exports[1000]['Path'], path)
+
+        self.nfs.grant_access('a', '192.168.0.1')
+        self.assertIn('192.168.0.1',
+                      self.server.exports[1000]['CLIENT']['Clients'])
+        self.assertEqual([share.name for share in self.nfs.list_shares()],
+                         ['a'])
+
+        self.nfs.delete_share('a', purge=True)
+        self.assertEqual(self.nfs.export_mgr.show_exports(), [0])
+        self.assertEqual(self.cluster.subvolumes, {})
+        self.assertEqual(self.nfs.list_shares(), [])
+
+    def test_revoke_last_client(self):
+        self.nfs.create_shares([{'name': 'a', 'access_ips': ['10.0.0.1']},
+                                {'name': 'b'}])
+        self.assertIsNone(self.nfs.revoke_access('a', '10.0.0.1'))
+        self.assertEqual(self.nfs.get_share('a').clients, [])
+        self.nfs.grant_access('a', '10.0.0.2')
+        self.assertEqual(self.server.exports[1000]['CLIENT']['Clients'],
+                         '10.0.0.2')
+        # An object that cannot be parsed is skipped, not fatal
+        self.cluster.backend('ceph-nfs', 'ceph-nfs').put(
+            'ganesha-export-1001', 'EXPORT { Export_Id = 1001;')
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(
+                [share.name for share in self.nfs.list_shares()], ['a'])
+        self.assertEqual(self.nfs.get_share('a').name, 'a')
+
+    def test_update_share(self):
+        self.nfs.create_share('a', options={'attr_expiration_time': 60})
+        self.assertEqual(self.server.exports[1000]['Attr_Expiration_Time'],
+                         60)
+        self.assertIsNone(self.nfs.update_share('a', {'read_only': True}))
+        export = self.server.exports[1000]
+        self.assertEqual(export['CLIENT']['Access_Type'], 'ro')
+        self.assertEqual(export['Attr_Expiration_Time'], 60)
+        self.assertEqual(self.nfs.update_share('b', {}),
+                         'Share does not exist')
+
+    def test_minimize_exports(self):
+        self.nfs.create_shares([{'name': 'a'}, {'name': 'b'}])
+        pool = self.cluster.pool('ceph-nfs')
+        backend = self.cluster.backend('ceph-nfs', 'ceph-nfs')
+        legacy = {}
+        for share in self.nfs.list_shares():
+            # As written before the settings moved to EXPORT_DEFAULTS
+            share.export['Squash'] = 'None'
+            legacy[share.export_id] = share.to_export()
+            backend.put(self.nfs._export_object_name(share.export_id),
+                        legacy[share.export_id])
+        counts = self.nfs.minimize_exports(dry_run=True)
+        self.assertEqual(counts['exports'], 2)
+        self.assertEqual(counts['before'],
+                         sum(len(text) for text in legacy.values()))
+        self.assertEqual(
+            pool.objects['ganesha-export-1000'].data, legacy[1000])
+
+        self.assertEqual(self.nfs.minimize_exports(), counts)
+        self.assertEqual(counts['before'] - counts['after'],
+                         2 * len('    Squash = "None";\n'))
+        self.assertNotIn('Squash', pool.objects['ganesha-export-1000'].data)
+        self.assertNotIn('Squash', self.server.exports[1001])
+        self.assertEqual(self.nfs.minimize_exports()['exports'], 0)
+
+    def test_sync_exports(self):
+        self.nfs.create_shares([{'name': 'a'}, {'name': 'b'}])
+        # A unit whose Ganesha has not seen the shares yet
+        server = ceph_sim.SimGanesha()
+        export_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(export_dir.cleanup)
+        other = self.cluster.ganesha_client(
+            'ceph-nfs', 'ceph-nfs', export_dir.name, server=server)
+        self.assertEqual(other.sync_exports(),
+                         {'added': 2, 'updated': 0, 'unchanged': 0,
+                          'removed': 0})
+        self.assertEqual(sorted(server.exports), [0, 1000, 1001])
+        # A resync does not reapply what Ganesha already serves
+        self.nfs.grant_access('a', '10.0.0.1')
+        self.assertEqual(other.sync_exports(),
+                         {'added': 0, 'updated': 1, 'unchanged': 1,
+                          'removed': 0})
+
+    def test_ganesha_failures(self):
+        self.server.faults.failure_rate['AddExport'] = 1
+        # The share is still created, and Ganesha picks it up on resync
+        self.nfs.create_share('a')
+        self.assertEqual(self.nfs.export_mgr.show_exports(), [0])
+        with self.assertRaises(ganesha_dbus.GaneshaDBusError):
+            self.nfs.sync_exports()
+        self.server.faults.failure_rate['AddExport'] = 0
+        self.nfs.sync_exports()
+        self.assertEqual(self.nfs.export_mgr.show_exports(), [0, 1000])
+
+    def test_bulk_failures_are_per_share(self):
+        self.nfs.create_shares([{'name': 'a'}, {'name': 'b'}])
+        self.server.faults.failure_rate['UpdateExport'] = 1
+        results = self.nfs.update_access([
+            {'name': 'a', 'client': '10.0.0.1'},
+            {'name': 'b', 'client': '10.0.0.1'}])
+        self.assertTrue(all(result['error'].startswith('Stored')
+                            for result in results))
+        # Stored, and published for the other units to apply
+        self.assertIn('10.0.0.1', self.cluster.pool('ceph-nfs').objects[
+            'ganesha-export-1001'].data)
+        self.assertEqual([op for op, _, _ in self.nfs.pop_changes()][-2:],
+                         ['update', 'update'])
+
+        put = self.nfs._rados_put
+
+        def failing_put(name, data):
+            if name == 'ganesha-export-1003':
+                raise rados_backend.RadosError(1, 'put')
+            put(name, data)
+        with unittest.mock.patch.object(self.nfs, '_rados_put', failing_put):
+            results = self.nfs.create_shares([{'name': 'c'}, {'name': 'd'}])
+        self.assertTrue(results[0]['created'])
+        self.assertIn('error', results[1])
+        self.assertEqual([share.name for share in self.nfs.list_shares()],
+                         ['a', 'b', 'c'])
+
+    def test_create_share_failure(self):
+        self.cluster.faults.failure_rate['command'] = 1
+        self.assertIsNone(self.nfs.create_share('a'))
+        self.assertEqual(self.nfs.list_shares(), [])
+
+    def test_grant_access_calls_do_not_grow_with_shares(self):
+        calls = []
+        for count in (10, 200):
+            cluster = ceph_sim.SimCluster()
+            nfs = cluster.ganesha_client('ceph-nfs', 'ceph-nfs',
+                                         self.export_dir.name)
+            nfs.initialise_pool()
+            nfs.create_shares([
+                {'name': 'share-{}'.format(i)} for i in range(count)])
+            cluster.faults.calls.clear()
+            nfs.grant_access('share-5', '192.168.0.1')
+            calls.append(dict(cluster.faults.calls))
+        self.assertEqual(calls[0], calls[1])
@@ -0,0 +1,73 @@
+# Copyright 2026 OpenStack Charmers
+# See LICENSE file for licensing details.
+
+import subprocess
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.append('src')  # noqa
+
+import export_watcher
+import ganesha_dbus
+
+
+class TestExportWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.client = MagicMock()
+        self.watcher = export_watcher.ExportWatcher(self.client)
+
+    def _queued(self):
+        items = []
+        while not self.watcher.queue.empty():
+            items.append(self.watcher.queue.get())
+        return items
+
+    def test_on_notify(self):
+        self.watcher.on_notify(1, 2, 3, b'{"changes": [["add", 1000, "a"]]}')
+        self.watcher.on_notify(1, 2, 3, b'{"resync": true}')
+        self.watcher.on_notify(1, 2, 3, b'not json')
+        self.watcher.on_error(3, -107)
+        self.assertEqual(self._queued(), [
+            [['add', 1000, 'a']], export_watcher.RESYNC,
+            export_watcher.RESYNC])
+
+    def test_process_changes(self):
+        self.watcher.process([['add', 1000, 'a'], ['remove', 999, '']])
+        self.client.apply_change.assert_any_call('add', 1000, 'a')
+        self.client.apply_change.assert_any_call('remove', 999, '')
+        self.assertEqual(self._queued(), [])
+
+    def test_process_failure_resyncs(self):
+        self.client.apply_change.side_effect = ganesha_dbus.GaneshaDBusError(
+            'org.freedesktop.DBus.Error.InvalidArgs', 'bad export')
+        self.watcher.process([['add', 1000, 'a'], ['add', 1001, 'b']])
+        self.assertEqual(self.client.apply_change.call_count, 1)
+        self.assertEqual(self._queued(), [export_watcher.RESYNC])
+
+    def test_resync_rewatches(self):
+        first = MagicMock()
+        self.client.watch_changes.side_effect = [first, MagicMock()]
+        self.watcher.process(export_watcher.RESYNC)
+        self.watcher.process(export_watcher.RESYNC)
+        first.close.assert_called_once_with()
+        self.client.watch_changes.assert_called_with(
+            self.watcher.on_notify, self.watcher.on_error)
+        self.assertEqual(self.client.sync_exports.call_count, 2)
+
+    @patch.object(export_watcher.time, 'sleep')
+    def test_resync_failure_retries(self, mock_sleep):
+        self.client.sync_exports.side_effect = [
+            ganesha_dbus.GaneshaDBusError(
+                'org.freedesktop.DBus.Error.ServiceUnknown', 'restarting'),
+            subprocess.CalledProcessError(110, ['rados', 'ls']),
+            {'added': 1}]
+        self.watcher.process(export_watcher.RESYNC)
+        self.watcher.process(export_watcher.RESYNC)
+        self.watcher.process(export_watcher.RESYNC)
+        self.assertEqual(
+            [call.args for call in mock_sleep.call_args_list], [(1,), (2,)])
+        self.assertEqual(self._queued(), [
+            export_watcher.RESYNC, export_watcher.RESYNC])
+        self.assertEqual(self.watcher._retry_delay, 1)
@@ -1,4 +1,10 @@
+import os
+import shutil
+import stat
+import subprocess
+import tempfile
 import unittest
+import export_cache
 import ganesha
 
 
@@ -33,6 +39,65 @@ EXPORT {
 """
 
 
+class FakeBackend(object):
+    """Minimal in-memory stand-in for a rados_backend backend."""
+
+    def __init__(self):
+        self.objects = {}
+        self.omaps = {}
+        self.locks = {}
+        self.mtimes = {}
+        self.notifications = []
+
+    def get(self, name):
+        if name not in self.objects:
+            raise subprocess.CalledProcessError(2, ['get', name])
+        return self.objects[name]
+
+    def put(self, name, data):
+        self.objects[name] = data
+        self.mtimes[name] = self.mtimes.get(name, 1000.0) + 1
+
+    def stat(self, name):
+        if name not in self.objects:
+            raise subprocess.CalledProcessError(2, ['stat', name])
+        return len(self.objects[name]), self.mtimes.get(name, 1000.0)
+
+    def remove(self, name):
+        self.objects.pop(name)
+        self.omaps.pop(name, None)
+
+    def omap_keys(self, name):
+        return sorted(self.omaps.get(name, {}))
+
+    def omap_get(self, name, keys):
+        omap = self.omaps.get(name, {})
+        return {key: omap[key] for key in keys if key in omap}
+
+    def omap_set(self, name, values):
+        self.objects.setdefault(name, '')
+        self.omaps.setdefault(name, {}).update(values)
+
+    def omap_remove(self, name, keys):
+        for key in keys:
+            self.omaps.get(name, {}).pop(key, None)
+
+    def lock(self, name, lock_name, cookie, duration):
+        if self.locks.get((name, lock_name), cookie) != cookie:
+            raise subprocess.CalledProcessError(16, ['lock', 'get', name])
+        self.locks[(name, lock_name)] = cookie
+
+    def unlock(self, name, lock_name, cookie):
+        if self.locks.get((name, lock_name)) == cookie:
+            del self.locks[(name, lock_name)]
+
+    def notify(self, name, data, timeout_ms):
+        self.notifications.append((name, data))
+
+    def close(self):
+        pass
+
+
 class ExportTest(unittest.TestCase):
 
     def test_parser(self):
@@ -79,29 +144,201 @@ class ExportTest(unittest.TestCase):
                 {'Access_Type': 'rw', 'Clients': '10.0.0.0/8, 192.168.0.0/16'},
             ])
 
+    def test_client_acl(self):
+        options = ganesha.manager.parseconf(EXAMPLE_EXPORT)
+        options['EXPORT']['CLIENT'] = [
+            {'Clients': '10.0.0.1,10.0.0.2', 'Access_Type': 'RW'},
+            {'Access_Type': 'r', 'Clients': '10.0.1.1'},
+            {'Access_Type': 'rw', 'Clients': '10.0.0.2, 10.0.0.3'}]
+        export = ganesha.Export(ganesha._copy_conf(options))
+        self.assertIn('10.0.0.3', export.acl)
+        self.assertNotIn('10.0.0.4', export.acl)
+        self.assertEqual(export.clients_by_mode, {
+            'r': ['10.0.1.1'], 'rw': ['10.0.0.1', '10.0.0.2', '10.0.0.3']})
+        # Reading the clients does not rewrite the blocks
+        self.assertEqual(export.export_options, options)
+
+        export.remove_client('10.0.0.2')
+        export.add_client('10.0.1.1')
+        self.assertEqual(export.clients, [
+            {'Access_Type': 'r', 'Clients': '10.0.1.1'},
+            {'Access_Type': 'rw', 'Clients': '10.0.0.1, 10.0.0.3, 10.0.1.1'}])
+
+    def test_client_acl_normalizes(self):
+        export = ganesha.Export.from_export(EXAMPLE_EXPORT)
+        export.add_client('10.0.0.5/32')
+        export.add_client('10.1.2.3/8')
+        export.add_client('10.2.0.1')
+        export.add_client('client.example.com')
+        self.assertEqual(export.clients_by_mode['rw'], [
+            '0.0.0.0', '10.0.0.0/8', 'client.example.com'])
+
+        # Part of a network is not revoked on its own
+        export.remove_client('10.128.0.0/9')
+        self.assertEqual(export.clients_by_mode['rw'], [
+            '0.0.0.0', '10.0.0.0/8', 'client.example.com'])
+        export.remove_client('client.example.com')
+        export.remove_client('10.0.0.0/8')
+        self.assertEqual(export.clients_by_mode['rw'], ['0.0.0.0'])
+
+    def test_client_acl_covered_networks(self):
+        acl = ganesha.ClientACL([{'Access_Type': 'rw', 'Clients': (
+            '10.1.0.1, 10.1.255.255, 10.2.0.1, 10.1.3.0/24, '
+            '2001:db8::1, 2001:db8:1::1')}])
+        acl.add('10.1.0.0/16')
+        acl.add('2001:db8::/48')
+        self.assertEqual(acl.by_mode()['rw'], [
+            '10.2.0.1', '2001:db8:1::1', '10.1.0.0/16', '2001:db8::/48'])
+        self.assertIn('10.1.7.7', acl)
+        self.assertIn('2001:db8::5', acl)
+        self.assertNotIn('2001:db8:2::1', acl)
+        acl.discard('10.0.0.0/8')
+        acl.discard('2001:db8::/48')
+        self.assertEqual(acl.by_mode()['rw'], ['2001:db8:1::1'])
+        self.assertNotIn('10.1.7.7', acl)
+
+    def test_client_acl_match_all(self):
+        export = ganesha.Export.from_export(EXAMPLE_EXPORT)
+        self.assertIn('10.1.1.1', export.acl)
+        self.assertIn('client.example.com', export.acl)
+        export.remove_client('0.0.0.0/0')
+        export.add_client('10.0.0.0/8')
+        self.assertNotIn('192.168.0.1', export.acl)
+        # Granting every client keeps the other entries, and is written
+        # as Ganesha expects
+        export.add_client('0.0.0.0/0')
+        self.assertIn('192.168.0.1', export.acl)
+        self.assertEqual(export.clients, [
+            {'Access_Type': 'rw', 'Clients': '10.0.0.0/8, 0.0.0.0'}])
+        export.remove_client('0.0.0.0')
+        self.assertEqual(export.clients_by_mode['rw'], ['10.0.0.0/8'])
+
+    def test_optimize_acl(self):
+        export = ganesha.Export.from_export(EXAMPLE_EXPORT)
+        for host in range(8):
+            export.add_client('192.168.1.{}'.format(host))
+        export.add_client('2001:db8::/65')
+        export.add_client('2001:db8:0:0:8000::/65')
+        export.add_client('@netgroup')
+        self.assertEqual(export.optimize_acl(), (12, 4))
+        self.assertEqual(export.clients, [{
+            'Access_Type': 'rw',
+            'Clients': '@netgroup, 0.0.0.0, 192.168.1.0/29, 2001:db8::/64'}])
+        self.assertEqual(export.optimize_acl(), (4, 4))
+
+    def test_share_options(self):
+        export = ganesha.Export.from_export(EXAMPLE_EXPORT)
+        self.assertEqual(export.options, {
+            'attr_expiration_time': None, 'read_only': False})
+        export.set_options(ganesha.share_options('read-only'))
+        export.add_client('10.0.0.1')
+        self.assertEqual(export.clients, [
+            {'Access_Type': 'ro', 'Clients': '0.0.0.0, 10.0.0.1'}])
+        self.assertEqual(export.export['Attr_Expiration_Time'], 300)
+        export.set_options(ganesha.share_options(
+            'default', attr_expiration_time=0))
+        self.assertEqual(export.options, {
+            'attr_expiration_time': 0, 'read_only': False})
+        self.assertEqual(export.clients, [
+            {'Access_Type': 'rw', 'Clients': '0.0.0.0, 10.0.0.1'}])
+        export.set_options(ganesha.share_options('default'))
+        self.assertNotIn('Attr_Expiration_Time', export.export)
+        self.assertEqual(ganesha.share_options(read_only=True),
+                         {'read_only': True})
+        with self.assertRaises(ValueError):
+            ganesha.share_options('fast')
+
+    def test_strip_defaults(self):
+        export = ganesha.Export.from_export(EXAMPLE_EXPORT)
+        self.assertTrue(export.strip_defaults())
+        self.assertNotIn('Squash', export.export)
+        self.assertNotIn('Squash', export.to_export())
+        self.assertFalse(export.strip_defaults())
+        export = ganesha.Export.from_export(
+            EXAMPLE_EXPORT.replace('"None"', '"root_squash"'))
+        self.assertFalse(export.strip_defaults())
+        self.assertEqual(export.export['Squash'], 'root_squash')
+
+    def test_client_acl_invalid_access_type(self):
+        export = ganesha.Export.from_export(
+            EXAMPLE_EXPORT.replace('"rw"', '"mdonly"'))
+        with self.assertRaises(RuntimeError):
+            export.add_client('10.0.0.1')
+
+    def test_conf_cache(self):
+        cache = ganesha.ExportConfCache()
+        first = cache.parse(EXAMPLE_EXPORT)
+        second = cache.parse(EXAMPLE_EXPORT)
+        self.assertEqual(first.export_options, second.export_options)
+        # Each export has its own copy of the parsed config
+        second.add_client('10.0.0.0/8')
+        self.assertEqual(first.clients,
+                         [{'Access_Type': 'rw', 'Clients': '0.0.0.0'}])
+        self.assertEqual(cache.parse(EXAMPLE_EXPORT).clients,
+                         [{'Access_Type': 'rw', 'Clients': '0.0.0.0'}])
+
+        unmodified = ganesha.manager.mkconf(first.export_options)
+        self.assertEqual(cache.serialize(first), unmodified)
+        self.assertEqual(cache.serialize(first), unmodified)
+        self.assertEqual(cache.serialize(second), ganesha.manager.mkconf(
+            second.export_options))
+        self.assertEqual(cache.stats(), {
+            'entries': 1, 'parse-hits': 2, 'parse-misses': 1,
+            'serialize-hits': 1, 'serialize-misses': 2})
+
+    def test_conf_cache_eviction(self):
+        cache = ganesha.ExportConfCache(max_entries=2)
+        exports = [
+            EXAMPLE_EXPORT.replace('Export_Id = 1000',
+                                   'Export_Id = {}'.format(export_id))
+            for export_id in (1000, 1001, 1002)]
+        for export in exports:
+            cache.parse(export)
+        cache.parse(exports[0])
+        self.assertEqual(cache.stats()['entries'], 2)
+        self.assertEqual(cache.parse_misses, 4)
+        # Room made for a scan keeps every config of the next one
+        cache.reserve(3)
+        for export in exports:
+            cache.parse(export)
+        for export in exports:
+            cache.parse(export)
+        self.assertEqual(cache.stats()['entries'], 3)
+        self.assertEqual(cache.parse_misses, 5)
+
 
 class TestGaneshaNFS(unittest.TestCase):
 
+    @unittest.mock.patch.object(ganesha.GaneshaNFS, '_rados_locked')
     @unittest.mock.patch.object(ganesha.GaneshaNFS, '_ceph_subvolume_command')
     @unittest.mock.patch.object(ganesha.GaneshaNFS, '_ganesha_add_export')
     @unittest.mock.patch.object(ganesha.GaneshaNFS, '_get_next_export_id')
-    @unittest.mock.patch.object(ganesha.GaneshaNFS, 'list_shares')
+    @unittest.mock.patch.object(ganesha.GaneshaNFS, 'get_shares')
     @unittest.mock.patch.object(ganesha.GaneshaNFS, '_ceph_auth_key')
     @unittest.mock.patch.object(ganesha.GaneshaNFS, '_rados_get')
     @unittest.mock.patch.object(ganesha.GaneshaNFS, '_rados_put')
+    @unittest.mock.patch.object(ganesha.GaneshaNFS, '_rados_omap_keys')
+    @unittest.mock.patch.object(ganesha.GaneshaNFS, '_rados_omap_set')
     @unittest.mock.patch.object(ganesha.Export, 'to_export')
     def test_create_share(self, mock_export,
+                          mock_omap_set,
+                          mock_omap_keys,
                           mock_rados_put,
                           mock_rados_get,
                           mock_auth_key,
-                          mock_list_shares,
+                          mock_get_shares,
                           mock_export_id,
                           mock_add_export,
-                          mock_subvolume_command):
-        mock_subvolume_command.return_value = b'mock-volume'
-        mock_list_shares.return_value = []
+                          mock_subvolume_command,
+                          mock_locked):
+        mock_subvolume_command.return_value = (
+            '/volumes/_nogroup/test-create-share/mock-volume')
+        mock_get_shares.return_value = [None]
         mock_export_id.return_value = 1
         mock_auth_key.return_value = b'mock-auth-key'
+        mock_omap_keys.return_value = []
+        mock_rados_get.return_value = ''
+        mock_export.return_value = 'EXPORT {\n}\n'
 
         inst = ganesha.GaneshaNFS('ceph-client', 'mypool')
         inst.create_share('test-create-share', size=3, access_ips=None)
@@ -109,6 +346,7 @@ class TestGaneshaNFS(unittest.TestCase):
         mock_subvolume_command.assert_any_call('create', 'ceph-fs',
                                                'test-create-share',
                                                str(3 * 1024 * 1024 * 1024))
+        mock_get_shares.assert_called_once_with(['test-create-share'])
 
     @unittest.mock.patch.object(ganesha.GaneshaNFS, '_ceph_subvolume_command')
     def test_resize_share(self, mock_subvolume_command):
@@ -118,3 +356,464 @@ class TestGaneshaNFS(unittest.TestCase):
                                                'test-resize-share',
                                                str(5 * 1024 * 1024 * 1024),
                                                '--no_shrink')
+
+    def test_list_shares_concurrent(self):
+        backend = FakeBackend()
+        backend.objects['ganesha-export-index'] = ''
+        for i in range(1000, 1020):
+            name = 'ganesha-export-{}'.format(i)
+            backend.omap_set('ganesha-export-index', {name: ''})
+            if i != 1005:
+                backend.objects[name] = EXAMPLE_EXPORT.replace(
+                    'Export_Id = 1000', 'Export_Id = {}'.format(i))
+        inst = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend,
+                                  fetch_concurrency=4)
+        shares = inst.list_shares()
+        self.assertEqual(
+            [share.export_id for share in shares],
+            [i for i in range(1000, 1020) if i != 1005])
+
+    def test_index_add_remove(self):
+        backend = FakeBackend()
+        backend.objects['ganesha-export-index'] = ''
+        inst = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend)
+        inst._add_shares_to_index([1001])
+        inst._add_shares_to_index([1000])
+        self.assertEqual(
+            backend.objects['ganesha-export-index'],
+            '%url rados://mypool/ganesha-export-1000\n'
+            '%url rados://mypool/ganesha-export-1001')
+        inst._remove_share_from_index(1000)
+        self.assertEqual(
+            backend.objects['ganesha-export-index'],
+            '%url rados://mypool/ganesha-export-1001')
+        self.assertEqual(backend.omap_keys('ganesha-export-index'),
+                         ['ganesha-export-1001', 'index-version'])
+
+    def test_index_remove_last(self):
+        backend = FakeBackend()
+        backend.objects['ganesha-export-index'] = (
+            '%url rados://mypool/ganesha-export-1000')
+        inst = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend)
+        inst._remove_share_from_index(1000)
+        self.assertEqual(backend.objects['ganesha-export-index'], '')
+        # A new client must not migrate the removed export back
+        other = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend)
+        self.assertEqual(other._index_export_ids(), [])
+        other._add_shares_to_index([1001])
+        self.assertEqual(
+            backend.objects['ganesha-export-index'],
+            '%url rados://mypool/ganesha-export-1001')
+
+    def test_index_batch(self):
+        backend = FakeBackend()
+        backend.objects['ganesha-export-index'] = ''
+        inst = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend)
+        with unittest.mock.patch.object(
+                inst, '_rados_put', wraps=inst._rados_put) as mock_put:
+            with inst.index_batch():
+                for export_id in range(1000, 1010):
+                    inst._add_shares_to_index([export_id])
+            mock_put.assert_called_once()
+        self.assertEqual(
+            len(backend.objects['ganesha-export-index'].splitlines()), 10)
+
+    def test_index_migration(self):
+        backend = FakeBackend()
+        backend.objects['ganesha-export-index'] = (
+            '\n%url rados://mypool/ganesha-export-1000'
+            '\n%url rados://mypool/ganesha-export-1001')
+        inst = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend)
+        self.assertEqual(inst._index_export_ids(), [1000, 1001])
+        inst._add_shares_to_index([1002])
+        self.assertEqual(
+            backend.omap_keys('ganesha-export-index'),
+            ['ganesha-export-1000', 'ganesha-export-1001',
+             'ganesha-export-1002', 'index-version'])
+
+    def test_export_id_allocation(self):
+        backend = FakeBackend()
+        backend.objects['ganesha-export-counter'] = '1000'
+        inst = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend)
+        self.assertEqual(inst._get_next_export_id(), 1000)
+        self.assertEqual(inst._get_next_export_id(), 1001)
+        self.assertEqual(backend.objects['ganesha-export-counter'], '1002')
+        self.assertEqual(backend.locks, {})
+
+    def test_export_id_block_lease(self):
+        backend = FakeBackend()
+        backend.objects['ganesha-export-counter'] = '1000'
+        inst = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend)
+        other = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend)
+        self.assertEqual(inst.reserve_export_ids(3), [1000, 1001, 1002])
+        self.assertEqual(other._get_next_export_id(), 1003)
+        self.assertEqual(
+            [inst._get_next_export_id() for _ in range(4)],
+            [1000, 1001, 1002, 1004])
+
+    @unittest.mock.patch.object(ganesha.time, 'sleep')
+    def test_export_id_lock_contention(self, mock_sleep):
+        backend = FakeBackend()
+        backend.objects['ganesha-export-counter'] = '1000'
+        backend.locks[('ganesha-export-counter',
+                       'ganesha-export-counter-lock')] = 'other-unit'
+        inst = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend)
+
+        def release(delay):
+            backend.locks.clear()
+        mock_sleep.side_effect = release
+        self.assertEqual(inst._get_next_export_id(), 1000)
+        mock_sleep.assert_called_once()
+
+    @unittest.mock.patch.object(ganesha.time, 'sleep')
+    def test_index_lock_contention(self, mock_sleep):
+        backend = FakeBackend()
+        backend.objects['ganesha-export-index'] = ''
+        backend.locks[('ganesha-export-index',
+                       'ganesha-export-index-lock')] = 'other-unit'
+        inst = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend)
+        backend.omap_set('ganesha-export-index',
+                         {'ganesha-export-1000': ''})
+
+        def release(delay):
+            # The other unit writes the view it listed before our change
+            backend.objects['ganesha-export-index'] = (
+                '%url rados://mypool/ganesha-export-1000')
+            backend.locks.clear()
+        mock_sleep.side_effect = release
+        inst._add_shares_to_index([1001])
+        mock_sleep.assert_called_once()
+        self.assertEqual(
+            backend.objects['ganesha-export-index'],
+            '%url rados://mypool/ganesha-export-1000\n'
+            '%url rados://mypool/ganesha-export-1001')
+        self.assertEqual(backend.locks, {})
+
+    def _backend_with_shares(self, names):
+        backend = FakeBackend()
+        backend.objects['ganesha-export-index'] = ''
+        for export_id, name in enumerate(names, start=1000):
+            object_name = 'ganesha-export-{}'.format(export_id)
+            backend.omap_set('ganesha-export-index', {object_name: ''})
+            backend.objects[object_name] = EXAMPLE_EXPORT.replace(
+                'Export_Id = 1000', 'Export_Id = {}'.format(export_id)
+            ).replace('test_ganesha_share', name)
+        return backend
+
+    def test_get_share_builds_lookup(self):
+        backend = self._backend_with_shares(['alpha', 'beta', 'gamma'])
+        inst = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend)
+        share = inst.get_share('beta')
+        self.assertEqual(share.export_id, 1001)
+        lookup = backend.omaps['ganesha-export-lookup']
+        self.assertEqual(lookup['name:gamma'], '1002')
+        self.assertEqual(lookup['lookup-version'], '1')
+        self.assertIsNone(inst.get_share('delta'))
+        self.assertEqual(lookup['path:{}'.format(share.path)], '1001')
+
+    def test_get_share_uses_lookup(self):
+        backend = self._backend_with_shares(['alpha', 'beta'])
+        inst = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend)
+        inst._rebuild_lookup()
+        with unittest.mock.patch.object(inst, 'list_shares') as mock_list:
+            self.assertEqual(inst.get_share('alpha').export_id, 1000)
+            self.assertIsNone(inst.get_share('delta'))
+            mock_list.assert_not_called()
+
+    def test_get_share_cached_reads(self):
+        backend = self._backend_with_shares(['alpha', 'beta'])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            inst = ganesha.GaneshaNFS(
+                'ceph-client', 'mypool', backend=backend,
+                cache=export_cache.ExportCache(
+                    os.path.join(tmpdir, 'cache.json')))
+            inst._rebuild_lookup()
+            inst.list_shares()
+            backend = unittest.mock.Mock(wraps=backend)
+            inst.backend = backend
+            self.assertEqual(inst.get_share('beta').export_id, 1001)
+            # One lookup and one object read, without revalidating
+            self.assertEqual(
+                [call[0] for call in backend.method_calls],
+                ['omap_get', 'get'])
+            self.assertEqual(
+                [share.export_id for share in inst.get_shares(
+                    ['alpha', 'beta'])], [1000, 1001])
+            self.assertEqual(
+                [call[0] for call in backend.method_calls[2:]],
+                ['omap_get', 'get', 'get'])
+
+    @unittest.mock.patch.object(ganesha.GaneshaNFS, '_ganesha_remove_export')
+    def test_delete_share_updates_lookup(self, mock_remove_export):
+        backend = self._backend_with_shares(['alpha', 'beta'])
+        inst = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend)
+        inst.delete_share('alpha')
+        mock_remove_export.assert_called_once_with(1000)
+        self.assertNotIn('name:alpha', backend.omaps['ganesha-export-lookup'])
+        self.assertNotIn('ganesha-export-1000', backend.objects)
+        self.assertIsNone(inst.get_share('alpha'))
+        self.assertEqual(inst.get_share('beta').export_id, 1001)
+
+    def test_list_shares_cached(self):
+        backend = self._backend_with_shares(['alpha', 'beta', 'gamma'])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_path = os.path.join(tmpdir, 'cache.json')
+            inst = ganesha.GaneshaNFS(
+                'ceph-client', 'mypool', backend=backend,
+                cache=export_cache.ExportCache(cache_path))
+            with unittest.mock.patch.object(
+                    inst, '_rados_get', wraps=inst._rados_get) as mock_get:
+                self.assertEqual(len(inst.list_shares()), 3)
+                self.assertEqual(mock_get.call_count, 3)
+            inst.close()
+            # A new client reusing the on-disk cache only re-reads the
+            # export that changed.
+            inst = ganesha.GaneshaNFS(
+                'ceph-client', 'mypool', backend=backend,
+                cache=export_cache.ExportCache(cache_path))
+            share = inst.get_share('beta')
+            share.add_client('10.0.0.0/8')
+            inst._rados_put('ganesha-export-1001', share.to_export())
+            with unittest.mock.patch.object(
+                    inst, '_rados_get', wraps=inst._rados_get) as mock_get:
+                shares = inst.list_shares()
+                mock_get.assert_called_once_with('ganesha-export-1001')
+            self.assertEqual(shares[1].clients_by_mode['rw'],
+                             ['0.0.0.0', '10.0.0.0/8'])
+            with unittest.mock.patch.object(
+                    inst, '_rados_get', wraps=inst._rados_get) as mock_get:
+                inst.list_shares(refresh=True)
+                self.assertEqual(mock_get.call_count, 3)
+
+    def test_grant_access_stages_export(self):
+        backend = self._backend_with_shares(['alpha'])
+        export_mgr = unittest.mock.MagicMock()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            inst = ganesha.GaneshaNFS('ceph-client', 'mypool',
+                                      backend=backend, export_mgr=export_mgr)
+            inst.export_dir = os.path.join(tmpdir, 'exports')
+            self.assertIsNone(inst.grant_access('alpha', '10.0.0.1'))
+            staged = os.path.join(inst.export_dir, 'export-1000.conf')
+            export_mgr.update_export.assert_called_once_with(
+                staged, 'EXPORT(Export_Id=1000)')
+            with open(staged) as f:
+                self.assertEqual(f.read(),
+                                 backend.objects['ganesha-export-1000'])
+            self.assertIn('10.0.0.1', backend.objects['ganesha-export-1000'])
+            self.assertEqual(inst.pop_changes(), [(
+                'update', 1000, inst.export_version(
+                    backend.objects['ganesha-export-1000']))])
+            self.assertEqual(inst.pop_changes(), [])
+
+    def test_apply_change(self):
+        backend = self._backend_with_shares(['alpha'])
+        export_mgr = unittest.mock.MagicMock()
+        inst = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend,
+                                  export_mgr=export_mgr)
+        inst.export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, inst.export_dir)
+        staged = os.path.join(inst.export_dir, 'export-1000.conf')
+
+        inst.apply_change('add', 1000)
+        export_mgr.add_export.assert_called_once_with(
+            staged, 'EXPORT(Export_Id=1000)')
+        export_mgr.update_export.assert_not_called()
+
+        # Ganesha already has the export as staged
+        export_mgr.reset_mock()
+        inst.apply_change('update', 1000)
+        export_mgr.update_export.assert_not_called()
+
+        # An update to an export Ganesha does not have falls back to adding
+        share = inst.get_share('alpha')
+        share.add_client('10.0.0.1')
+        backend.objects['ganesha-export-1000'] = share.to_export()
+        export_mgr.reset_mock()
+        export_mgr.update_export.side_effect = ganesha.ganesha_dbus. \
+            GaneshaDBusError('org.freedesktop.DBus.Error.InvalidArgs',
+                             'export does not exist')
+        inst.apply_change('update', 1000, 'stale')
+        export_mgr.add_export.assert_called_once_with(
+            staged, 'EXPORT(Export_Id=1000)')
+
+        export_mgr.reset_mock()
+        inst.apply_change('update', 1001)
+        export_mgr.update_export.assert_not_called()
+        export_mgr.add_export.assert_not_called()
+
+        export_mgr.remove_export.side_effect = ganesha.ganesha_dbus. \
+            GaneshaDBusError('org.freedesktop.DBus.Error.InvalidArgs',
+                             'export does not exist')
+        inst.apply_change('remove', 1000)
+        export_mgr.remove_export.assert_called_once_with(1000)
+
+    def test_notify_changes(self):
+        backend = FakeBackend()
+        inst = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend)
+        inst.notify_changes([])
+        inst.notify_changes([('add', 1000, 'abc'), ('remove', 999, '')])
+        inst.export_notify_max_changes = 1
+        inst.notify_changes([('add', 1000, 'abc'), ('remove', 999, '')])
+        self.assertEqual(backend.notifications, [
+            ('ganesha-export-index',
+             '{"changes": [["add", 1000, "abc"], ["remove", 999, ""]]}'),
+            ('ganesha-export-index', '{"resync": true}')])
+
+    def test_sync_exports(self):
+        backend = self._backend_with_shares(['alpha', 'beta'])
+        export_mgr = unittest.mock.MagicMock()
+        export_mgr.show_exports.return_value = [0, 1001, 1005]
+        inst = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend,
+                                  export_mgr=export_mgr)
+        inst.export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, inst.export_dir)
+        self.assertEqual(inst.sync_exports(),
+                         {'added': 1, 'updated': 1, 'unchanged': 0,
+                          'removed': 1})
+        export_mgr.add_export.assert_called_once_with(
+            os.path.join(inst.export_dir, 'export-1000.conf'),
+            'EXPORT(Export_Id=1000)')
+        export_mgr.update_export.assert_called_once_with(
+            os.path.join(inst.export_dir, 'export-1001.conf'),
+            'EXPORT(Export_Id=1001)')
+        export_mgr.remove_export.assert_called_once_with(1005)
+
+    def test_optimize_acls(self):
+        backend = self._backend_with_shares(['alpha', 'beta'])
+        backend.objects['ganesha-export-1001'] = backend.objects[
+            'ganesha-export-1001'].replace(
+                'Clients = 0.0.0.0;', 'Clients = 10.0.0.0, 10.0.0.1;')
+        export_mgr = unittest.mock.MagicMock()
+        inst = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend,
+                                  export_mgr=export_mgr)
+        inst.export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, inst.export_dir)
+        before = dict(backend.objects)
+        expected = [{'name': 'beta', 'before': 2, 'after': 1}]
+        self.assertEqual(inst.optimize_acls(dry_run=True), expected)
+        self.assertEqual(backend.objects, before)
+        self.assertEqual(inst.optimize_acls(), expected)
+        self.assertIn('10.0.0.0/31', backend.objects['ganesha-export-1001'])
+        self.assertEqual(backend.objects['ganesha-export-1000'],
+                         before['ganesha-export-1000'])
+        self.assertEqual(export_mgr.update_export.call_count, 1)
+
+    def test_create_shares(self):
+        backend = self._backend_with_shares(['existing'])
+        backend.objects['ganesha-export-counter'] = '1001'
+        export_mgr = unittest.mock.MagicMock()
+        inst = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend,
+                                  export_mgr=export_mgr)
+        inst.export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, inst.export_dir)
+
+        def subvolume(command, volume, name, *args):
+            if name == 'broken' and command == 'create':
+                raise subprocess.CalledProcessError(1, 'create')
+            if command == 'getpath':
+                return '/volumes/_nogroup/{}/uuid'.format(name)
+
+        with unittest.mock.patch.object(
+                inst, '_ceph_subvolume_command', side_effect=subvolume), \
+                unittest.mock.patch.object(
+                    inst, '_ceph_auth_key', return_value='key'), \
+                unittest.mock.patch.object(
+                    inst, '_rados_put', wraps=inst._rados_put) as mock_put:
+            results = inst.create_shares([
+                {'name': 'existing'},
+                {'name': 'new1', 'size': 1},
+                {'name': 'broken'},
+                {'name': 'new2', 'access_ips': ['0.0.0.0/0']},
+                {'name': 'new1'},
+            ])
+            index_writes = [
+                c for c in mock_put.call_args_list
+                if c[0][0] == 'ganesha-export-index']
+            self.assertEqual(len(index_writes), 1)
+        self.assertEqual(results[0], {
+            'name': 'existing', 'created': False,
+            'path': inst.get_share('existing').path})
+        self.assertEqual(results[1], {
+            'name': 'new1', 'created': True,
+            'path': '/volumes/_nogroup/new1/uuid'})
+        self.assertIn('error', results[2])
+        self.assertTrue(results[3]['created'])
+        self.assertIn('error', results[4])
+        self.assertEqual(backend.objects['ganesha-export-counter'], '1004')
+        self.assertEqual(inst.get_share('new2').clients_by_mode['rw'],
+                         ['0.0.0.0'])
+        self.assertEqual(inst._index_export_ids(), [1000, 1001, 1002])
+        self.assertEqual(export_mgr.add_export.call_count, 2)
+
+    def test_update_access(self):
+        backend = self._backend_with_shares(['alpha', 'beta'])
+        export_mgr = unittest.mock.MagicMock()
+        inst = ganesha.GaneshaNFS('ceph-client', 'mypool', backend=backend,
+                                  export_mgr=export_mgr)
+        inst.export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, inst.export_dir)
+        results = inst.update_access([
+            {'name': 'alpha', 'client': '10.0.0.1'},
+            {'name': 'alpha', 'client': '10.0.0.2'},
+            {'name': 'gamma', 'client': '10.0.0.1'},
+        ])
+        self.assertEqual(results[2]['error'], 'Share does not exist')
+        self.assertNotIn('error', results[0])
+        export_mgr.update_export.assert_called_once()
+        self.assertEqual(inst.get_share('alpha').clients_by_mode['rw'],
+                         ['0.0.0.0', '10.0.0.1', '10.0.0.2'])
+        inst.update_access([{'name': 'alpha', 'client': '10.0.0.1'}],
+                           revoke=True)
+        self.assertEqual(inst.get_share('alpha').clients_by_mode['rw'],
+                         ['0.0.0.0', '10.0.0.2'])
+
+
+class ExportCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = os.path.join(tmpdir.name, 'cache.json')
+
+    def test_stamp_validation(self):
+        cache = export_cache.ExportCache(self.path)
+        cache.put('obj', (10, 1000.0), {'EXPORT': {}})
+        self.assertEqual(cache.get('obj', (10, 1000.0)), {'EXPORT': {}})
+        self.assertIsNone(cache.get('obj', (10, 1001.0)))
+        self.assertIsNone(cache.get('obj', (10, 1000.0)))
+
+    def test_recently_modified_not_cached(self):
+        cache = export_cache.ExportCache(self.path)
+        now = export_cache.time.time()
+        cache.put('obj', (10, now), {'EXPORT': {}})
+        self.assertIsNone(cache.get('obj', (10, now)))
+
+    def test_eviction(self):
+        cache = export_cache.ExportCache(self.path, max_entries=2)
+        for i in range(3):
+            cache.put('obj-{}'.format(i), (i, 1000.0), {})
+        cache.get('obj-0', (0, 1000.0))
+        cache.save()
+        cache = export_cache.ExportCache(self.path, max_entries=2)
+        self.assertEqual(sorted(cache.entries), ['obj-0', 'obj-2'])
+
+    def test_save_private(self):
+        # A readable temporary file left behind is not written as is
+        with open(self.path + '.tmp', 'w'):
+            pass
+        os.chmod(self.path + '.tmp', 0o644)
+        cache = export_cache.ExportCache(self.path)
+        cache.put('obj', (10, 1000.0), {'EXPORT': {'FSAL': {
+            'Secret_Access_Key': 'secret'}}})
+        cache.save()
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+    def test_hits_not_saved(self):
+        cache = export_cache.ExportCache(self.path)
+        cache.put('obj', (10, 1000.0), {})
+        cache.save()
+        cache = export_cache.ExportCache(self.path)
+        self.assertEqual(cache.get('obj', (10, 1000.0)), {})
+        with unittest.mock.patch.object(export_cache.os, 'replace') as save:
+            cache.save()
+        save.assert_not_called()
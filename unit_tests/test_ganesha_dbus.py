@@ -0,0 +1,183 @@
+# Copyright 2026 OpenStack Charmers
+# See LICENSE file for licensing details.
+
+import subprocess
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.append('src')  # noqa
+
+import ganesha_dbus
+
+
+class StubExportMgrService(object):
+    """In-process stand-in for ganesha.nfsd's ExportMgr object."""
+
+    def __init__(self):
+        self.exports = {}
+        self.calls = []
+
+    def AddExport(self, conf_path, expression):
+        self.calls.append(('AddExport', conf_path, expression))
+        if expression in self.exports.values():
+            raise ganesha_dbus.GaneshaDBusError(
+                'org.freedesktop.DBus.Error.InvalidArgs',
+                'Export already exists')
+        self.exports[conf_path] = expression
+        return '1 exports added'
+
+    def UpdateExport(self, conf_path, expression):
+        self.calls.append(('UpdateExport', conf_path, expression))
+        return '1 exports updated'
+
+    def RemoveExport(self, export_id):
+        self.calls.append(('RemoveExport', export_id))
+
+    def GetNFSv41IO(self, export_id):
+        # As Ganesha replies: status, error, timestamp (seconds and
+        # nanoseconds), then the read and write iostats structs
+        if export_id != 1000:
+            return (False, 'Export does not have any NFSv4.1 activity',
+                    (1700000000, 5))
+        return (True, 'OK', (1700000000, 5),
+                (4096, 2048, 2, 0, 250000000, 1000),
+                (8192, 8192, 1, 1, 500000000, 2000))
+
+    def ShowExports(self):
+        self.calls.append(('ShowExports',))
+        return (1700000000, 0), [
+            (0, '/', False, False, False, False, False, (0, 0)),
+            (1000, '/volumes/a', True, True, False, False, False, (0, 0))]
+
+
+class StubBus(object):
+
+    def __init__(self, service):
+        self.service = service
+        self.lookups = 0
+
+    def get_object(self, bus_name, object_path):
+        assert bus_name == ganesha_dbus.GANESHA_BUS_NAME
+        assert object_path == ganesha_dbus.EXPORTMGR_PATH
+        self.lookups += 1
+        return self
+
+    def get_dbus_method(self, method, dbus_interface=None):
+        assert dbus_interface in (ganesha_dbus.EXPORTMGR_INTERFACE,
+                                  ganesha_dbus.EXPORTSTATS_INTERFACE)
+        return getattr(self.service, method)
+
+
+class TestExportMgr(unittest.TestCase):
+
+    def setUp(self):
+        self.service = StubExportMgrService()
+        self.bus = StubBus(self.service)
+        self.export_mgr = ganesha_dbus.ExportMgr(bus=self.bus)
+
+    def test_add_export(self):
+        self.assertEqual(
+            self.export_mgr.add_export('/run/export-1.conf',
+                                       'EXPORT(Path=/a)'), 1)
+        self.assertEqual(self.service.calls, [
+            ('AddExport', '/run/export-1.conf', 'EXPORT(Path=/a)')])
+
+    def test_add_export_error(self):
+        self.export_mgr.add_export('/run/export-1.conf', 'EXPORT(Path=/a)')
+        with self.assertRaises(ganesha_dbus.GaneshaDBusError) as ctx:
+            self.export_mgr.add_export('/run/export-2.conf',
+                                       'EXPORT(Path=/a)')
+        self.assertEqual(ctx.exception.name,
+                         'org.freedesktop.DBus.Error.InvalidArgs')
+
+    def test_connection_reused(self):
+        self.export_mgr.update_export('/run/export-1.conf',
+                                      'EXPORT(Export_Id=1)')
+        self.export_mgr.update_export('/run/export-1.conf',
+                                      'EXPORT(Export_Id=1)')
+        self.export_mgr.remove_export(1)
+        self.assertEqual(self.bus.lookups, 2)
+        self.assertEqual(self.service.calls[-1], ('RemoveExport', 1))
+
+    def test_error_drops_proxies(self):
+        self.export_mgr.add_export('/run/export-1.conf', 'EXPORT(Path=/a)')
+        with self.assertRaises(ganesha_dbus.GaneshaDBusError):
+            self.export_mgr.add_export('/run/export-2.conf',
+                                       'EXPORT(Path=/a)')
+        # A restarted Ganesha is reached through a new proxy
+        self.export_mgr.add_export('/run/export-2.conf', 'EXPORT(Path=/b)')
+        self.assertEqual(self.bus.lookups, 2)
+
+    def test_show_exports(self):
+        self.assertEqual(self.export_mgr.show_exports(), [0, 1000])
+
+    def test_export_io_stats(self):
+        self.assertEqual(self.export_mgr.export_io_stats(1000), {
+            'read': {'requested': 4096, 'transferred': 2048, 'total': 2,
+                     'errors': 0, 'latency': 250000000, 'queue_wait': 1000},
+            'write': {'requested': 8192, 'transferred': 8192, 'total': 1,
+                      'errors': 1, 'latency': 500000000,
+                      'queue_wait': 2000}})
+        self.assertIsNone(self.export_mgr.export_io_stats(1001))
+
+
+class TestDBusSendFallback(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.object(ganesha_dbus, '_import_dbus',
+                               return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.export_mgr = ganesha_dbus.ExportMgr()
+
+    @patch.object(ganesha_dbus.subprocess, 'check_output')
+    def test_add_export(self, check_output):
+        check_output.return_value = (
+            b'method return time=1 sender=:1.5 -> destination=:1.9 '
+            b'serial=3 reply_serial=2\n   string "1 exports added"\n')
+        self.assertFalse(self.export_mgr.native)
+        self.assertEqual(
+            self.export_mgr.add_export('/run/export-1.conf',
+                                       'EXPORT(Path=/a)'), 1)
+        check_output.assert_called_once_with([
+            'dbus-send', '--print-reply', '--system',
+            '--dest=org.ganesha.nfsd', '/org/ganesha/nfsd/ExportMgr',
+            'org.ganesha.nfsd.exportmgr.AddExport',
+            'string:/run/export-1.conf', 'string:EXPORT(Path=/a)'],
+            stderr=subprocess.PIPE)
+
+    @patch.object(ganesha_dbus.subprocess, 'check_output')
+    def test_show_exports(self, check_output):
+        check_output.return_value = b"""method return time=1 serial=4
+   struct {
+      uint64 1700000000
+      uint64 0
+   }
+   array [
+      struct {
+         uint16 0
+         string "/"
+      }
+      struct {
+         uint16 1000
+         string "/volumes/a"
+      }
+   ]
+"""
+        self.assertEqual(self.export_mgr.show_exports(), [0, 1000])
+
+    @patch.object(ganesha_dbus.subprocess, 'check_output')
+    def test_error(self, check_output):
+        check_output.side_effect = subprocess.CalledProcessError(
+            1, 'dbus-send', stderr=b'Error org.freedesktop.DBus.Error.'
+            b'InvalidArgs: Export 1 not found\n')
+        with self.assertRaises(ganesha_dbus.GaneshaDBusError) as ctx:
+            self.export_mgr.remove_export(1)
+        self.assertEqual(ctx.exception.message, 'Export 1 not found')
+
+    @patch.object(ganesha_dbus.subprocess, 'check_output')
+    def test_stats_need_bindings(self, check_output):
+        with self.assertRaises(ganesha_dbus.GaneshaDBusError):
+            self.export_mgr.export_io_stats(1000)
+        check_output.assert_not_called()
@@ -0,0 +1,73 @@
+# Copyright 2026 OpenStack Charmers
+# See LICENSE file for licensing details.
+
+import sys
+import unittest
+
+sys.path.append('src')  # noqa
+
+import ganesha_dbus
+import ganesha_stats
+
+from unit_tests import ceph_sim
+
+
+def sample(name, export_id, version, op, value):
+    return ('ganesha_export_io_{}_total{{export_id="{}",path="/volumes/{}",'
+            'version="{}",op="{}"}} {}'.format(
+                name, export_id, 'ab'[export_id - 1000], version, op, value))
+
+
+class GaneshaStatsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ceph_sim.SimGanesha()
+        self.server.exports[1000] = {'Export_Id': 1000, 'Path': '/volumes/a'}
+        self.server.exports[1001] = {'Export_Id': 1001, 'Path': '/volumes/b'}
+        self.export_mgr = self.server.export_mgr()
+
+    def lines(self):
+        return ganesha_stats.render(
+            ganesha_stats.collect(self.export_mgr)).splitlines()
+
+    def test_collect(self):
+        self.server.record_io('10.0.0.1', 1000, 'read', 4096, latency=0.5)
+        self.server.record_io('10.0.0.1', 1000, 'read', 4096, latency=0.25)
+        self.server.record_io('10.0.0.2', 1001, 'write', 100,
+                              minor_version=2)
+        lines = self.lines()
+        self.assertIn('ganesha_up 1', lines)
+        self.assertIn('ganesha_clients 2', lines)
+        self.assertIn('ganesha_exports 2', lines)
+        self.assertIn('ganesha_operations_total{version="NFSv41"} 2', lines)
+        self.assertIn('ganesha_operations_total{version="NFSv42"} 1', lines)
+        self.assertIn(sample('operations', 1000, '4.1', 'read', 2), lines)
+        self.assertIn(sample('transferred_bytes', 1000, '4.1', 'read', 8192),
+                      lines)
+        self.assertIn(sample('latency_seconds', 1000, '4.1', 'read', 0.75),
+                      lines)
+        self.assertIn(sample('operations', 1001, '4.2', 'write', 1), lines)
+        # Exports without activity over a version have no samples
+        self.assertFalse([line for line in lines
+                          if 'export_id="1001"' in line and '4.1' in line])
+        self.assertIn('# TYPE ganesha_export_io_errors_total counter', lines)
+
+    def test_unknown_minor_version(self):
+        def unknown(export_id):
+            raise ganesha_dbus.GaneshaDBusError(
+                ganesha_dbus.UNKNOWN_METHOD, 'No such method')
+        self.server.GetNFSv42IO = unknown
+        self.server.record_io('10.0.0.1', 1000, 'write', 10)
+        lines = self.lines()
+        self.assertIn('ganesha_up 1', lines)
+        self.assertEqual(
+            len([line for line in lines
+                 if line.startswith('ganesha_export_io_operations_total{')]),
+            2)
+
+    def test_ganesha_down(self):
+        self.server.faults.failure_rate['ShowExports'] = 1
+        self.assertEqual(self.lines(), [
+            '# HELP ganesha_up Whether Ganesha answered over D-Bus.',
+            '# TYPE ganesha_up gauge',
+            'ganesha_up 0'])
@@ -0,0 +1,91 @@
+# Copyright 2026 OpenStack Charmers
+# See LICENSE file for licensing details.
+
+import json
+import sys
+import unittest
+
+sys.path.append('src')  # noqa
+
+from ops.charm import CharmBase
+from ops.testing import Harness
+
+import interface_ceph_nfs_peer
+
+METADATA = """
+name: peer-test
+peers:
+  cluster:
+    interface: ceph-nfs-peer
+"""
+
+
+class PeerCharm(CharmBase):
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.peers = interface_ceph_nfs_peer.CephNFSPeers(self, 'cluster')
+        self.reloads = 0
+        self.changes = []
+        self.framework.observe(self.peers.on.reload_nonce, self._on_reload)
+        self.framework.observe(self.peers.on.export_changes,
+                               self._on_export_changes)
+
+    def _on_reload(self, _event):
+        self.reloads += 1
+
+    def _on_export_changes(self, event):
+        self.changes.append(event.changes)
+
+
+class TestCephNFSPeers(unittest.TestCase):
+
+    def setUp(self):
+        self.harness = Harness(PeerCharm, meta=METADATA)
+        self.addCleanup(self.harness.cleanup)
+        self.rel_id = self.harness.add_relation('cluster', 'peer-test')
+        self.harness.add_relation_unit(self.rel_id, 'peer-test/1')
+        self.harness.begin()
+
+    def _set_journal(self, journal):
+        self.harness.update_relation_data(
+            self.rel_id, 'peer-test', {'export_journal': json.dumps(journal)})
+
+    def test_publish_export_changes(self):
+        self.harness.set_leader(True)
+        peers = self.harness.charm.peers
+        peers.publish_export_changes([('add', 1000, 'a'), ('add', 1001, 'b')])
+        peers.publish_export_changes([('remove', 1000, '')])
+        self.assertEqual(peers.export_journal, [
+            [1, 'add', 1000, 'a'], [2, 'add', 1001, 'b'],
+            [3, 'remove', 1000, '']])
+        # The leader applied its own changes already
+        self.assertEqual(self.harness.charm.changes, [])
+        self.assertEqual(peers._stored.journal_position, 3)
+
+    def test_publish_truncates_journal(self):
+        self.harness.set_leader(True)
+        peers = self.harness.charm.peers
+        peers.publish_export_changes([
+            ('update', 1000, str(i))
+            for i in range(peers.JOURNAL_LENGTH + 5)])
+        journal = peers.export_journal
+        self.assertEqual(len(journal), peers.JOURNAL_LENGTH)
+        self.assertEqual(journal[0][0], 6)
+
+    def test_replay(self):
+        self._set_journal([[1, 'add', 1000, 'a'], [2, 'update', 1000, 'b']])
+        self.assertEqual(self.harness.charm.changes, [
+            [[1, 'add', 1000, 'a'], [2, 'update', 1000, 'b']]])
+        self._set_journal([[1, 'add', 1000, 'a'], [2, 'update', 1000, 'b'],
+                           [3, 'remove', 1000, '']])
+        self.assertEqual(self.harness.charm.changes[-1],
+                         [[3, 'remove', 1000, '']])
+        self.assertEqual(self.harness.charm.reloads, 0)
+
+    def test_replay_too_stale(self):
+        self._set_journal([[5, 'add', 1004, 'a'], [6, 'add', 1005, 'b']])
+        self.assertEqual(self.harness.charm.changes, [])
+        self.assertEqual(self.harness.charm.reloads, 1)
+        self.assertEqual(
+            self.harness.charm.peers._stored.journal_position, 6)
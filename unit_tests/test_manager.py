@@ -0,0 +1,226 @@
+# Copyright 2026 OpenStack Charmers
+# See LICENSE file for licensing details.
+
+import io
+import json
+import random
+import re
+import sys
+import unittest
+
+sys.path.append('src')  # noqa
+
+import manager
+
+from unit_tests.test_ganesha import EXAMPLE_EXPORT
+
+
+def legacy_conf2json(conf):
+    """Convert Ganesha config to JSON, as manager did before its parser."""
+
+    # tokenize config string
+    token_list = [io.StringIO()]
+    state = {
+        'in_quote': False,
+        'in_comment': False,
+        'escape': False,
+    }
+
+    cbk = []
+    for char in conf:
+        if state['in_quote']:
+            if not state['escape']:
+                if char == '"':
+                    state['in_quote'] = False
+                    cbk.append(lambda: token_list.append(io.StringIO()))
+                elif char == '\\':
+                    cbk.append(lambda: state.update({'escape': True}))
+        else:
+            if char == "#":
+                state['in_comment'] = True
+            if state['in_comment']:
+                if char == "\n":
+                    state['in_comment'] = False
+            else:
+                if char == '"':
+                    token_list.append(io.StringIO())
+                    state['in_quote'] = True
+        state['escape'] = False
+        if not state['in_comment']:
+            token_list[-1].write(char)
+        while cbk:
+            cbk.pop(0)()
+
+    if state['in_quote']:
+        raise RuntimeError("Unterminated quoted string")
+
+    # jsonify tokens
+    js_token_list = ["{"]
+    for tok in token_list:
+        tok = tok.getvalue()
+
+        if tok[0] == '"':
+            js_token_list.append(tok)
+            continue
+
+        for pat, s in [
+                # add omitted "=" signs to block openings
+                (r'([^=\s])\s*{', '\\1={'),
+                # delete trailing semicolons in blocks
+                (r';\s*}', '}'),
+                # add omitted semicolons after blocks
+                (r'}\s*([^}\s])', '};\\1'),
+                # separate syntactically significant characters
+                (r'([;{}=])', ' \\1 ')]:
+            tok = re.sub(pat, s, tok)
+
+        # map tokens to JSON equivalents
+        for word in tok.split():
+            if word == "=":
+                word = ":"
+            elif word == ";":
+                word = ','
+            elif word in ['{', '}'] or  \
+                    re.search(r'\A-?[1-9]\d*(\.\d+)?\Z', word):
+                pass
+            else:
+                word = json.dumps(word)
+            js_token_list.append(word)
+    js_token_list.append("}")
+
+    # group quoted strings
+    token_grp_list = []
+    for tok in js_token_list:
+        if tok[0] == '"':
+            if not (token_grp_list and isinstance(token_grp_list[-1], list)):
+                token_grp_list.append([])
+            token_grp_list[-1].append(tok)
+        else:
+            token_grp_list.append(tok)
+
+    # process quoted string groups by joining them
+    js_token_list2 = []
+    for x in token_grp_list:
+        if isinstance(x, list):
+            x = ''.join(['"'] + [tok[1:-1] for tok in x] + ['"'])
+        js_token_list2.append(x)
+
+    return ''.join(js_token_list2)
+
+
+def legacy_parseconf(conf):
+    """The original manager.parseconf, kept to check the parser against."""
+    def list_to_dict(src_list):
+        # Convert a list of key-value pairs stored as tuples to a dict.
+        # For tuples with identical keys, preserve all the values in a
+        # list. e.g., argument [('k', 'v1'), ('k', 'v2')] to function
+        # returns {'k': ['v1', 'v2']}.
+        dst_dict = {}
+        for i in src_list:
+            if isinstance(i, tuple):
+                k, v = i
+                if isinstance(v, list):
+                    v = list_to_dict(v)
+                if k in dst_dict:
+                    dst_dict[k] = [dst_dict[k]]
+                    dst_dict[k].append(v)
+                else:
+                    dst_dict[k] = v
+        return dst_dict
+
+    try:
+        # allow config to be specified in JSON --
+        # for sake of people who might feel Ganesha config foreign.
+        d = json.loads(conf)
+    except ValueError:
+        # Customize JSON decoder to convert Ganesha config to a list
+        # of key-value pairs stored as tuples. This allows multiple
+        # occurrences of a config block to be later converted to a
+        # dict key-value pair, with block name being the key and a
+        # list of block contents being the value.
+        li = json.loads(legacy_conf2json(conf), object_pairs_hook=lambda x: x)
+        d = list_to_dict(li)
+    return d
+
+
+MULTI_CLIENT_EXPORT = """EXPORT {
+    Export_Id = 1001;
+    Path = "/volumes/_nogroup/share/uuid";   # trailing comment
+    FSAL { Name = Ceph; User_Id = "ganesha-share"; }
+    CLIENT { Access_Type = rw; Clients = 10.0.0.1, 10.0.0.2; }
+    CLIENT { Access_Type = ro; Clients = 192.168.0.0/16 }
+    CLIENT { Access_Type = "none"; Clients = "*"; }
+    Attr_Expiration_Time = 60;
+    Size = 10 24; Ratio = 1.5; Zero = 0; Negative = -7; Padded = 010;
+    Quoted = "say \\"hi\\"\\t" "and bye" there;
+}
+EXPORT
+{
+    Export_Id = 1002
+}
+"""
+
+# Fragments combined at random into configs, valid and otherwise
+FRAGMENTS = [
+    'EXPORT', 'CLIENT', 'a', 'b', '1000', '0', '-5', '1.5', '01',
+    '10.0.0.1,', '"x"', '""', '"a b"', '"q\\"q"', '"\\u0041"', '"\\x"',
+    '"\n"', '{', '}', '=', ';', ' ', '\n', '# c\n', '#', '"', "'/p'",
+    '\u0661', '\t', '\\', '-']
+STATEMENTS = [
+    'EXPORT {', 'a = 1;', 'b = x y;', 'CLIENT { c = 1; }', '}', 'p = "v";',
+    'q = {', '};', '} ', 'z = 2', ' ', '\n']
+
+
+class TestParseconf(unittest.TestCase):
+
+    def assertSameParse(self, conf):
+        """Check manager.parseconf agrees with the original parser."""
+        try:
+            expected = legacy_parseconf(conf)
+        except IndexError:
+            # The original parser crashed on configs starting or ending
+            # with a quoted string, or with adjacent quoted strings
+            return 'skipped'
+        except RuntimeError:
+            with self.assertRaises(RuntimeError, msg=repr(conf)):
+                manager.parseconf(conf)
+            return 'error'
+        except ValueError:
+            with self.assertRaises(ValueError, msg=repr(conf)):
+                manager.parseconf(conf)
+            return 'error'
+        actual = manager.parseconf(conf)
+        self.assertEqual(actual, expected, msg=repr(conf))
+        self.assertEqual(repr(actual), repr(expected), msg=repr(conf))
+        return 'parsed'
+
+    def test_examples(self):
+        for conf in (EXAMPLE_EXPORT, MULTI_CLIENT_EXPORT, '\n', '# only\n',
+                     'a = 1', 'a = 1;', 'a { }', 'a { };', 'a = "x" }',
+                     'a = "unterminated', '{"json": [1, 2]}'):
+            self.assertNotEqual(self.assertSameParse(conf), 'skipped')
+
+    def test_multiple_blocks(self):
+        export = manager.parseconf(MULTI_CLIENT_EXPORT)['EXPORT']
+        self.assertEqual(export[1], {'Export_Id': 1002})
+        clients = export[0]['CLIENT']
+        self.assertEqual(clients[0][0], {
+            'Access_Type': 'rw', 'Clients': '10.0.0.1,10.0.0.2'})
+        self.assertEqual(clients[1]['Access_Type'], 'none')
+        self.assertEqual(export[0]['Size'], 1024)
+        self.assertEqual(export[0]['Quoted'], 'say "hi"\tand byethere')
+
+    def test_random_configs(self):
+        rnd = random.Random(1234)
+        outcomes = {'parsed': 0, 'error': 0, 'skipped': 0}
+        for i in range(4000):
+            pool = FRAGMENTS if i % 2 else STATEMENTS
+            conf = ''.join(
+                rnd.choice(pool) + rnd.choice(['', ' ', '\n'])
+                for _ in range(rnd.randint(0, 14)))
+            outcomes[self.assertSameParse(conf)] += 1
+        self.assertGreater(outcomes['parsed'], 100)
+
+    def test_round_trip(self):
+        conf = manager.parseconf(EXAMPLE_EXPORT)
+        self.assertEqual(manager.parseconf(manager.mkconf(conf)), conf)
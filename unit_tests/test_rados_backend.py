@@ -0,0 +1,193 @@
+# Copyright 2026 OpenStack Charmers
+# See LICENSE file for licensing details.
+
+import sys
+import unittest
+from unittest.mock import ANY, MagicMock, patch
+
+sys.path.append('src')  # noqa
+
+import rados_backend
+
+
+class FakeRadosError(Exception):
+
+    def __init__(self, message, errno=None):
+        super().__init__(message)
+        self.errno = errno
+
+
+def fake_rados_module():
+    module = MagicMock()
+    module.Error = FakeRadosError
+    return module
+
+
+class TestLibradosBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.rados = fake_rados_module()
+        patcher = patch.object(rados_backend, '_import_rados',
+                               return_value=self.rados)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.ioctx = self.rados.Rados.return_value.open_ioctx.return_value
+
+    def test_connection_is_reused(self):
+        self.ioctx.read.return_value = b'1000'
+        backend = rados_backend.LibradosBackend('ceph-nfs', 'mypool')
+        self.assertEqual(backend.get('ganesha-export-counter'), '1000')
+        backend.get('ganesha-export-index')
+        backend.remove('ganesha-export-1000')
+        self.rados.Rados.assert_called_once_with(
+            conffile='/etc/ceph/ceph.conf', rados_id='ceph-nfs')
+        self.rados.Rados.return_value.connect.assert_called_once_with()
+        self.rados.Rados.return_value.open_ioctx.assert_called_once_with(
+            'mypool')
+        self.ioctx.remove_object.assert_called_once_with(
+            'ganesha-export-1000')
+
+    def test_get_reads_until_short_read(self):
+        size = rados_backend.READ_CHUNK_SIZE
+        self.ioctx.read.side_effect = [b'a' * size, b'b']
+        backend = rados_backend.LibradosBackend('ceph-nfs', 'mypool')
+        self.assertEqual(backend.get('big'), 'a' * size + 'b')
+        self.ioctx.read.assert_called_with('big', length=size, offset=size)
+
+    def test_errors_are_wrapped(self):
+        self.ioctx.read.side_effect = FakeRadosError('missing', errno=2)
+        backend = rados_backend.LibradosBackend('ceph-nfs', 'mypool')
+        with self.assertRaises(rados_backend.RadosError) as ctx:
+            backend.get('missing')
+        self.assertEqual(ctx.exception.returncode, 2)
+
+    def test_close(self):
+        backend = rados_backend.LibradosBackend('ceph-nfs', 'mypool')
+        backend.remove('obj')
+        backend.close()
+        self.ioctx.close.assert_called_once_with()
+        self.rados.Rados.return_value.shutdown.assert_called_once_with()
+
+    def test_command(self):
+        cluster = self.rados.Rados.return_value
+        cluster.mgr_command.return_value = (0, b'/volumes/_nogroup/a/b', '')
+        backend = rados_backend.LibradosBackend('ceph-nfs', 'mypool')
+        self.assertEqual(
+            backend.command('fs', 'subvolume', 'getpath', 'ceph-fs', 'a'),
+            '/volumes/_nogroup/a/b')
+        cluster.mgr_command.assert_called_once_with(
+            '{"prefix": "fs subvolume getpath", "format": "json", '
+            '"vol_name": "ceph-fs", "sub_name": "a"}', b'')
+
+    def test_command_failure(self):
+        cluster = self.rados.Rados.return_value
+        cluster.mon_command.return_value = (-13, b'', 'access denied')
+        backend = rados_backend.LibradosBackend('ceph-nfs', 'mypool')
+        with self.assertRaises(rados_backend.subprocess.CalledProcessError):
+            backend.command('auth', 'get', 'client.x')
+
+    def test_omap_keys_paginates(self):
+        page = rados_backend.OMAP_PAGE_SIZE
+        keys = ['key-{:05d}'.format(i) for i in range(page + 3)]
+        self.ioctx.get_omap_keys.side_effect = [
+            (iter([(key, None) for key in keys[:page]]), 0),
+            (iter([(key, None) for key in keys[page:]]), 0),
+        ]
+        backend = rados_backend.LibradosBackend('ceph-nfs', 'mypool')
+        self.assertEqual(backend.omap_keys('ganesha-export-index'), keys)
+        self.ioctx.get_omap_keys.assert_called_with(
+            ANY, keys[page - 1], page)
+
+    def test_omap_set(self):
+        backend = rados_backend.LibradosBackend('ceph-nfs', 'mypool')
+        backend.omap_set('ganesha-export-index', {'ganesha-export-1': ''})
+        op = self.rados.WriteOpCtx.return_value.__enter__.return_value
+        self.ioctx.set_omap.assert_called_once_with(
+            op, ('ganesha-export-1',), (b'',))
+        self.ioctx.operate_write_op.assert_called_once_with(
+            op, 'ganesha-export-index')
+
+    def test_watch_notify(self):
+        backend = rados_backend.LibradosBackend('ceph-nfs', 'mypool')
+        callback, error_callback = MagicMock(), MagicMock()
+        self.assertEqual(
+            backend.watch('ganesha-export-index', callback, error_callback),
+            self.ioctx.watch.return_value)
+        self.ioctx.watch.assert_called_once_with(
+            'ganesha-export-index', callback, error_callback)
+        backend.notify('ganesha-export-index', '{}', 5000)
+        self.ioctx.notify.assert_called_once_with(
+            'ganesha-export-index', '{}', timeout_ms=5000)
+
+    def test_get_backend(self):
+        self.assertIsInstance(
+            rados_backend.get_backend('ceph-nfs', 'mypool'),
+            rados_backend.LibradosBackend)
+        with patch.object(rados_backend, '_import_rados', return_value=None):
+            self.assertIsInstance(
+                rados_backend.get_backend('ceph-nfs', 'mypool'),
+                rados_backend.RadosCLIBackend)
+
+
+class TestRadosCLIBackend(unittest.TestCase):
+
+    @patch.object(rados_backend.subprocess, 'check_output')
+    def test_get(self, check_output):
+        check_output.return_value = b'data'
+        backend = rados_backend.RadosCLIBackend('ceph-nfs', 'mypool')
+        self.assertEqual(backend.get('obj'), 'data')
+        check_output.assert_called_once_with([
+            'rados', '-p', 'mypool', '--id', 'ceph-nfs',
+            'get', 'obj', '/dev/stdout'])
+
+    @patch.object(rados_backend.subprocess, 'check_output')
+    def test_command(self, check_output):
+        check_output.return_value = b'[{"entity": "client.x", "key": "k"}]\n'
+        backend = rados_backend.RadosCLIBackend('ceph-nfs', 'mypool')
+        self.assertEqual(backend.command('auth', 'get', 'client.x'),
+                         [{'entity': 'client.x', 'key': 'k'}])
+        check_output.assert_called_once_with([
+            'ceph', '--id', 'ceph-nfs', '--conf=/etc/ceph/ceph.conf',
+            'auth', 'get', 'client.x', '--format=json'],
+            stderr=rados_backend.subprocess.DEVNULL)
+
+    @patch.object(rados_backend.subprocess, 'run')
+    def test_put_streams_stdin(self, run):
+        backend = rados_backend.RadosCLIBackend('ceph-nfs', 'mypool')
+        backend.put('obj', 'data')
+        run.assert_called_once_with([
+            'rados', '-p', 'mypool', '--id', 'ceph-nfs',
+            'put', 'obj', '-'], input=b'data', check=True)
+
+
+class TestCommands(unittest.TestCase):
+
+    def test_build_command(self):
+        self.assertEqual(
+            rados_backend.build_command(
+                'fs', 'subvolume', 'resize', 'ceph-fs', 'share', '1024',
+                '--no_shrink'),
+            ('mgr', {
+                'prefix': 'fs subvolume resize', 'format': 'json',
+                'vol_name': 'ceph-fs', 'sub_name': 'share',
+                'new_size': '1024', 'no_shrink': True}))
+        self.assertEqual(
+            rados_backend.build_command('fs', 'subvolume', 'create',
+                                        'ceph-fs', 'share', '1024'),
+            ('mgr', {
+                'prefix': 'fs subvolume create', 'format': 'json',
+                'vol_name': 'ceph-fs', 'sub_name': 'share', 'size': 1024}))
+        self.assertEqual(
+            rados_backend.build_command('auth', 'get', 'client.x'),
+            ('mon', {'prefix': 'auth get', 'format': 'json',
+                     'entity': 'client.x'}))
+
+    def test_build_command_unknown(self):
+        with self.assertRaises(ValueError):
+            rados_backend.build_command('osd', 'pool', 'rm', 'mypool')
+
+    def test_parse_output(self):
+        self.assertIsNone(rados_backend.parse_output(b''))
+        self.assertEqual(rados_backend.parse_output(b'/volumes/a/b\n'),
+                         '/volumes/a/b')
+        self.assertEqual(rados_backend.parse_output(b'{"a": 1}'), {'a': 1})
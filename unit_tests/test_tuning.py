@@ -0,0 +1,88 @@
+# Copyright 2026 OpenStack Charmers
+# See LICENSE file for licensing details.
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.append('src')  # noqa
+
+import tuning
+
+GIB = 1024 ** 3
+
+
+class TuningTest(unittest.TestCase):
+
+    def values(self, cpus, memory, config=None):
+        return {parameter: chosen['value'] for parameter, chosen in
+                tuning.ganesha_tuning(cpus, memory, config or {}).items()}
+
+    def test_automatic(self):
+        # A small VM keeps Ganesha's defaults
+        self.assertEqual(self.values(2, 4 * GIB), {
+            'RPC_Ioq_ThrdMin': 2, 'RPC_Ioq_ThrdMax': 200,
+            'RPC_Max_Connections': 1024, 'Dispatch_Max_Reqs': 5000})
+        self.assertEqual(self.values(64, 256 * GIB), {
+            'RPC_Ioq_ThrdMin': 64, 'RPC_Ioq_ThrdMax': 1024,
+            'RPC_Max_Connections': 10000, 'Dispatch_Max_Reqs': 10000})
+        self.assertEqual(self.values(24, 32 * GIB)['RPC_Max_Connections'],
+                         2048)
+
+    def test_config_overrides(self):
+        chosen = tuning.ganesha_tuning(8, 16 * GIB, {
+            'rpc-ioq-threads-min': 300, 'rpc-ioq-threads-max': 100,
+            'rpc-max-connections': 20000, 'dispatch-max-requests': None})
+        self.assertEqual(chosen['RPC_Ioq_ThrdMin'],
+                         {'value': 300, 'source': 'config'})
+        self.assertEqual(chosen['RPC_Ioq_ThrdMax']['value'], 300)
+        self.assertEqual(chosen['RPC_Max_Connections']['value'], 10000)
+        self.assertEqual(chosen['Dispatch_Max_Reqs']['source'], 'auto')
+        self.assertEqual(list(chosen), list(tuning.PARAMETERS))
+
+    def test_host_resources(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        meminfo = os.path.join(tmpdir.name, 'meminfo')
+        with open(meminfo, 'w') as f:
+            f.write('MemTotal:       16384000 kB\nMemFree: 1 kB\n')
+        cpus, memory = tuning.host_resources(meminfo)
+        self.assertGreaterEqual(cpus, 1)
+        self.assertEqual(memory, 16384000 * 1024)
+        self.assertEqual(tuning.host_resources(meminfo + '.missing')[1], 0)
+
+    def test_cache_profiles(self):
+        coherent = tuning.mdcache_tuning('coherent', 4 * GIB)
+        self.assertEqual(list(coherent.items()), [('Dir_Chunk', 0)])
+        self.assertEqual(tuning.mdcache_tuning('balanced', 4 * GIB), {
+            'Entries_HWMark': 104857, 'Dir_Chunk': 128,
+            'Chunks_HWMark': 819})
+        self.assertEqual(tuning.mdcache_tuning('balanced', GIB), {
+            'Entries_HWMark': 100000, 'Dir_Chunk': 128,
+            'Chunks_HWMark': 781})
+        self.assertEqual(
+            tuning.mdcache_tuning('read-heavy', 1024 * GIB)['Entries_HWMark'],
+            10000000)
+        self.assertEqual(tuning.attr_expiration_time('coherent'), 0)
+        self.assertEqual(tuning.cache_profile('read-heavy'), 'read-heavy')
+        self.assertEqual(tuning.cache_profile('fast'), 'coherent')
+
+    def test_client_options(self):
+        self.assertEqual(tuning.client_options({}), {})
+        options = tuning.client_options({
+            'client-oc-size': 512, 'client-cache-size': 100000,
+            'client-overrides': '{client-oc-size: 1073741824, '
+                                'client readahead max periods: 8, '
+                                'client_oc: true}'})
+        self.assertEqual(list(options.items()), [
+            ('client_cache_size', '100000'),
+            ('client_oc', 'true'),
+            ('client_oc_size', '1073741824'),
+            ('client_readahead_max_periods', '8')])
+
+    def test_invalid_client_overrides(self):
+        for text in ('{client_mountpoint: /}', '[client_oc]',
+                     '{client_oc: [1]}', '{client_oc: '):
+            with self.assertRaises(ValueError):
+                tuning.parse_client_overrides(text)